@@ -1,9 +1,175 @@
+import os
+import json
+import time
+import asyncio
 import uvicorn
-from fastapi import FastAPI
-from typing import Optional
-from src.queries import obtener_pronostico_extendido, procesar_pronostico, obtener_prediccion_con_llm
+from functools import partial
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Any, Callable, Dict, List, Literal, Optional
+from src.queries import (obtener_pronostico_compacto_async, renderizar_pronostico, obtener_prediccion_con_llm_async,
+                         consultar_llm_local_stream, refrescar_pronostico_async, pregenerar_interpretacion_async,
+                         obtener_pronostico_cercano_async)
+from src.cache import cache_llm, cache_pronosticos
+from src.clientes import cerrar_clientes
+from src.coalescencia import coalescencia_llm, coalescencia_pronosticos
+from src.modelo import PronosticoCompacto, resumen_diario
+from src.programador import programador_refresco
+from src import almacen
+from src.lotes import iterar_pronosticos_lote, max_coordenadas_lote, obtener_pronosticos_lote
+from src.metricas import (DURACION_PETICIONES, PETICIONES_EN_CURSO, cabecera_server_timing, exponer_metricas,
+                          iniciar_peticion, medir)
+from src.resiliencia import ServicioNoDisponibleError, establecer_deadline
+from src.cola_llm import PRIORIDAD_ALTA, PRIORIDAD_NORMAL, cola_llm
+from src.balanceo import pool_llm
+from src.cuota import SEGUNDO_PLANO, cuota_openweather
+from src.cache_compartida import backend_cache, coalescencia_compartida
+from src.cambios import detector_cambios
+from src.oraculo import CAMPOS_ORACULO, MAX_SLOTS_ORACULO, codificar_abi, codificar_empaquetado, columnas_oraculo, validar_campos
+from src.trabajos import Trabajo, TrabajosLlenosError, callback_permitido, gestor_trabajos
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Ciclo de vida de la aplicación: al arrancar abre el almacén persistente y calienta las
+    cachés, inicia el refresco en segundo plano, la comprobación de salud de los backends
+    del LLM y los trabajadores de los trabajos asíncronos; al apagar lo detiene todo y
+    cierra los pools.
+    """
+    compactacion = None
+    if almacen.abrir_almacen() is not None:
+        compactacion = asyncio.ensure_future(almacen.ciclo_compactacion())
+    if os.getenv('PREFETCH_ENABLED', 'true').lower() == 'true':
+        programador_refresco.iniciar(partial(refrescar_pronostico_async, prioridad=SEGUNDO_PLANO),
+                                     pregenerar_interpretacion_async)
+    salud_llm = asyncio.ensure_future(pool_llm.ciclo_salud())
+    gestor_trabajos.iniciar(_ejecutar_trabajo_llm)
+    yield
+    salud_llm.cancel()
+    await gestor_trabajos.detener()
+    await programador_refresco.detener()
+    if compactacion is not None:
+        compactacion.cancel()
+    almacen.cerrar_almacen()
+    await backend_cache.cerrar()
+    await cerrar_clientes()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def medir_peticion(request: Request, call_next):
+    """
+    Mide cada petición y añade la cabecera Server-Timing con la duración de sus etapas.
+    También fija el tiempo máximo de la petición (REQUEST_DEADLINE, en segundos), que
+    limita el timeout de las llamadas al LLM.
+    """
+    limite = os.getenv('REQUEST_DEADLINE', '25')
+    establecer_deadline(float(limite) if limite else None)
+    etapas = iniciar_peticion()
+    PETICIONES_EN_CURSO.incrementar()
+    inicio = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        PETICIONES_EN_CURSO.restar()
+    total = time.perf_counter() - inicio
+    ruta = request.scope.get("route")
+    DURACION_PETICIONES.observar(ruta.path if ruta else "desconocida", total)
+    response.headers["Server-Timing"] = cabecera_server_timing(etapas, total)
+    return response
+
+
+def _responder_json(contenido) -> JSONResponse:
+    """Serializa la respuesta midiendo el tiempo de serialización."""
+    with medir("serializacion"):
+        return JSONResponse(content=contenido)
+
+
+def _etag_coincide(if_none_match: Optional[str], etag: str) -> bool:
+    """Comprueba si la cabecera If-None-Match incluye el ETag (o "*"), ignorando el prefijo débil W/."""
+    if not if_none_match:
+        return False
+    etiquetas = {e.strip().removeprefix("W/") for e in if_none_match.split(",")}
+    return "*" in etiquetas or etag in etiquetas
+
+
+def _responder_condicional(request: Request, lat: float, lon: float, compacto: PronosticoCompacto,
+                           variante: str, generar: Callable[[], Any],
+                           origen: Optional[Dict[str, float]] = None) -> Response:
+    """
+    Responde con un ETag derivado del contenido del pronóstico y Cache-Control hasta que
+    expira su entrada en la caché (el siguiente slot). Si el cliente ya tiene esa versión
+    (If-None-Match) responde 304 sin cuerpo y sin generar la respuesta. Con `origen`
+    (pronóstico de una ubicación cercana) lo añade a la respuesta y al ETag.
+    """
+    if origen is not None:
+        variante = f"{variante}-{origen['lat']}_{origen['lon']}"
+    etag = f'"{compacto.huella()}-{variante}"'
+    expira = cache_pronosticos.expiracion(lat, lon)
+    max_age = max(0, int(expira - time.time())) if expira else 0
+    cabeceras = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    if _etag_coincide(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cabeceras)
+    contenido = generar()
+    if isinstance(contenido, bytes):
+        # Las respuestas binarias indican el origen en cabeceras
+        respuesta = Response(contenido, media_type="application/octet-stream")
+        if origen is not None:
+            cabeceras.update({"X-Source-Lat": str(origen["lat"]), "X-Source-Lon": str(origen["lon"]),
+                              "X-Source-Distance-Km": str(origen["distancia_km"])})
+    else:
+        if origen is not None:
+            contenido["origen"] = origen
+        respuesta = _responder_json(contenido)
+    respuesta.headers.update(cabeceras)
+    return respuesta
+
+
+class Coordenada(BaseModel):
+    """Coordenadas de una ubicación."""
+    lat: float = Field(ge=-90, le=90)
+    lon: float = Field(ge=-180, le=180)
+
+
+# Formato de salida del pronóstico: columnas numéricas ("raw"), enteros escalados para oráculos ("oracle")
+# o textos legibles ("display")
+FormatoPronostico = Literal["raw", "oracle", "display"]
+
+# Codificación del formato "oracle": JSON, abi.encode de un array por campo o registros binarios empaquetados
+CodificacionOraculo = Literal["json", "abi", "packed"]
+
+# Distancia máxima que puede pedir ?max_distance_km= para servir un pronóstico cercano
+MAX_DISTANCIA_KM = float(os.getenv('NEAREST_MAX_DISTANCE_KM', '25'))
+
+
+async def _obtener_pronostico(lat: float, lon: float, max_distancia_km: Optional[float]):
+    """
+    Obtiene el pronóstico de las coordenadas o, con `max_distancia_km`, el vigente más
+    cercano dentro de esa distancia. Devuelve el pronóstico, las coordenadas cuya entrada
+    de la caché lo contiene y su origen (None si no se pidió distancia).
+    """
+    if max_distancia_km is None:
+        return await obtener_pronostico_compacto_async(lat, lon), (lat, lon), None
+    compacto, origen = await obtener_pronostico_cercano_async(lat, lon, max_distancia_km)
+    if origen is None:
+        return compacto, (lat, lon), None
+    return compacto, (origen["lat"], origen["lon"]), origen
+
+
+# Prioridad en la cola del LLM, indicada por la cabecera X-Priority (p. ej. fijada por el gateway para planes de pago)
+PrioridadLLM = Literal["alta", "normal"]
+PRIORIDADES_LLM = {"alta": PRIORIDAD_ALTA, "normal": PRIORIDAD_NORMAL}
+
+
+class SolicitudLote(BaseModel):
+    """Cuerpo de las peticiones por lotes."""
+    coordenadas: List[Coordenada]
 
-app = FastAPI()
 
 @app.get("/")
 def root():
@@ -18,31 +184,157 @@ def root():
         "descripcion": "Esta API proporciona pronósticos del clima y análisis utilizando modelos LLM.",
         "endpoints": {
             "/prediction": "Obtiene el pronóstico del clima en formato JSON.",
-            "/prediction-llm": "Obtiene el pronóstico del clima analizado por un LLM."
+            "/prediction-llm": "Obtiene el pronóstico del clima analizado por un LLM.",
+            "/prediction-llm/stream": "Envía el pronóstico y luego el análisis del LLM como Server-Sent Events.",
+            "/prediction-llm/jobs": "Encarga el análisis del LLM como trabajo asíncrono (POST) y consulta su resultado (GET /{id}).",
+            "/prediction/batch": "Obtiene el pronóstico de varias coordenadas en una sola petición (POST).",
+            "/prediction/daily": "Obtiene el resumen diario (mín/máx/media, precipitación) del pronóstico.",
+            "/prediction/daily/batch": "Obtiene el resumen diario de varias coordenadas en una sola petición (POST).",
+            "/metrics": "Expone métricas de latencia, servicios externos y cachés en formato Prometheus.",
+            "/cache/stats": "Muestra las estadísticas de uso de las cachés y del refresco en segundo plano."
         }
     }
 
 
+def _generar_oraculo(compacto: PronosticoCompacto, codificacion: str, desde: int, slots: Optional[int],
+                     campos: List[str]) -> Any:
+    """Genera la salida "oracle" con la ventana de slots, los campos y la codificación pedidos."""
+    with medir("procesar_pronostico"):
+        columnas = columnas_oraculo(compacto, desde, slots, campos)
+        if codificacion == "abi":
+            return codificar_abi(columnas)
+        if codificacion == "packed":
+            return codificar_empaquetado(columnas)
+    return {"pronostico": columnas}
+
 @app.get("/prediction")
-def get_prediction(lat: float, lon: float):
+async def get_prediction(request: Request, lat: float, lon: float,
+                         formato: FormatoPronostico = Query("display", alias="format"),
+                         max_distance_km: Optional[float] = Query(None, ge=0, le=MAX_DISTANCIA_KM),
+                         codificacion: CodificacionOraculo = Query("json", alias="encoding"),
+                         desde: int = Query(0, ge=0, le=MAX_SLOTS_ORACULO, alias="offset"),
+                         slots: Optional[int] = Query(None, ge=1, le=MAX_SLOTS_ORACULO),
+                         campos: Optional[str] = Query(None, alias="fields")):
     """
     Endpoint que devuelve el pronóstico del clima en formato JSON.
 
+    La respuesta lleva ETag y Cache-Control con los segundos que faltan para el siguiente
+    slot; con If-None-Match y el mismo ETag se responde 304 sin cuerpo.
+
     Args:
         lat (float): Latitud de la ubicación.
         lon (float): Longitud de la ubicación.
+        formato (str): "display" (por defecto) para textos legibles, "raw" para columnas numéricas
+            u "oracle" para enteros escalados.
+        max_distance_km (Optional[float]): Si se indica, sirve el pronóstico en caché más cercano
+            dentro de esa distancia e incluye en `origen` sus coordenadas y la distancia.
+        codificacion (str): Con format=oracle, "json" (por defecto), "abi" o "packed" (binarias).
+        desde (int): Con format=oracle, primer slot de la ventana.
+        slots (Optional[int]): Con format=oracle, número de slots de la ventana.
+        campos (Optional[str]): Con format=oracle, campos separados por comas (dt, temp, pop, weather_id).
 
     Returns:
         dict: Pronóstico extendido en formato JSON.
     """
-    pronostico = obtener_pronostico_extendido(lat, lon)
-    if pronostico:
-        datos_pronostico = procesar_pronostico(pronostico)
-        return {"pronostico": datos_pronostico}
+    lista_campos = validar_campos(campos)
+    if lista_campos is None:
+        return JSONResponse(status_code=400, content={
+            "error": f"Campos no válidos; disponibles: {', '.join(CAMPOS_ORACULO)}"
+        })
+
+    compacto, (lat_cache, lon_cache), origen = await _obtener_pronostico(lat, lon, max_distance_km)
+    if compacto and formato == "oracle":
+        variante = f"oracle-{codificacion}-{desde}-{slots or ''}-{'.'.join(lista_campos)}"
+        return _responder_condicional(request, lat_cache, lon_cache, compacto, variante,
+                                      lambda: _generar_oraculo(compacto, codificacion, desde, slots, lista_campos),
+                                      origen)
+    if compacto:
+        return _responder_condicional(request, lat_cache, lon_cache, compacto, formato,
+                                      lambda: {"pronostico": renderizar_pronostico(compacto, formato)}, origen)
+    return {"error": "No se pudo obtener el pronóstico"}
+
+@app.post("/prediction/batch")
+async def get_prediction_batch(solicitud: SolicitudLote, stream: bool = False,
+                               formato: FormatoPronostico = Query("display", alias="format"),
+                               max_distance_km: Optional[float] = Query(None, ge=0, le=MAX_DISTANCIA_KM)):
+    """
+    Endpoint que devuelve el pronóstico de varias coordenadas en una sola petición.
+
+    Args:
+        solicitud (SolicitudLote): Lista de coordenadas a consultar.
+        stream (bool): Si es True, devuelve cada resultado como una línea NDJSON según termina.
+        formato (str): "display" (por defecto) para textos legibles, "raw" para columnas numéricas
+            u "oracle" para enteros escalados.
+        max_distance_km (Optional[float]): Distancia máxima para servir a cada coordenada un
+            pronóstico cercano en caché; su resultado incluye entonces el `origen`.
+
+    Returns:
+        dict: Resultados en el orden de entrada, cada uno con `pronostico` o `error`.
+    """
+    return await _responder_lote(solicitud, stream, lambda compacto: renderizar_pronostico(compacto, formato),
+                                 max_distance_km)
+
+@app.get("/prediction/daily")
+async def get_prediction_daily(request: Request, lat: float, lon: float,
+                               max_distance_km: Optional[float] = Query(None, ge=0, le=MAX_DISTANCIA_KM)):
+    """
+    Endpoint que devuelve el pronóstico resumido por día local de la ubicación.
+    Admite peticiones condicionales y `max_distance_km` igual que /prediction.
+
+    Args:
+        lat (float): Latitud de la ubicación.
+        lon (float): Longitud de la ubicación.
+        max_distance_km (Optional[float]): Distancia máxima para servir un pronóstico cercano en caché.
+
+    Returns:
+        dict: Desfase horario y resumen de cada día del pronóstico.
+    """
+    compacto, (lat_cache, lon_cache), origen = await _obtener_pronostico(lat, lon, max_distance_km)
+    if compacto:
+        return _responder_condicional(request, lat_cache, lon_cache, compacto, "daily",
+                                      lambda: {"pronostico": resumen_diario(compacto)}, origen)
     return {"error": "No se pudo obtener el pronóstico"}
 
+@app.post("/prediction/daily/batch")
+async def get_prediction_daily_batch(solicitud: SolicitudLote, stream: bool = False,
+                                     max_distance_km: Optional[float] = Query(None, ge=0, le=MAX_DISTANCIA_KM)):
+    """
+    Endpoint que devuelve el resumen diario de varias coordenadas en una sola petición.
+
+    Args:
+        solicitud (SolicitudLote): Lista de coordenadas a consultar.
+        stream (bool): Si es True, devuelve cada resultado como una línea NDJSON según termina.
+        max_distance_km (Optional[float]): Distancia máxima para servir un pronóstico cercano en caché.
+
+    Returns:
+        dict: Resultados en el orden de entrada, cada uno con `pronostico` o `error`.
+    """
+    return await _responder_lote(solicitud, stream, resumen_diario, max_distance_km)
+
+async def _responder_lote(solicitud: SolicitudLote, stream: bool, procesar,
+                          max_distancia_km: Optional[float] = None):
+    """Ejecuta un lote de coordenadas y lo devuelve completo o como stream NDJSON."""
+    if len(solicitud.coordenadas) > max_coordenadas_lote():
+        return JSONResponse(
+            status_code=413,
+            content={"error": f"El lote admite como máximo {max_coordenadas_lote()} coordenadas"}
+        )
+
+    coordenadas = [(c.lat, c.lon) for c in solicitud.coordenadas]
+
+    if stream:
+        async def generar_ndjson():
+            async for resultado in iterar_pronosticos_lote(coordenadas, procesar, max_distancia_km):
+                yield json.dumps(resultado, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(generar_ndjson(), media_type="application/x-ndjson")
+
+    return _responder_json({"resultados": await obtener_pronosticos_lote(coordenadas, procesar, max_distancia_km)})
+
 @app.get("/prediction-llm")
-def get_prediction_with_llm(lat: float, lon: float, llm_hash: Optional[str] = None):
+async def get_prediction_with_llm(lat: float, lon: float, llm_hash: Optional[str] = None,
+                                  prioridad: PrioridadLLM = Header("normal", alias="X-Priority"),
+                                  max_distance_km: Optional[float] = Query(None, ge=0, le=MAX_DISTANCIA_KM)):
     """
     Endpoint que obtiene el pronóstico del clima y lo analiza con un LLM local.
 
@@ -50,25 +342,216 @@ def get_prediction_with_llm(lat: float, lon: float, llm_hash: Optional[str] = No
         lat (float): Latitud de la ubicación.
         lon (float): Longitud de la ubicación.
         llm_hash (Optional[str]): Hash ID del modelo LLM. Si no se proporciona, usa la variable de entorno.
+            Si coincide con el de algún backend de LLM_BACKENDS, la petición se envía solo a ese backend.
+        prioridad (str): Cabecera X-Priority, "alta" o "normal" (por defecto), para la cola del LLM.
+        max_distance_km (Optional[float]): Distancia máxima para usar un pronóstico cercano en caché;
+            la respuesta incluye entonces su `origen`.
 
     Returns:
         dict: Predicción del clima interpretada por el LLM junto con los datos originales.
+        Si el LLM no está disponible (circuito abierto, ningún backend disponible, tiempo
+        límite de la petición agotado o timeout del propio LLM) se devuelve el pronóstico
+        sin analizar con `degradado: true`; si su cola está llena, se responde 503 con la
+        cabecera Retry-After.
     """
-    resultado = obtener_prediccion_con_llm(lat, lon, llm_hash)
+    resultado = await obtener_prediccion_con_llm_async(lat, lon, llm_hash, PRIORIDADES_LLM[prioridad],
+                                                       max_distance_km)
+    contenido = _contenido_prediccion_llm(resultado)
 
+    if contenido["success"]:
+        return _responder_json(contenido)
+    if "reintentar_en" in resultado:
+        return JSONResponse(status_code=503, content=contenido,
+                            headers={"Retry-After": str(resultado["reintentar_en"])})
+    return contenido
+
+def _contenido_prediccion_llm(resultado: Dict[str, Any]) -> Dict[str, Any]:
+    """Construye la respuesta de /prediction-llm (y de sus trabajos) a partir del resultado de la consulta."""
     if resultado.get("success"):
-        return {
+        contenido = {
             "success": True,
             "prediccion_interpretada": resultado.get("prediccion_llm"),
             # "datos_clima": resultado.get("datos_clima_originales"),
             "mensaje": "Predicción generada exitosamente con análisis de LLM"
         }
+        if resultado.get("reutilizada"):
+            contenido["reutilizada"] = True
+        if "prompt" in resultado:
+            contenido["prompt"] = resultado["prompt"]
     else:
-        return {
+        contenido = {
             "success": False,
             "error": resultado.get("error", "Error desconocido"),
+            "degradado": resultado.get("degradado", False),
             "datos_clima": resultado.get("datos_clima_originales")
         }
+    if "origen" in resultado:
+        contenido["origen"] = resultado["origen"]
+    return contenido
+
+class SolicitudTrabajoLLM(BaseModel):
+    """Cuerpo de POST /prediction-llm/jobs."""
+    lat: float = Field(ge=-90, le=90)
+    lon: float = Field(ge=-180, le=180)
+    llm_hash: Optional[str] = None
+    max_distance_km: Optional[float] = Field(None, ge=0, le=MAX_DISTANCIA_KM)
+    callback_url: Optional[str] = None
+
+async def _ejecutar_trabajo_llm(trabajo: Trabajo) -> Dict[str, Any]:
+    """Ejecuta la predicción con LLM de un trabajo asíncrono."""
+    p = trabajo.parametros
+    resultado = await obtener_prediccion_con_llm_async(p["lat"], p["lon"], p["llm_hash"], p["prioridad"],
+                                                       p["max_distancia_km"])
+    return _contenido_prediccion_llm(resultado)
+
+@app.post("/prediction-llm/jobs", status_code=202)
+async def create_prediction_llm_job(solicitud: SolicitudTrabajoLLM,
+                                    prioridad: PrioridadLLM = Header("normal", alias="X-Priority")):
+    """
+    Endpoint que encarga una predicción con LLM y responde al momento con el id del trabajo.
+
+    El trabajo lo ejecuta un pool de trabajadores en segundo plano; su estado y resultado
+    se consultan en GET /prediction-llm/jobs/{id} y, si se indica `callback_url`, se
+    envían con POST a esa URL al terminar.
+
+    Args:
+        solicitud (SolicitudTrabajoLLM): Coordenadas, modelo, distancia máxima y URL de callback.
+        prioridad (str): Cabecera X-Priority, "alta" o "normal" (por defecto), para la cola del LLM.
+
+    Returns:
+        dict: Id, estado y URL del trabajo (202). 400 si la URL de callback no está permitida
+        y 503 con Retry-After si la cola de trabajos está llena.
+    """
+    if solicitud.callback_url and not await callback_permitido(solicitud.callback_url):
+        return JSONResponse(status_code=400, content={"error": "URL de callback no permitida"})
+    parametros = {
+        "lat": solicitud.lat,
+        "lon": solicitud.lon,
+        "llm_hash": solicitud.llm_hash,
+        "prioridad": PRIORIDADES_LLM[prioridad],
+        "max_distancia_km": solicitud.max_distance_km,
+    }
+    try:
+        trabajo = gestor_trabajos.crear(parametros, solicitud.callback_url)
+    except TrabajosLlenosError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)},
+                            headers={"Retry-After": str(e.reintentar_en)})
+    except ServicioNoDisponibleError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    url = f"/prediction-llm/jobs/{trabajo.id}"
+    return JSONResponse(status_code=202, content={"id": trabajo.id, "estado": trabajo.estado, "url": url},
+                        headers={"Location": url})
+
+@app.get("/prediction-llm/jobs/{id_trabajo}")
+async def get_prediction_llm_job(id_trabajo: str):
+    """
+    Endpoint que devuelve el estado de un trabajo y, cuando termina, su resultado.
+
+    Args:
+        id_trabajo (str): Id devuelto por POST /prediction-llm/jobs.
+
+    Returns:
+        dict: Id, estado ("pendiente", "en_curso", "completado" o "fallido"), tiempos,
+        resultado (con la misma forma que /prediction-llm) y si se entregó el callback.
+        404 si el trabajo no existe o ya se descartó.
+    """
+    trabajo = gestor_trabajos.obtener(id_trabajo)
+    if trabajo is None:
+        return JSONResponse(status_code=404, content={"error": "Trabajo no encontrado"})
+    return trabajo.a_dict()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Endpoint que expone las métricas en el formato de texto de Prometheus.
+
+    Returns:
+        str: Histogramas de duración por etapa y por ruta, respuestas y llamadas en curso
+        a los servicios externos, y tamaño y tasa de aciertos de las cachés.
+    """
+    return PlainTextResponse(exponer_metricas(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    """
+    Endpoint que devuelve las estadísticas de las cachés de pronósticos y del LLM.
+
+    Returns:
+        dict: Entradas, aciertos, fallos y tasa de aciertos de cada caché, las llamadas
+        agrupadas en una sola consulta a OpenWeatherMap o al LLM, la cola de cada
+        modelo LLM, el estado de sus backends, el consumo de la cuota de OpenWeatherMap,
+        la caché compartida entre workers, las interpretaciones reutilizadas, los
+        trabajos asíncronos, el refresco en segundo plano y el almacén persistente.
+    """
+    return {
+        "pronosticos": cache_pronosticos.estadisticas(),
+        "llm": cache_llm.estadisticas(),
+        "coalescencia": {
+            "pronosticos": coalescencia_pronosticos.estadisticas(),
+            "llm": coalescencia_llm.estadisticas()
+        },
+        "cola_llm": cola_llm.estadisticas(),
+        "backends_llm": pool_llm.estadisticas(),
+        "cuota_openweather": cuota_openweather.estadisticas(),
+        "compartida": {**backend_cache.estadisticas(), **coalescencia_compartida.estadisticas()},
+        "cambios_llm": detector_cambios.estadisticas(),
+        "trabajos": gestor_trabajos.estadisticas(),
+        "refresco": programador_refresco.estadisticas(),
+        "almacen": almacen.almacen.estadisticas() if almacen.almacen else None
+    }
+
+def _evento_sse(evento: str, datos) -> str:
+    """Formatea un evento de Server-Sent Events con los datos serializados en JSON."""
+    return f"event: {evento}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+@app.get("/prediction-llm/stream")
+async def get_prediction_with_llm_stream(lat: float, lon: float, llm_hash: Optional[str] = None,
+                                         prioridad: PrioridadLLM = Header("normal", alias="X-Priority"),
+                                         max_distance_km: Optional[float] = Query(None, ge=0, le=MAX_DISTANCIA_KM)):
+    """
+    Endpoint que envía el pronóstico procesado y después el análisis del LLM como Server-Sent Events.
+
+    Eventos emitidos, en orden:
+        - pronostico: datos del clima procesados, en cuanto llegan de OpenWeatherMap (con su
+          `origen` si se sirvió un pronóstico cercano).
+        - token: fragmentos del texto del LLM, si el LLM admite streaming.
+        - llm: respuesta completa del LLM, si no admite streaming.
+        - error: descripción del error, si algo falla.
+        - fin: cierre del stream.
+
+    Args:
+        lat (float): Latitud de la ubicación.
+        lon (float): Longitud de la ubicación.
+        llm_hash (Optional[str]): Hash ID del modelo LLM. Si no se proporciona, usa la variable de entorno.
+        prioridad (str): Cabecera X-Priority, "alta" o "normal" (por defecto), para la cola del LLM.
+        max_distance_km (Optional[float]): Distancia máxima para usar un pronóstico cercano en caché.
+
+    Returns:
+        StreamingResponse: Stream `text/event-stream`.
+    """
+    async def generar_eventos():
+        compacto, _, origen = await _obtener_pronostico(lat, lon, max_distance_km)
+        if not compacto:
+            yield _evento_sse("error", "No se pudo obtener el pronóstico del clima")
+            yield _evento_sse("fin", {"success": False})
+            return
+
+        datos_clima = {"pronostico": renderizar_pronostico(compacto)}
+        if origen is not None:
+            datos_clima["origen"] = origen
+        yield _evento_sse("pronostico", datos_clima)
+
+        exito = True
+        async for evento, datos in consultar_llm_local_stream(compacto, llm_hash, PRIORIDADES_LLM[prioridad]):
+            exito = exito and evento != "error"
+            yield _evento_sse(evento, datos)
+        yield _evento_sse("fin", {"success": exito})
+
+    return StreamingResponse(
+        generar_eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import queue
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple
+
+from src.cache import cache_llm, cache_pronosticos
+from src.modelo import PronosticoCompacto
+
+
+class AlmacenPersistente:
+    """
+    Almacén SQLite (modo WAL) de pronósticos e interpretaciones del LLM.
+
+    Guarda una copia de lo que entra en las cachés en memoria para poder
+    recargarlas al arrancar y evitar la ráfaga de consultas tras un reinicio.
+    Las escrituras de `encolar` las hace un único hilo escritor, para no bloquear el
+    event loop; si hay más de `max_pendientes` en espera, las nuevas se descartan.
+    """
+
+    def __init__(self, ruta: str, max_pendientes: int = 1024):
+        self.ruta = ruta
+        Path(ruta).parent.mkdir(parents=True, exist_ok=True)
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.execute("PRAGMA synchronous=NORMAL")
+            self._conexion.execute("""
+                CREATE TABLE IF NOT EXISTS pronosticos (
+                    lat REAL NOT NULL,
+                    lon REAL NOT NULL,
+                    slot INTEGER NOT NULL,
+                    expira REAL NOT NULL,
+                    zona_horaria INTEGER NOT NULL,
+                    datos TEXT NOT NULL,
+                    PRIMARY KEY (lat, lon, slot)
+                )
+            """)
+            self._conexion.execute("""
+                CREATE TABLE IF NOT EXISTS interpretaciones (
+                    clave TEXT PRIMARY KEY,
+                    modelo TEXT NOT NULL,
+                    expira REAL NOT NULL,
+                    datos TEXT NOT NULL
+                )
+            """)
+        self.escrituras = 0
+        self.descartadas = 0
+        self.cargados_pronosticos = 0
+        self.cargadas_interpretaciones = 0
+        self.eliminados = 0
+        self._pendientes: queue.Queue = queue.Queue(max_pendientes)
+        self._escritor = threading.Thread(target=self._escribir, name="almacen-escritor", daemon=True)
+        self._escritor.start()
+
+    def _escribir(self) -> None:
+        while True:
+            tarea = self._pendientes.get()
+            try:
+                if tarea is None:
+                    return
+                tarea[0](*tarea[1])
+            except Exception as e:
+                # Cualquier error se registra y se sigue: si el único escritor muriera, la cola
+                # se llenaría y cerrar() esperaría para siempre
+                print(f"Error al escribir en el almacén: {e}")
+            finally:
+                self._pendientes.task_done()
+
+    def encolar(self, escritura: Callable[..., None], *args: Any) -> None:
+        """Encarga la escritura al hilo escritor sin esperar a que termine."""
+        try:
+            self._pendientes.put_nowait((escritura, args))
+        except queue.Full:
+            self.descartadas += 1
+
+    def esperar_escrituras(self) -> None:
+        """Bloquea hasta que el hilo escritor termina las escrituras encoladas."""
+        self._pendientes.join()
+
+    def guardar_pronostico(self, celda: Tuple[float, float], compacto: PronosticoCompacto, expira: float) -> None:
+        """Guarda un pronóstico identificado por su celda y el `dt` de su primer slot."""
+        with self._lock:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO pronosticos VALUES (?, ?, ?, ?, ?, ?)",
+                (celda[0], celda[1], compacto.dt[0], expira, compacto.zona_horaria,
+                 json.dumps(compacto.crudo, ensure_ascii=False))
+            )
+            self.escrituras += 1
+
+    def guardar_interpretacion(self, clave: str, modelo: str, valor: Any, expira: float) -> None:
+        """Guarda una respuesta del LLM identificada por su clave de contenido."""
+        with self._lock:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO interpretaciones VALUES (?, ?, ?, ?)",
+                (clave, modelo, expira, json.dumps(valor, ensure_ascii=False, default=str))
+            )
+            self.escrituras += 1
+
+    def compactar(self, gracia_obsoleto: float = 0) -> int:
+        """
+        Elimina los pronósticos que ya no pueden servirse y las interpretaciones expiradas.
+
+        Args:
+            gracia_obsoleto (float): Segundos durante los que un pronóstico expirado aún se sirve
+
+        Returns:
+            int: Número de filas eliminadas
+        """
+        ahora = time.time()
+        with self._lock:
+            eliminados = self._conexion.execute(
+                "DELETE FROM pronosticos WHERE expira + ? <= ?", (gracia_obsoleto, ahora)
+            ).rowcount
+            # De cada celda solo interesa el pronóstico más reciente
+            eliminados += self._conexion.execute("""
+                DELETE FROM pronosticos WHERE slot < (
+                    SELECT MAX(p.slot) FROM pronosticos p
+                    WHERE p.lat = pronosticos.lat AND p.lon = pronosticos.lon
+                )
+            """).rowcount
+            eliminados += self._conexion.execute(
+                "DELETE FROM interpretaciones WHERE expira <= ?", (ahora,)
+            ).rowcount
+            self._conexion.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.eliminados += eliminados
+            return eliminados
+
+    def calentar_caches(self) -> None:
+        """Carga en las cachés en memoria los pronósticos e interpretaciones aún utilizables."""
+        ahora = time.time()
+        with self._lock:
+            pronosticos = self._conexion.execute(
+                "SELECT lat, lon, expira, zona_horaria, datos FROM pronosticos WHERE expira + ? > ? ORDER BY slot",
+                (cache_pronosticos.gracia_obsoleto, ahora)
+            ).fetchall()
+            interpretaciones = self._conexion.execute(
+                "SELECT clave, modelo, expira, datos FROM interpretaciones WHERE expira > ?", (ahora,)
+            ).fetchall()
+
+        for lat, lon, expira, zona_horaria, datos in pronosticos:
+            cache_pronosticos.guardar(lat, lon, PronosticoCompacto(json.loads(datos), zona_horaria), expira)
+        for clave, modelo, expira, datos in interpretaciones:
+            cache_llm.guardar(clave, modelo, json.loads(datos), expira)
+
+        self.cargados_pronosticos += len(pronosticos)
+        self.cargadas_interpretaciones += len(interpretaciones)
+
+    def cerrar(self) -> None:
+        """Termina las escrituras pendientes y cierra la conexión con la base de datos."""
+        self._pendientes.put(None)
+        self._escritor.join()
+        with self._lock:
+            self._conexion.close()
+
+    def estadisticas(self) -> dict:
+        """Devuelve los contadores del almacén."""
+        return {
+            "ruta": self.ruta,
+            "escrituras": self.escrituras,
+            "escrituras_pendientes": self._pendientes.qsize(),
+            "escrituras_descartadas": self.descartadas,
+            "pronosticos_cargados": self.cargados_pronosticos,
+            "interpretaciones_cargadas": self.cargadas_interpretaciones,
+            "filas_compactadas": self.eliminados,
+        }
+
+
+# El almacén solo existe después de abrirlo en el arranque de la aplicación
+almacen: Optional[AlmacenPersistente] = None
+
+
+def abrir_almacen() -> Optional[AlmacenPersistente]:
+    """
+    Abre el almacén configurado en STORE_PATH, lo compacta y calienta las cachés.
+
+    Returns:
+        Optional[AlmacenPersistente]: El almacén abierto, o None si STORE_PATH está vacío.
+    """
+    global almacen
+    ruta = os.getenv('STORE_PATH', 'data/pronosticos.sqlite3')
+    if not ruta:
+        return None
+    almacen = AlmacenPersistente(ruta, int(os.getenv('STORE_WRITE_QUEUE', '1024')))
+    almacen.compactar(cache_pronosticos.gracia_obsoleto)
+    almacen.calentar_caches()
+    return almacen
+
+
+def cerrar_almacen() -> None:
+    """Cierra el almacén si está abierto."""
+    global almacen
+    if almacen is not None:
+        almacen.cerrar()
+        almacen = None
+
+
+def persistir_pronostico(celda: Tuple[float, float], compacto: PronosticoCompacto, expira: float) -> None:
+    """Encarga guardar el pronóstico en el almacén si está abierto."""
+    if almacen is not None:
+        almacen.encolar(almacen.guardar_pronostico, celda, compacto, expira)
+
+
+def persistir_interpretacion(clave: str, modelo: str, valor: Any, expira: float) -> None:
+    """Encarga guardar la respuesta del LLM en el almacén si está abierto."""
+    if almacen is not None:
+        almacen.encolar(almacen.guardar_interpretacion, clave, modelo, valor, expira)
+
+
+async def ciclo_compactacion() -> None:
+    """Compacta el almacén periódicamente cada STORE_COMPACT_INTERVAL segundos."""
+    intervalo = float(os.getenv('STORE_COMPACT_INTERVAL', '3600'))
+    while True:
+        await asyncio.sleep(intervalo)
+        if almacen is not None:
+            try:
+                await asyncio.to_thread(almacen.compactar, cache_pronosticos.gracia_obsoleto)
+            except sqlite3.Error as e:
+                print(f"Error al compactar el almacén: {e}")
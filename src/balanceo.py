@@ -0,0 +1,165 @@
+import os
+import time
+import asyncio
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+
+from src.clientes import LLM, obtener_cliente_async, timeout_async
+from src.resiliencia import ABIERTO, CircuitBreaker, ServicioNoDisponibleError, crear_circuito_llm
+
+# Estrategias de selección de backend
+MENOS_PENDIENTES = "least_outstanding"
+LATENCIA = "latency"
+
+# Nombre con el que se agrupan los hashes que no sirve ningún backend configurado
+MODELO_OTRO = "otro"
+
+
+class BackendLLM:
+    """Un servidor LLM (URL base y hash de modelo) con su circuito, carga y latencia observada."""
+
+    def __init__(self, url: str, llm_hash: str, circuito: CircuitBreaker):
+        self.url = url.rstrip("/")
+        self.hash = llm_hash
+        self.circuito = circuito
+        self.en_curso = 0
+        self.latencia_media = 0.0
+        self.llamadas = 0
+        self.sano = True
+
+    def url_mensaje(self, llm_hash: Optional[str] = None) -> str:
+        """URL de la consulta al LLM, con el hash indicado o el del backend."""
+        return f"{self.url}/{llm_hash or self.hash}/message"
+
+    def circuito_disponible(self) -> bool:
+        """Indica si el circuito del backend admite llamadas (cerrado, o abierto y listo para la prueba)."""
+        return not (self.circuito.estado == ABIERTO and self.circuito.reintentar_en() > 0)
+
+    def disponible(self) -> bool:
+        """Un backend se expulsa mientras la comprobación de salud falla o su circuito está abierto."""
+        return self.sano and self.circuito_disponible()
+
+    @contextmanager
+    def llamada(self) -> Iterator[None]:
+        """Cuenta la llamada como pendiente mientras dura y actualiza la latencia media."""
+        self.en_curso += 1
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.en_curso -= 1
+            duracion = time.perf_counter() - inicio
+            self.latencia_media = duracion if not self.llamadas else 0.8 * self.latencia_media + 0.2 * duracion
+            self.llamadas += 1
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "hash": self.hash,
+            "sano": self.sano,
+            "circuito": self.circuito.estado,
+            "en_curso": self.en_curso,
+            "llamadas": self.llamadas,
+            "latencia_media_s": round(self.latencia_media, 4),
+        }
+
+
+class PoolLLM:
+    """
+    Conjunto de backends LLM entre los que se reparten las generaciones.
+
+    Un `llm_hash` que coincide con el de algún backend fija la petición a esos backends;
+    cualquier otro hash se envía a cualquiera de ellos. Entre los candidatos disponibles
+    se elige el de menos llamadas pendientes ("least_outstanding") o el de menor
+    latencia esperada según la carga ("latency"). La comprobación de salud solo expulsa
+    un backend mientras quede otro candidato sano; si ninguno lo está, decide su circuito,
+    para que un backend lento al arrancar no deje sin servicio todo un intervalo.
+    """
+
+    def __init__(self, backends: List[BackendLLM], estrategia: str = MENOS_PENDIENTES):
+        self.backends = backends
+        self.estrategia = estrategia
+
+    def candidatos(self, llm_hash: Optional[str] = None) -> List[BackendLLM]:
+        """Backends que pueden atender el hash indicado, estén o no disponibles."""
+        fijados = [b for b in self.backends if llm_hash and b.hash == llm_hash]
+        return fijados or self.backends
+
+    def modelo(self, llm_hash: Optional[str]) -> str:
+        """
+        Nombre del modelo para la cola de admisión, las métricas y las estadísticas: el hash
+        si lo sirve algún backend configurado o MODELO_OTRO si no, para que cada hash
+        arbitrario de un cliente no cree su propia serie ni su propia cola.
+        """
+        return llm_hash if any(b.hash == llm_hash for b in self.backends) else MODELO_OTRO
+
+    def disponibles(self, llm_hash: Optional[str] = None) -> List[BackendLLM]:
+        """Candidatos que pueden atender ahora el hash: los sanos o, si no hay, los de circuito disponible."""
+        candidatos = self.candidatos(llm_hash)
+        return [b for b in candidatos if b.disponible()] or [b for b in candidatos if b.circuito_disponible()]
+
+    def elegir(self, llm_hash: Optional[str] = None) -> BackendLLM:
+        """
+        Elige el backend que atenderá la siguiente generación.
+
+        Raises:
+            ServicioNoDisponibleError: Si ningún backend candidato está disponible
+        """
+        disponibles = self.disponibles(llm_hash)
+        if not disponibles:
+            raise ServicioNoDisponibleError("Ningún backend del LLM disponible")
+        if self.estrategia == LATENCIA:
+            return min(disponibles, key=lambda b: ((b.en_curso + 1) * b.latencia_media, b.en_curso))
+        return min(disponibles, key=lambda b: (b.en_curso, b.latencia_media))
+
+    async def comprobar_salud(self) -> None:
+        """Consulta cada backend; responde sano mientras conteste sin error 5xx."""
+        ruta = os.getenv('LLM_HEALTH_PATH', '/')
+        cliente = obtener_cliente_async(LLM)
+
+        async def comprobar(backend: BackendLLM) -> None:
+            try:
+                response = await cliente.get(backend.url + ruta, timeout=timeout_async(5))
+                backend.sano = response.status_code < 500
+            except (httpx.HTTPError, httpx.InvalidURL, ValueError):
+                backend.sano = False
+
+        await asyncio.gather(*(comprobar(b) for b in self.backends))
+
+    async def ciclo_salud(self) -> None:
+        """Comprueba la salud de los backends cada LLM_HEALTH_INTERVAL segundos."""
+        intervalo = float(os.getenv('LLM_HEALTH_INTERVAL', '30'))
+        while True:
+            try:
+                await self.comprobar_salud()
+            except Exception as e:
+                # Un error inesperado no debe detener las comprobaciones siguientes
+                print(f"Error al comprobar la salud de los backends del LLM: {e}")
+            await asyncio.sleep(intervalo)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Devuelve la estrategia de selección y el estado de cada backend."""
+        return {
+            "estrategia": self.estrategia,
+            "backends": [b.estadisticas() for b in self.backends],
+        }
+
+
+def _backends_configurados() -> List[BackendLLM]:
+    """
+    Lee LLM_BACKENDS con el formato "url|hash,url|hash"; si está vacío usa el único
+    backend definido por LLM_BASE_URL y LLM_HASH_ID.
+    """
+    hash_defecto = os.getenv('LLM_HASH_ID', 'dd1a3913-6f2b-060b-9d69-7efb4bce9f01')
+    pares = []
+    for definicion in filter(None, (p.strip() for p in os.getenv('LLM_BACKENDS', '').split(","))):
+        url, _, llm_hash = definicion.partition("|")
+        pares.append((url, llm_hash or hash_defecto))
+    if not pares:
+        pares = [(os.getenv('LLM_BASE_URL', 'http://localhost:3001'), hash_defecto)]
+    return [BackendLLM(url, llm_hash, crear_circuito_llm(f"llm:{url}|{llm_hash}")) for url, llm_hash in pares]
+
+
+pool_llm = PoolLLM(_backends_configurados(), os.getenv('LLM_BALANCING', MENOS_PENDIENTES))
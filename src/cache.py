@@ -0,0 +1,320 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from src.espacial import IndiceEspacial
+
+# OpenWeatherMap publica el pronóstico en intervalos de 3 horas alineados a UTC
+INTERVALO_SLOT = 3 * 3600
+
+
+def proximo_limite_slot(ahora: Optional[float] = None) -> float:
+    """
+    Calcula el instante (epoch) en que empieza el siguiente slot de 3 horas.
+
+    Args:
+        ahora (float, optional): Instante de referencia. Por defecto, la hora actual.
+
+    Returns:
+        float: Timestamp del próximo límite de slot.
+    """
+    if ahora is None:
+        ahora = time.time()
+    return (int(ahora) // INTERVALO_SLOT + 1) * INTERVALO_SLOT
+
+
+def ajustar_a_rejilla(lat: float, lon: float, paso: float) -> Tuple[float, float]:
+    """
+    Ajusta unas coordenadas al centro de su celda en una rejilla de `paso` grados.
+
+    Args:
+        lat (float): Latitud de la ubicación
+        lon (float): Longitud de la ubicación
+        paso (float): Tamaño de la celda en grados
+
+    Returns:
+        Tuple[float, float]: Coordenadas ajustadas a la rejilla
+    """
+    if paso <= 0:
+        return lat, lon
+    return round(round(lat / paso) * paso, 6), round(round(lon / paso) * paso, 6)
+
+
+class CachePronostico:
+    """
+    Caché LRU en memoria para pronósticos, indexada por celda de la rejilla.
+
+    Las entradas expiradas se conservan `gracia_obsoleto` segundos más para poder
+    servirlas mientras se revalidan en segundo plano (stale-while-revalidate). Después
+    siguen en la caché hasta que el LRU las expulsa, como reserva para cuando no se
+    puede consultar a OpenWeatherMap. Las celdas guardadas forman un índice espacial
+    para servir el pronóstico vigente más cercano dentro de una distancia.
+    """
+
+    def __init__(self, paso_rejilla: float = 0.01, max_entradas: int = 1024, gracia_obsoleto: float = 900):
+        self.paso_rejilla = paso_rejilla
+        self.max_entradas = max_entradas
+        self.gracia_obsoleto = gracia_obsoleto
+        self._entradas: "OrderedDict[Tuple[float, float], Tuple[float, Any]]" = OrderedDict()
+        self._indice = IndiceEspacial()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.obsoletos = 0
+        self.reservas = 0
+        self.cercanos = 0
+        self.expulsiones = 0
+
+    def celda(self, lat: float, lon: float) -> Tuple[float, float]:
+        """Devuelve la celda de la rejilla a la que pertenecen las coordenadas."""
+        return ajustar_a_rejilla(lat, lon, self.paso_rejilla)
+
+    def obtener(self, lat: float, lon: float) -> Optional[Any]:
+        """
+        Busca un pronóstico vigente para la celda de las coordenadas.
+
+        Returns:
+            Optional[Any]: El pronóstico almacenado o None si no existe o expiró.
+        """
+        clave = self.celda(lat, lon)
+        ahora = time.time()
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or entrada[0] <= ahora:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[1]
+
+    def obtener_obsoleto(self, lat: float, lon: float) -> Optional[Any]:
+        """
+        Busca un pronóstico expirado que siga dentro del periodo de gracia.
+
+        Returns:
+            Optional[Any]: El pronóstico almacenado o None si no existe o superó la gracia.
+        """
+        clave = self.celda(lat, lon)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or entrada[0] + self.gracia_obsoleto <= time.time():
+                return None
+            self.obsoletos += 1
+            return entrada[1]
+
+    def expiracion(self, lat: float, lon: float) -> Optional[float]:
+        """Devuelve el instante en que expira el pronóstico de la celda, o None si no hay ninguno."""
+        with self._lock:
+            entrada = self._entradas.get(self.celda(lat, lon))
+            return entrada[0] if entrada is not None else None
+
+    def obtener_reserva(self, lat: float, lon: float) -> Optional[Any]:
+        """
+        Busca el pronóstico guardado más cercano aunque haya expirado: el de la propia celda
+        o, si no existe, el de una celda vecina (el más reciente entre las más próximas).
+
+        Returns:
+            Optional[Any]: El pronóstico almacenado o None si no hay ninguno cerca.
+        """
+        lat_celda, lon_celda = self.celda(lat, lon)
+        vecinas = (-1, 0, 1) if self.paso_rejilla > 0 else (0,)
+        with self._lock:
+            candidatos = []
+            for dlat in vecinas:
+                for dlon in vecinas:
+                    clave = self.celda(lat_celda + dlat * self.paso_rejilla, lon_celda + dlon * self.paso_rejilla)
+                    entrada = self._entradas.get(clave)
+                    if entrada is not None:
+                        candidatos.append((dlat * dlat + dlon * dlon, -entrada[0], entrada[1]))
+            if not candidatos:
+                return None
+            self.reservas += 1
+            return min(candidatos, key=lambda c: c[:2])[2]
+
+    def obtener_cercano(self, lat: float, lon: float,
+                        max_distancia_km: float) -> Optional[Tuple[Any, Tuple[float, float], float]]:
+        """
+        Busca el pronóstico vigente más cercano a las coordenadas, sea el de su propia celda
+        o el de otra celda cuyo centro esté a menos de `max_distancia_km`.
+
+        Returns:
+            Optional[Tuple]: (pronóstico, celda de origen, distancia en km) o None si no hay ninguno.
+        """
+        propia = self.celda(lat, lon)
+        ahora = time.time()
+        with self._lock:
+            for distancia, clave in self._indice.cercanos(lat, lon, max_distancia_km):
+                entrada = self._entradas.get(clave)
+                if entrada is None or entrada[0] <= ahora:
+                    continue
+                self._entradas.move_to_end(clave)
+                if clave == propia:
+                    self.aciertos += 1
+                else:
+                    self.cercanos += 1
+                return entrada[1], clave, distancia
+            return None
+
+    def guardar(self, lat: float, lon: float, valor: Any, expira: Optional[float] = None) -> None:
+        """Guarda un pronóstico hasta `expira` o, por defecto, hasta el inicio del siguiente slot de 3 horas."""
+        clave = self.celda(lat, lon)
+        with self._lock:
+            if clave not in self._entradas:
+                self._indice.agregar(*clave)
+            self._entradas[clave] = (expira or proximo_limite_slot(), valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                expulsada, _ = self._entradas.popitem(last=False)
+                self._indice.quitar(*expulsada)
+                self.expulsiones += 1
+
+    def limpiar(self) -> None:
+        """Elimina todas las entradas y reinicia los contadores."""
+        with self._lock:
+            self._entradas.clear()
+            self._indice.limpiar()
+            self.aciertos = self.fallos = self.obsoletos = self.reservas = self.cercanos = self.expulsiones = 0
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Devuelve los contadores de uso de la caché."""
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "paso_rejilla": self.paso_rejilla,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "obsoletos_servidos": self.obsoletos,
+                "reservas_servidas": self.reservas,
+                "cercanos_servidos": self.cercanos,
+                "expulsiones": self.expulsiones,
+                "tasa_aciertos": round(self.aciertos / total, 4) if total else 0.0,
+            }
+
+
+def clave_llm(texto: str, llm_hash: str, user_id: str) -> str:
+    """
+    Calcula la clave de contenido de una interpretación del LLM.
+
+    Args:
+        texto (str): Texto enviado al LLM
+        llm_hash (str): Hash ID del modelo LLM
+        user_id (str): Identificador de usuario enviado en el payload
+
+    Returns:
+        str: Hash SHA-256 hexadecimal de los tres valores
+    """
+    contenido = "\x1f".join((llm_hash, user_id, texto)).encode("utf-8")
+    return hashlib.sha256(contenido).hexdigest()
+
+
+class CacheLLM:
+    """
+    Caché LRU de respuestas del LLM indexada por el hash del contenido de la consulta.
+
+    Las entradas caducan tras `ttl` segundos y se expulsan las menos usadas
+    cuando se supera el número máximo de entradas o el tamaño total en bytes.
+    """
+
+    def __init__(self, ttl: float = 3600, max_entradas: int = 512, max_bytes: int = 16 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._entradas: "OrderedDict[str, Tuple[float, int, str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._por_modelo: Dict[str, Dict[str, int]] = {}
+        self.expulsiones = 0
+
+    def _contar(self, modelo: str, campo: str) -> None:
+        contadores = self._por_modelo.setdefault(modelo, {"aciertos": 0, "fallos": 0})
+        contadores[campo] += 1
+
+    def _eliminar(self, clave: str) -> None:
+        _, tamano, _, _ = self._entradas.pop(clave)
+        self._bytes -= tamano
+
+    def obtener(self, clave: str, modelo: str) -> Optional[Any]:
+        """
+        Busca una respuesta vigente del LLM.
+
+        Args:
+            clave (str): Clave calculada con clave_llm
+            modelo (str): Hash ID del modelo, usado para las estadísticas
+
+        Returns:
+            Optional[Any]: La respuesta almacenada o None si no existe o expiró.
+        """
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or entrada[0] <= time.time():
+                if entrada is not None:
+                    self._eliminar(clave)
+                self._contar(modelo, "fallos")
+                return None
+            self._entradas.move_to_end(clave)
+            self._contar(modelo, "aciertos")
+            return entrada[3]
+
+    def guardar(self, clave: str, modelo: str, valor: Any, expira: Optional[float] = None) -> None:
+        """
+        Guarda una respuesta del LLM hasta `expira` o, por defecto, durante `ttl` segundos.
+        Se descarta si por sí sola supera el límite de bytes.
+        """
+        tamano = len(json.dumps(valor, ensure_ascii=False, default=str).encode("utf-8"))
+        if tamano > self.max_bytes:
+            return
+        with self._lock:
+            if clave in self._entradas:
+                self._eliminar(clave)
+            self._entradas[clave] = (expira or time.time() + self.ttl, tamano, modelo, valor)
+            self._bytes += tamano
+            while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+                self._eliminar(next(iter(self._entradas)))
+                self.expulsiones += 1
+
+    def limpiar(self) -> None:
+        """Elimina todas las entradas y reinicia los contadores."""
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+            self._por_modelo.clear()
+            self.expulsiones = 0
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Devuelve el uso de la caché y la tasa de aciertos por modelo."""
+        with self._lock:
+            por_modelo = {}
+            for modelo, contadores in self._por_modelo.items():
+                total = contadores["aciertos"] + contadores["fallos"]
+                por_modelo[modelo] = {
+                    **contadores,
+                    "tasa_aciertos": round(contadores["aciertos"] / total, 4) if total else 0.0,
+                }
+            return {
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "expulsiones": self.expulsiones,
+                "por_modelo": por_modelo,
+            }
+
+
+cache_pronosticos = CachePronostico(
+    paso_rejilla=float(os.getenv('CACHE_GRID_DEG', '0.01')),
+    max_entradas=int(os.getenv('CACHE_MAX_ENTRIES', '1024')),
+    gracia_obsoleto=float(os.getenv('CACHE_STALE_SECONDS', '900')),
+)
+
+cache_llm = CacheLLM(
+    ttl=float(os.getenv('LLM_CACHE_TTL', '3600')),
+    max_entradas=int(os.getenv('LLM_CACHE_MAX_ENTRIES', '512')),
+    max_bytes=int(os.getenv('LLM_CACHE_MAX_BYTES', str(16 * 1024 * 1024))),
+)
@@ -0,0 +1,354 @@
+import os
+import time
+import uuid
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+# Script que borra el bloqueo solo si sigue perteneciendo a quien lo obtuvo
+SCRIPT_LIBERAR = (
+    "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+)
+
+
+class BackendCache(ABC):
+    """
+    Almacén clave-valor con expiración y bloqueos, compartido entre las cachés en memoria.
+
+    Las cachés de cada proceso (CachePronostico, CacheLLM) son el primer nivel; este
+    backend es el segundo. Si es compartido entre procesos, los workers reutilizan lo
+    que ha descargado cualquiera de ellos y se reparten las descargas con sus bloqueos.
+    """
+
+    # Indica si el backend lo ven otros procesos; si no, el primer nivel ya lo cubre todo
+    compartido = False
+
+    def __init__(self):
+        self.lecturas = 0
+        self.aciertos = 0
+        self.escrituras = 0
+        self.errores = 0
+
+    @abstractmethod
+    async def leer(self, clave: str) -> Optional[bytes]:
+        """Devuelve el valor guardado en la clave o None si no existe o expiró."""
+
+    @abstractmethod
+    async def escribir(self, clave: str, valor: bytes, ttl: float) -> None:
+        """Guarda el valor durante `ttl` segundos."""
+
+    @abstractmethod
+    async def bloquear(self, clave: str, ttl: float) -> Optional[str]:
+        """
+        Intenta obtener el bloqueo de la clave durante `ttl` segundos; devuelve su token o
+        None si otro lo tiene.
+        """
+
+    @abstractmethod
+    async def bloqueado(self, clave: str) -> bool:
+        """Indica si alguien tiene el bloqueo de la clave."""
+
+    @abstractmethod
+    async def desbloquear(self, clave: str, token: str) -> None:
+        """Libera el bloqueo si sigue perteneciendo al token."""
+
+    async def cerrar(self) -> None:
+        """Cierra las conexiones del backend."""
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Devuelve el tipo de backend y sus contadores."""
+        return {
+            "tipo": type(self).__name__,
+            "compartido": self.compartido,
+            "lecturas": self.lecturas,
+            "aciertos": self.aciertos,
+            "escrituras": self.escrituras,
+            "errores": self.errores,
+        }
+
+
+class BackendMemoria(BackendCache):
+    """Backend en la memoria del propio proceso; es el que se usa con un solo worker."""
+
+    def __init__(self):
+        super().__init__()
+        self._valores: Dict[str, Tuple[float, bytes]] = {}
+        self._bloqueos: Dict[str, Tuple[float, str]] = {}
+
+    def _vigente(self, tabla: Dict[str, Tuple[float, Any]], clave: str) -> Optional[Any]:
+        entrada = tabla.get(clave)
+        if entrada is None:
+            return None
+        if entrada[0] <= time.monotonic():
+            del tabla[clave]
+            return None
+        return entrada[1]
+
+    async def leer(self, clave: str) -> Optional[bytes]:
+        self.lecturas += 1
+        valor = self._vigente(self._valores, clave)
+        self.aciertos += valor is not None
+        return valor
+
+    async def escribir(self, clave: str, valor: bytes, ttl: float) -> None:
+        self.escrituras += 1
+        self._valores[clave] = (time.monotonic() + ttl, valor)
+
+    async def bloquear(self, clave: str, ttl: float) -> Optional[str]:
+        if self._vigente(self._bloqueos, clave) is not None:
+            return None
+        token = uuid.uuid4().hex
+        self._bloqueos[clave] = (time.monotonic() + ttl, token)
+        return token
+
+    async def bloqueado(self, clave: str) -> bool:
+        return self._vigente(self._bloqueos, clave) is not None
+
+    async def desbloquear(self, clave: str, token: str) -> None:
+        if self._vigente(self._bloqueos, clave) == token:
+            del self._bloqueos[clave]
+
+
+class ErrorRESP(Exception):
+    """Error devuelto por el servidor en una respuesta RESP."""
+
+
+class ClienteRESP:
+    """
+    Cliente mínimo del protocolo RESP2 de Redis sobre asyncio.
+
+    Mantiene una conexión por event loop y envía los comandos de uno en uno; basta para
+    los comandos simples que usa la caché (GET, SET, EXISTS, EVAL).
+    """
+
+    def __init__(self, host: str = "127.0.0.1", puerto: int = 6379, db: int = 0,
+                 password: Optional[str] = None, timeout: float = 1.0):
+        self.host = host
+        self.puerto = puerto
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._lector: Optional[asyncio.StreamReader] = None
+        self._escritor: Optional[asyncio.StreamWriter] = None
+        self._bucle: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @staticmethod
+    def codificar(*argumentos: Any) -> bytes:
+        """Codifica un comando como array RESP de bulk strings."""
+        partes = [b"*%d\r\n" % len(argumentos)]
+        for argumento in argumentos:
+            dato = argumento if isinstance(argumento, bytes) else str(argumento).encode()
+            partes.append(b"$%d\r\n%s\r\n" % (len(dato), dato))
+        return b"".join(partes)
+
+    @staticmethod
+    async def leer_respuesta(lector: asyncio.StreamReader) -> Any:
+        """Lee una respuesta RESP completa del stream."""
+        linea = await lector.readuntil(b"\r\n")
+        tipo, contenido = linea[:1], linea[1:-2]
+        if tipo == b"+":
+            return contenido.decode()
+        if tipo == b"-":
+            raise ErrorRESP(contenido.decode())
+        if tipo == b":":
+            return int(contenido)
+        if tipo == b"$":
+            longitud = int(contenido)
+            if longitud < 0:
+                return None
+            return (await lector.readexactly(longitud + 2))[:-2]
+        if tipo == b"*":
+            longitud = int(contenido)
+            if longitud < 0:
+                return None
+            return [await ClienteRESP.leer_respuesta(lector) for _ in range(longitud)]
+        raise ErrorRESP(f"Respuesta RESP desconocida: {linea!r}")
+
+    async def _conectar(self) -> None:
+        self._lector, self._escritor = await asyncio.open_connection(self.host, self.puerto)
+        if self.password:
+            await self._enviar("AUTH", self.password)
+        if self.db:
+            await self._enviar("SELECT", self.db)
+
+    async def _enviar(self, *argumentos: Any) -> Any:
+        self._escritor.write(self.codificar(*argumentos))
+        await self._escritor.drain()
+        return await self.leer_respuesta(self._lector)
+
+    async def ejecutar(self, *argumentos: Any) -> Any:
+        """
+        Envía un comando y devuelve su respuesta.
+
+        Raises:
+            ErrorRESP: Si el servidor responde con un error
+            OSError, asyncio.TimeoutError: Si falla la conexión o se agota el timeout; en ese
+                caso, o si se cancela la llamada, la conexión se descarta
+        """
+        bucle = asyncio.get_running_loop()
+        if self._bucle is not bucle:
+            # Las conexiones de asyncio pertenecen al event loop que las creó
+            self._bucle, self._lock = bucle, asyncio.Lock()
+            self._lector = self._escritor = None
+        async with self._lock:
+            try:
+                if self._escritor is None or self._escritor.is_closing():
+                    await asyncio.wait_for(self._conectar(), self.timeout)
+                return await asyncio.wait_for(self._enviar(*argumentos), self.timeout)
+            except ErrorRESP:
+                # El servidor respondió entero: la conexión sigue sincronizada
+                raise
+            except BaseException:
+                # Un fallo o una cancelación a medias deja respuestas sin leer en el socket,
+                # y el siguiente comando leería la de este
+                await self._descartar_conexion()
+                raise
+
+    async def _descartar_conexion(self) -> None:
+        if self._escritor is not None:
+            self._escritor.close()
+        self._lector = self._escritor = None
+
+    async def cerrar(self) -> None:
+        """Cierra la conexión si está abierta."""
+        if self._escritor is not None and self._bucle is asyncio.get_running_loop():
+            self._escritor.close()
+            try:
+                await self._escritor.wait_closed()
+            except OSError:
+                pass
+        self._lector = self._escritor = None
+
+
+class BackendRedis(BackendCache):
+    """
+    Backend en un servidor que habla el protocolo de Redis, compartido por todos los workers.
+
+    Si el servidor no responde, las lecturas cuentan como fallos y los bloqueos se dan por
+    obtenidos, de modo que cada proceso sigue funcionando solo con su caché en memoria.
+    """
+
+    compartido = True
+
+    def __init__(self, cliente: ClienteRESP, prefijo: str = "clima:"):
+        super().__init__()
+        self.cliente = cliente
+        self.prefijo = prefijo
+
+    async def _ejecutar(self, *argumentos: Any, defecto: Any = None) -> Any:
+        try:
+            return await self.cliente.ejecutar(*argumentos)
+        except (ErrorRESP, OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+            self.errores += 1
+            print(f"Error en la caché compartida: {e!r}")
+            return defecto
+
+    async def leer(self, clave: str) -> Optional[bytes]:
+        self.lecturas += 1
+        valor = await self._ejecutar("GET", self.prefijo + clave)
+        self.aciertos += valor is not None
+        return valor
+
+    async def escribir(self, clave: str, valor: bytes, ttl: float) -> None:
+        self.escrituras += 1
+        await self._ejecutar("SET", self.prefijo + clave, valor, "PX", max(1, int(ttl * 1000)))
+
+    async def bloquear(self, clave: str, ttl: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        respuesta = await self._ejecutar("SET", f"{self.prefijo}bloqueo:{clave}", token, "NX", "PX",
+                                         max(1, int(ttl * 1000)), defecto="OK")
+        return token if respuesta == "OK" else None
+
+    async def bloqueado(self, clave: str) -> bool:
+        return bool(await self._ejecutar("EXISTS", f"{self.prefijo}bloqueo:{clave}", defecto=0))
+
+    async def desbloquear(self, clave: str, token: str) -> None:
+        await self._ejecutar("EVAL", SCRIPT_LIBERAR, 1, f"{self.prefijo}bloqueo:{clave}", token)
+
+    async def cerrar(self) -> None:
+        await self.cliente.cerrar()
+
+
+class SingleFlightCompartido:
+    """
+    Agrupa entre procesos las operaciones sobre una misma clave mediante los bloqueos del backend.
+
+    Quien obtiene el bloqueo ejecuta la operación; los demás consultan el backend hasta que
+    aparece el resultado, el bloqueo desaparece o pasan `espera_max` segundos, y solo
+    entonces la ejecutan ellos mismos.
+    """
+
+    def __init__(self, backend: BackendCache, ttl_bloqueo: float = 30, espera_max: float = 10,
+                 intervalo: float = 0.05):
+        self.backend = backend
+        self.ttl_bloqueo = ttl_bloqueo
+        self.espera_max = espera_max
+        self.intervalo = intervalo
+        self.ejecuciones = 0
+        self.esperas_resueltas = 0
+
+    async def ejecutar(self, clave: str, leer: Callable[[], Awaitable[Optional[Any]]],
+                       producir: Callable[[], Awaitable[Any]], espera_max: Optional[float] = None) -> Any:
+        """
+        Devuelve el resultado de `producir` ejecutándolo, en lo posible, en un solo proceso.
+
+        Args:
+            clave (str): Clave de la operación en el backend
+            leer (Callable): Busca en el backend el resultado producido por otro proceso
+            producir (Callable): Ejecuta la operación y guarda su resultado en el backend
+            espera_max (float, optional): Sustituye a la espera máxima configurada
+
+        Returns:
+            Any: Resultado leído del backend o producido por este proceso
+        """
+        token = await self.backend.bloquear(clave, self.ttl_bloqueo)
+        if token is None:
+            limite = time.monotonic() + (self.espera_max if espera_max is None else espera_max)
+            while time.monotonic() < limite:
+                await asyncio.sleep(self.intervalo)
+                valor = await leer()
+                if valor is not None:
+                    self.esperas_resueltas += 1
+                    return valor
+                if not await self.backend.bloqueado(clave):
+                    break
+            token = await self.backend.bloquear(clave, self.ttl_bloqueo)
+
+        self.ejecuciones += 1
+        try:
+            return await producir()
+        finally:
+            if token is not None:
+                await self.backend.desbloquear(clave, token)
+
+    def estadisticas(self) -> Dict[str, int]:
+        """Devuelve cuántas operaciones se ejecutaron aquí y cuántas se resolvieron esperando a otro proceso."""
+        return {"ejecuciones": self.ejecuciones, "esperas_resueltas": self.esperas_resueltas}
+
+
+def crear_backend() -> BackendCache:
+    """
+    Crea el backend configurado en CACHE_BACKEND: "memory" (por defecto) o "redis",
+    que se conecta a REDIS_URL (redis://[:password@]host:puerto/db).
+    """
+    if os.getenv('CACHE_BACKEND', 'memory').lower() != 'redis':
+        return BackendMemoria()
+    url = urlparse(os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/0'))
+    cliente = ClienteRESP(
+        host=url.hostname or "127.0.0.1",
+        puerto=url.port or 6379,
+        db=int(url.path.lstrip("/") or 0),
+        password=url.password,
+        timeout=float(os.getenv('REDIS_TIMEOUT', '1')),
+    )
+    return BackendRedis(cliente)
+
+
+backend_cache = crear_backend()
+coalescencia_compartida = SingleFlightCompartido(
+    backend_cache,
+    ttl_bloqueo=float(os.getenv('CACHE_LOCK_TTL', '30')),
+    espera_max=float(os.getenv('CACHE_LOCK_WAIT', '10')),
+)
@@ -0,0 +1,123 @@
+import os
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from src.modelo import PronosticoCompacto
+from src.prompt import MAX_SLOTS_PROMPT, constructor_prompt
+
+# Slots del pronóstico que pueden entrar en el texto enviado al LLM (ver src/prompt.py)
+SLOTS_INTERPRETACION = MAX_SLOTS_PROMPT
+
+
+class DetectorCambios:
+    """
+    Decide si un pronóstico nuevo cambia lo suficiente respecto al que originó la última
+    interpretación del LLM de la misma ubicación y modelo como para generar otra.
+
+    Se comparan los primeros `slots` del pronóstico emparejando los slots por su hora:
+    el cambio es material si la temperatura de algún slot varía más de
+    `umbral_temperatura` °C, la probabilidad de precipitación más de `umbral_pop`,
+    cambia la descripción (si `comparar_descripcion`) o la ventana avanzó más de
+    `max_desplazamiento` slots. La base de la comparación es siempre el pronóstico que
+    se interpretó, no el último recibido, para que los cambios pequeños no se acumulen.
+    """
+
+    def __init__(self, umbral_temperatura: float = 1.0, umbral_pop: float = 0.1,
+                 comparar_descripcion: bool = True, max_desplazamiento: int = 1,
+                 slots: int = SLOTS_INTERPRETACION, max_entradas: int = 1024):
+        self.umbral_temperatura = umbral_temperatura
+        self.umbral_pop = umbral_pop
+        self.comparar_descripcion = comparar_descripcion
+        self.max_desplazamiento = max_desplazamiento
+        self.slots = slots
+        self.max_entradas = max_entradas
+        self._bases: "OrderedDict[Tuple[Hashable, str], Tuple[Dict[int, tuple], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.reutilizadas = 0
+        self.regeneradas: Counter = Counter()
+
+    def _ventana(self, compacto: PronosticoCompacto) -> Dict[int, tuple]:
+        n = min(self.slots, len(compacto))
+        return {compacto.dt[i]: (compacto.temp[i], compacto.pop[i], compacto.descripcion[i]) for i in range(n)}
+
+    def motivo_cambio(self, base: Dict[int, tuple], compacto: PronosticoCompacto) -> Optional[str]:
+        """
+        Compara la ventana del pronóstico con la base interpretada.
+
+        Returns:
+            Optional[str]: "ventana", "temperatura", "precipitacion" o "descripcion" si el
+            cambio es material, None si la interpretación anterior sigue valiendo.
+        """
+        nueva = self._ventana(compacto)
+        if not nueva:
+            return "ventana"
+        # Slots que la ventana dejó atrás y slots nuevos que no estaban en la base
+        primero = min(nueva)
+        desplazamiento = max(sum(dt < primero for dt in base), sum(dt not in base for dt in nueva))
+        if desplazamiento > self.max_desplazamiento:
+            return "ventana"
+        for dt, (temp, pop, descripcion) in nueva.items():
+            anterior = base.get(dt)
+            if anterior is None:
+                continue
+            if abs(temp - anterior[0]) > self.umbral_temperatura:
+                return "temperatura"
+            if abs(pop - anterior[1]) > self.umbral_pop:
+                return "precipitacion"
+            if self.comparar_descripcion and descripcion != anterior[2]:
+                return "descripcion"
+        return None
+
+    def reutilizable(self, ubicacion: Hashable, modelo: str, compacto: PronosticoCompacto) -> Optional[Any]:
+        """
+        Devuelve la última interpretación de la ubicación y el modelo si el pronóstico no
+        cambió de forma material desde ella, o None si hay que generar otra.
+        """
+        with self._lock:
+            entrada = self._bases.get((ubicacion, modelo))
+            if entrada is None:
+                self.regeneradas["sin_base"] += 1
+                return None
+            motivo = self.motivo_cambio(entrada[0], compacto)
+            if motivo is not None:
+                self.regeneradas[motivo] += 1
+                return None
+            self._bases.move_to_end((ubicacion, modelo))
+            self.reutilizadas += 1
+            return entrada[1]
+
+    def registrar(self, ubicacion: Hashable, modelo: str, compacto: PronosticoCompacto, prediccion: Any) -> None:
+        """Guarda el pronóstico que originó la interpretación como base de las próximas comparaciones."""
+        with self._lock:
+            self._bases[(ubicacion, modelo)] = (self._ventana(compacto), prediccion)
+            self._bases.move_to_end((ubicacion, modelo))
+            while len(self._bases) > self.max_entradas:
+                self._bases.popitem(last=False)
+
+    def limpiar(self) -> None:
+        """Olvida todas las bases y reinicia los contadores."""
+        with self._lock:
+            self._bases.clear()
+            self.reutilizadas = 0
+            self.regeneradas.clear()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Devuelve las interpretaciones reutilizadas y las regeneradas por motivo."""
+        with self._lock:
+            return {
+                "ubicaciones": len(self._bases),
+                "reutilizadas": self.reutilizadas,
+                "regeneradas": dict(self.regeneradas),
+            }
+
+
+detector_cambios = DetectorCambios(
+    umbral_temperatura=float(os.getenv('LLM_REUSE_TEMP_DELTA', '1.0')),
+    umbral_pop=float(os.getenv('LLM_REUSE_POP_DELTA', '0.1')),
+    comparar_descripcion=os.getenv('LLM_REUSE_COMPARE_DESCRIPTION', 'true').lower() == 'true',
+    max_desplazamiento=int(os.getenv('LLM_REUSE_MAX_SHIFT_SLOTS', '1')),
+    # Se comparan todos los slots que el prompt puede incluir, aunque el presupuesto deje menos
+    slots=constructor_prompt.max_slots,
+    max_entradas=int(os.getenv('CACHE_MAX_ENTRIES', '1024')),
+)
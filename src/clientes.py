@@ -0,0 +1,122 @@
+import os
+import threading
+from typing import Dict, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# Nombres de los servicios externos; cada uno tiene su propio pool de conexiones
+OPENWEATHER = "openweather"
+LLM = "llm"
+# Notificaciones de los trabajos asíncronos a las URLs de callback de los clientes
+CALLBACKS = "callbacks"
+
+
+def _timeout_conexion() -> float:
+    return float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+
+
+def timeout_lectura(servicio: str) -> float:
+    """
+    Devuelve el timeout de lectura configurado para un servicio externo.
+
+    Args:
+        servicio (str): Nombre del servicio (OPENWEATHER o LLM)
+
+    Returns:
+        float: Timeout de lectura en segundos
+    """
+    if servicio == LLM:
+        return float(os.getenv('LLM_TIMEOUT', '30'))
+    if servicio == CALLBACKS:
+        return float(os.getenv('JOBS_CALLBACK_TIMEOUT', '10'))
+    return float(os.getenv('OPENWEATHER_TIMEOUT', '10'))
+
+
+_clientes_async: Dict[str, httpx.AsyncClient] = {}
+_sesiones: Dict[str, requests.Session] = {}
+_lock_sesiones = threading.Lock()
+
+
+def obtener_cliente_async(servicio: str) -> httpx.AsyncClient:
+    """
+    Devuelve el cliente HTTP asíncrono compartido de un servicio, creándolo si hace falta.
+
+    El cliente mantiene las conexiones abiertas (keep-alive) con límites configurables
+    mediante HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE y HTTP_KEEPALIVE_EXPIRY.
+
+    Args:
+        servicio (str): Nombre del servicio (OPENWEATHER o LLM)
+
+    Returns:
+        httpx.AsyncClient: Cliente con pool de conexiones
+    """
+    cliente = _clientes_async.get(servicio)
+    if cliente is None or cliente.is_closed:
+        limites = httpx.Limits(
+            max_connections=int(os.getenv('HTTP_MAX_CONNECTIONS', '100')),
+            max_keepalive_connections=int(os.getenv('HTTP_MAX_KEEPALIVE', '20')),
+            keepalive_expiry=float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '30')),
+        )
+        timeout = httpx.Timeout(timeout_lectura(servicio), connect=_timeout_conexion())
+        cliente = httpx.AsyncClient(limits=limites, timeout=timeout)
+        _clientes_async[servicio] = cliente
+    return cliente
+
+
+def instalar_cliente_async(servicio: str, cliente: httpx.AsyncClient) -> None:
+    """
+    Sustituye el cliente asíncrono compartido de un servicio, por ejemplo por uno con
+    `httpx.MockTransport` en las pruebas. El cliente instalado se cierra con
+    cerrar_clientes como los demás.
+
+    Args:
+        servicio (str): Nombre del servicio (OPENWEATHER, LLM o CALLBACKS)
+        cliente (httpx.AsyncClient): Cliente que usarán las llamadas al servicio
+    """
+    _clientes_async[servicio] = cliente
+
+
+def obtener_sesion(servicio: str) -> requests.Session:
+    """
+    Devuelve la sesión síncrona compartida de un servicio para reutilizar conexiones.
+
+    Args:
+        servicio (str): Nombre del servicio (OPENWEATHER o LLM)
+
+    Returns:
+        requests.Session: Sesión con pool de conexiones
+    """
+    with _lock_sesiones:
+        sesion = _sesiones.get(servicio)
+        if sesion is None:
+            tamano_pool = int(os.getenv('HTTP_MAX_KEEPALIVE', '20'))
+            adaptador = HTTPAdapter(pool_connections=tamano_pool, pool_maxsize=tamano_pool)
+            sesion = requests.Session()
+            sesion.mount("http://", adaptador)
+            sesion.mount("https://", adaptador)
+            _sesiones[servicio] = sesion
+        return sesion
+
+
+def timeouts_sincronos(servicio: str, lectura: Optional[float] = None) -> tuple:
+    """Devuelve la tupla (conexión, lectura) de timeouts para `requests`; `lectura` sustituye a la configurada."""
+    lectura = timeout_lectura(servicio) if lectura is None else lectura
+    return (min(_timeout_conexion(), lectura), lectura)
+
+
+def timeout_async(lectura: float) -> httpx.Timeout:
+    """Devuelve un timeout de httpx con la lectura indicada, sin que la conexión la supere."""
+    return httpx.Timeout(lectura, connect=min(_timeout_conexion(), lectura))
+
+
+async def cerrar_clientes() -> None:
+    """Cierra todos los clientes y sesiones compartidos."""
+    for cliente in list(_clientes_async.values()):
+        await cliente.aclose()
+    _clientes_async.clear()
+    with _lock_sesiones:
+        for sesion in _sesiones.values():
+            sesion.close()
+        _sesiones.clear()
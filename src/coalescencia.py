@@ -0,0 +1,83 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from src.metricas import medir
+from src.resiliencia import ServicioNoDisponibleError, tiempo_restante
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas concurrentes idénticas en una sola operación en curso.
+
+    La primera llamada para una clave lanza la operación; las que llegan mientras
+    sigue en curso esperan esa misma tarea y comparten su resultado o su excepción.
+    Cada llamador espera como mucho el tiempo que le queda a su propia petición,
+    aunque la operación siga en curso para los demás.
+
+    Las etapas medidas dentro de la operación cuentan solo para la petición que la lanzó;
+    la espera de las demás se mide como la etapa `etapa_espera`.
+    """
+
+    def __init__(self, etapa_espera: str = "espera"):
+        self.etapa_espera = etapa_espera
+        self._en_curso: Dict[Hashable, asyncio.Task] = {}
+        self.ejecuciones = 0
+        self.coalescidas = 0
+
+    async def ejecutar(self, clave: Hashable, funcion: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Ejecuta `funcion` una sola vez por clave entre los llamadores concurrentes.
+
+        Args:
+            clave (Hashable): Identificador de la operación
+            funcion (Callable): Función asíncrona sin argumentos que realiza la operación
+
+        Returns:
+            Any: Resultado de la operación compartida
+
+        Raises:
+            ServicioNoDisponibleError: Si la petición del llamador agota su tiempo límite esperando
+        """
+        tarea = self._en_curso.get(clave)
+        if tarea is None:
+            self.ejecuciones += 1
+            tarea = asyncio.ensure_future(funcion())
+            self._en_curso[clave] = tarea
+            tarea.add_done_callback(lambda t: self._finalizar(clave, t))
+        else:
+            self.coalescidas += 1
+            with medir(self.etapa_espera):
+                return await self._esperar(tarea)
+        return await self._esperar(tarea)
+
+    async def _esperar(self, tarea: asyncio.Task) -> Any:
+        # shield evita que cancelar a un llamador cancele la operación de los demás
+        restante = tiempo_restante()
+        if restante is None:
+            return await asyncio.shield(tarea)
+        try:
+            return await asyncio.wait_for(asyncio.shield(tarea), max(0.0, restante))
+        except asyncio.TimeoutError:
+            # La operación pudo terminar mientras se cancelaba la espera
+            if tarea.done() and not tarea.cancelled():
+                return tarea.result()
+            raise ServicioNoDisponibleError("Tiempo límite de la petición agotado") from None
+
+    def _finalizar(self, clave: Hashable, tarea: asyncio.Task) -> None:
+        if self._en_curso.get(clave) is tarea:
+            del self._en_curso[clave]
+        if not tarea.cancelled():
+            # Marca la excepción como consultada aunque ningún llamador siga esperando
+            tarea.exception()
+
+    def estadisticas(self) -> Dict[str, int]:
+        """Devuelve cuántas operaciones se ejecutaron y cuántas llamadas se agruparon."""
+        return {
+            "en_curso": len(self._en_curso),
+            "ejecuciones": self.ejecuciones,
+            "coalescidas": self.coalescidas,
+        }
+
+
+coalescencia_pronosticos = SingleFlight("espera_openweather")
+coalescencia_llm = SingleFlight("espera_llm")
@@ -0,0 +1,220 @@
+import os
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Hashable, List, Optional
+
+from src.metricas import COLA_LLM_EN_ESPERA, COLA_LLM_RECHAZADAS, medir
+from src.resiliencia import ServicioNoDisponibleError, tiempo_restante
+
+# Clases de prioridad: un número menor se atiende antes
+PRIORIDAD_ALTA = 0
+PRIORIDAD_NORMAL = 1
+PRIORIDAD_SEGUNDO_PLANO = 2
+
+
+class ColaLlenaError(ServicioNoDisponibleError):
+    """Se lanza cuando la cola de un modelo está llena; `reintentar_en` estima la espera en segundos."""
+
+    def __init__(self, modelo: str, reintentar_en: int):
+        super().__init__(f"Cola del LLM {modelo} llena, reintentar en {reintentar_en} s")
+        self.reintentar_en = reintentar_en
+
+
+class _EstadoModelo:
+    __slots__ = ("limite", "en_curso", "espera", "etiquetas", "duracion_media", "atendidas", "rechazadas",
+                 "promovidas", "espera_total")
+
+    def __init__(self, limite: int):
+        self.limite = limite
+        self.en_curso = 0
+        # Montículo de [prioridad, secuencia, futuro, etiqueta] de las llamadas que esperan turno
+        self.espera: List[Any] = []
+        # Entradas en espera por etiqueta, para poder adelantarlas (ver ColaLLM.promover)
+        self.etiquetas: Dict[Hashable, List[Any]] = {}
+        self.duracion_media = 1.0
+        self.atendidas = 0
+        self.rechazadas = 0
+        self.promovidas = 0
+        self.espera_total = 0.0
+
+    def quitar_etiqueta(self, entrada: List[Any]) -> None:
+        if entrada[3] is not None and self.etiquetas.get(entrada[3]) is entrada:
+            del self.etiquetas[entrada[3]]
+
+
+class ColaLLM:
+    """
+    Cola de admisión para las generaciones del LLM.
+
+    Cada modelo (hash del LLM) admite como máximo `concurrencia` generaciones a la vez por
+    cada backend que lo sirve, salvo que tenga un límite propio; el resto espera por orden
+    de prioridad y de llegada hasta `max_profundidad` llamadas. Si la cola está llena la
+    llamada se rechaza al momento con ColaLlenaError, y si la petición agota su tiempo
+    límite mientras espera se descarta sin llegar al LLM. Una llamada en espera con
+    etiqueta se puede adelantar con `promover` cuando otra de más prioridad necesita su
+    resultado.
+    """
+
+    def __init__(self, concurrencia: int = 2, max_profundidad: int = 32,
+                 concurrencia_por_modelo: Optional[Dict[str, int]] = None):
+        self.concurrencia = concurrencia
+        self.max_profundidad = max_profundidad
+        self.concurrencia_por_modelo = concurrencia_por_modelo or {}
+        self._modelos: Dict[str, _EstadoModelo] = {}
+        self._secuencia = itertools.count()
+
+    def _estado(self, modelo: str, replicas: int = 1) -> _EstadoModelo:
+        # El límite sigue a los backends que sirven el modelo en cada momento
+        limite = self.concurrencia_por_modelo.get(modelo, self.concurrencia * max(1, replicas))
+        estado = self._modelos.get(modelo)
+        if estado is None:
+            estado = _EstadoModelo(limite)
+            self._modelos[modelo] = estado
+        elif estado.limite != limite:
+            estado.limite = limite
+            self._despertar(modelo, estado)
+        return estado
+
+    def _despertar(self, modelo: str, estado: _EstadoModelo) -> None:
+        """Da turno a las llamadas en espera que caben tras subir el límite."""
+        while estado.espera and estado.en_curso < estado.limite:
+            entrada = heapq.heappop(estado.espera)
+            estado.quitar_etiqueta(entrada)
+            if not entrada[2].done():
+                entrada[2].set_result(None)
+                estado.en_curso += 1
+        COLA_LLM_EN_ESPERA.establecer(modelo, valor=len(estado.espera))
+
+    def _estimar_espera(self, estado: _EstadoModelo) -> int:
+        turnos = math.ceil((len(estado.espera) + 1) / estado.limite)
+        return max(1, math.ceil(turnos * estado.duracion_media))
+
+    async def _adquirir(self, modelo: str, prioridad: int, replicas: int, etiqueta: Optional[Hashable]) -> None:
+        estado = self._estado(modelo, replicas)
+        if estado.en_curso < estado.limite and not estado.espera:
+            estado.en_curso += 1
+            return
+        if len(estado.espera) >= self.max_profundidad:
+            estado.rechazadas += 1
+            COLA_LLM_RECHAZADAS.incrementar(modelo)
+            raise ColaLlenaError(modelo, self._estimar_espera(estado))
+
+        futuro = asyncio.get_running_loop().create_future()
+        entrada = [prioridad, next(self._secuencia), futuro, etiqueta]
+        heapq.heappush(estado.espera, entrada)
+        if etiqueta is not None:
+            estado.etiquetas[etiqueta] = entrada
+        COLA_LLM_EN_ESPERA.establecer(modelo, valor=len(estado.espera))
+        try:
+            await asyncio.wait_for(futuro, tiempo_restante())
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if futuro.done() and not futuro.cancelled():
+                # El turno llegó justo al abandonar la espera: se cede al siguiente
+                self._liberar(modelo)
+            elif entrada in estado.espera:
+                estado.espera.remove(entrada)
+                heapq.heapify(estado.espera)
+                estado.quitar_etiqueta(entrada)
+                COLA_LLM_EN_ESPERA.establecer(modelo, valor=len(estado.espera))
+            if isinstance(e, asyncio.TimeoutError):
+                raise ServicioNoDisponibleError("Tiempo límite de la petición agotado en la cola del LLM") from None
+            raise
+
+    def _liberar(self, modelo: str) -> None:
+        estado = self._modelos[modelo]
+        # Si el límite bajó, el turno se devuelve en vez de pasar a la siguiente llamada
+        while estado.espera and estado.en_curso <= estado.limite:
+            entrada = heapq.heappop(estado.espera)
+            estado.quitar_etiqueta(entrada)
+            futuro = entrada[2]
+            COLA_LLM_EN_ESPERA.establecer(modelo, valor=len(estado.espera))
+            if not futuro.done():
+                # El turno pasa directamente a la siguiente llamada en espera
+                futuro.set_result(None)
+                return
+        estado.en_curso -= 1
+
+    def promover(self, modelo: str, etiqueta: Hashable, prioridad: int) -> bool:
+        """
+        Sube a `prioridad` la llamada en espera con esa etiqueta si tenía una prioridad menor,
+        conservando su orden de llegada dentro de la nueva clase.
+
+        Returns:
+            bool: True si había una llamada en espera y se adelantó
+        """
+        estado = self._modelos.get(modelo)
+        entrada = estado.etiquetas.get(etiqueta) if estado is not None else None
+        if entrada is None or entrada[0] <= prioridad:
+            return False
+        entrada[0] = prioridad
+        heapq.heapify(estado.espera)
+        estado.promovidas += 1
+        return True
+
+    @asynccontextmanager
+    async def turno(self, modelo: str, prioridad: int = PRIORIDAD_NORMAL, replicas: int = 1,
+                    etiqueta: Optional[Hashable] = None) -> AsyncIterator[None]:
+        """
+        Espera un turno de generación para el modelo y lo mantiene mientras dura el bloque.
+
+        La espera se mide como la etapa "cola_llm", separada de la generación ("llm").
+
+        Args:
+            modelo (str): Hash del modelo LLM
+            prioridad (int): PRIORIDAD_ALTA, PRIORIDAD_NORMAL o PRIORIDAD_SEGUNDO_PLANO
+            replicas (int): Backends que sirven ahora el modelo; multiplican su concurrencia y
+                el límite se recalcula en cada llamada
+            etiqueta (Hashable, optional): Identifica la llamada en espera para `promover`
+
+        Raises:
+            ColaLlenaError: Si la cola del modelo está llena
+            ServicioNoDisponibleError: Si la petición agota su tiempo límite esperando
+        """
+        inicio = time.perf_counter()
+        with medir("cola_llm"):
+            await self._adquirir(modelo, prioridad, replicas, etiqueta)
+        estado = self._modelos[modelo]
+        comienzo = time.perf_counter()
+        estado.espera_total += comienzo - inicio
+        try:
+            yield
+        finally:
+            estado.atendidas += 1
+            estado.duracion_media = 0.8 * estado.duracion_media + 0.2 * (time.perf_counter() - comienzo)
+            self._liberar(modelo)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Devuelve, por modelo, las generaciones en curso, en espera, atendidas, rechazadas y promovidas."""
+        return {
+            modelo: {
+                "limite": estado.limite,
+                "en_curso": estado.en_curso,
+                "en_espera": len(estado.espera),
+                "atendidas": estado.atendidas,
+                "rechazadas": estado.rechazadas,
+                "promovidas": estado.promovidas,
+                "espera_media_s": round(estado.espera_total / estado.atendidas, 4) if estado.atendidas else 0.0,
+                "generacion_media_s": round(estado.duracion_media, 4),
+            }
+            for modelo, estado in self._modelos.items()
+        }
+
+
+def _concurrencia_por_modelo(valor: str) -> Dict[str, int]:
+    """Interpreta LLM_QUEUE_CONCURRENCY_BY_HASH con el formato "hash:limite,hash:limite"."""
+    limites = {}
+    for par in filter(None, (p.strip() for p in valor.split(","))):
+        modelo, _, limite = par.rpartition(":")
+        limites[modelo] = int(limite)
+    return limites
+
+
+cola_llm = ColaLLM(
+    concurrencia=int(os.getenv('LLM_QUEUE_CONCURRENCY', '2')),
+    max_profundidad=int(os.getenv('LLM_QUEUE_MAX_DEPTH', '32')),
+    concurrencia_por_modelo=_concurrencia_por_modelo(os.getenv('LLM_QUEUE_CONCURRENCY_BY_HASH', '')),
+)
@@ -0,0 +1,104 @@
+import os
+import time
+import threading
+from typing import Any, Dict, Optional
+
+# Prioridades de las llamadas a OpenWeatherMap
+INTERACTIVA = "interactiva"
+SEGUNDO_PLANO = "segundo_plano"
+
+SEGUNDOS_DIA = 86400
+
+
+class LimitadorCuota:
+    """
+    Reparte la cuota de la API key de OpenWeatherMap entre las llamadas.
+
+    El límite por minuto es una cubeta de fichas que se rellena de forma continua; el
+    límite por día es un contador que se reinicia a medianoche UTC, como la cuota del
+    proveedor. Las llamadas en segundo plano no pueden consumir la fracción
+    `reserva_segundo_plano` de ninguno de los dos límites, que queda para las
+    interactivas. Un 429 del proveedor bloquea todas las llamadas durante su Retry-After.
+    Un límite de 0 desactiva esa comprobación.
+    """
+
+    def __init__(self, por_minuto: float = 60, por_dia: int = 0, reserva_segundo_plano: float = 0.2):
+        self.por_minuto = por_minuto
+        self.por_dia = por_dia
+        self.reserva_segundo_plano = reserva_segundo_plano
+        self._fichas = float(por_minuto)
+        self._ultima_recarga = time.monotonic()
+        self._dia = int(time.time() // SEGUNDOS_DIA)
+        self.usadas_hoy = 0
+        self._bloqueado_hasta = 0.0
+        self._lock = threading.Lock()
+        self.autorizadas = 0
+        self.denegadas = {INTERACTIVA: 0, SEGUNDO_PLANO: 0}
+        self.bloqueos = 0
+
+    def _recargar(self) -> None:
+        ahora = time.monotonic()
+        self._fichas = min(self.por_minuto, self._fichas + (ahora - self._ultima_recarga) * self.por_minuto / 60)
+        self._ultima_recarga = ahora
+        dia = int(time.time() // SEGUNDOS_DIA)
+        if dia != self._dia:
+            self._dia = dia
+            self.usadas_hoy = 0
+
+    def autorizar(self, prioridad: str = INTERACTIVA) -> bool:
+        """
+        Consume una llamada de la cuota si queda presupuesto para la prioridad indicada.
+
+        Args:
+            prioridad (str): INTERACTIVA o SEGUNDO_PLANO
+
+        Returns:
+            bool: True si la llamada puede hacerse
+        """
+        reserva = self.reserva_segundo_plano if prioridad == SEGUNDO_PLANO else 0.0
+        with self._lock:
+            self._recargar()
+            permitida = (
+                time.monotonic() >= self._bloqueado_hasta
+                and (not self.por_minuto or self._fichas >= 1 + reserva * self.por_minuto)
+                and (not self.por_dia or self.usadas_hoy + 1 + reserva * self.por_dia <= self.por_dia)
+            )
+            if not permitida:
+                self.denegadas[prioridad] += 1
+                return False
+            self._fichas -= 1
+            self.usadas_hoy += 1
+            self.autorizadas += 1
+            return True
+
+    def bloquear(self, retry_after: Optional[str]) -> None:
+        """Suspende las llamadas tras un 429 durante los segundos de Retry-After (60 si no se indica)."""
+        try:
+            segundos = float(retry_after) if retry_after else 60.0
+        except ValueError:
+            segundos = 60.0
+        with self._lock:
+            self._bloqueado_hasta = max(self._bloqueado_hasta, time.monotonic() + segundos)
+            self.bloqueos += 1
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Devuelve el consumo de la cuota y las llamadas denegadas por prioridad."""
+        with self._lock:
+            self._recargar()
+            return {
+                "por_minuto": self.por_minuto,
+                "por_dia": self.por_dia,
+                "disponibles_minuto": round(self._fichas, 2),
+                "usadas_hoy": self.usadas_hoy,
+                "autorizadas": self.autorizadas,
+                "denegadas": dict(self.denegadas),
+                "bloqueos_429": self.bloqueos,
+                "bloqueado_durante_s": round(max(0.0, self._bloqueado_hasta - time.monotonic()), 1),
+            }
+
+
+cuota_openweather = LimitadorCuota(
+    por_minuto=float(os.getenv('OPENWEATHER_CALLS_PER_MINUTE', '60')),
+    por_dia=int(os.getenv('OPENWEATHER_CALLS_PER_DAY', '0')),
+    reserva_segundo_plano=float(os.getenv('OPENWEATHER_BACKGROUND_RESERVE', '0.2')),
+)
@@ -0,0 +1,70 @@
+import math
+from typing import Dict, List, Set, Tuple
+
+RADIO_TIERRA_KM = 6371.0088
+KM_POR_GRADO = math.pi * RADIO_TIERRA_KM / 180
+
+
+def distancia_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distancia de círculo máximo (haversine) entre dos coordenadas, en kilómetros."""
+    fi1, fi2 = math.radians(lat1), math.radians(lat2)
+    dfi = fi2 - fi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dfi / 2) ** 2 + math.cos(fi1) * math.cos(fi2) * math.sin(dlambda / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class IndiceEspacial:
+    """
+    Índice de vecinos más cercanos sobre puntos (lat, lon), agrupados en cubetas de
+    `tamano_cubeta` grados. Una búsqueda solo recorre las cubetas que cubren el radio
+    pedido, así que su coste depende de los puntos cercanos y no del total.
+    """
+
+    def __init__(self, tamano_cubeta: float = 0.1):
+        self.tamano_cubeta = tamano_cubeta
+        self._columnas = max(1, round(360 / tamano_cubeta))
+        self._cubetas: Dict[Tuple[int, int], Set[Tuple[float, float]]] = {}
+
+    def _cubeta(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.tamano_cubeta), math.floor(lon / self.tamano_cubeta) % self._columnas
+
+    def agregar(self, lat: float, lon: float) -> None:
+        self._cubetas.setdefault(self._cubeta(lat, lon), set()).add((lat, lon))
+
+    def quitar(self, lat: float, lon: float) -> None:
+        cubeta = self._cubeta(lat, lon)
+        puntos = self._cubetas.get(cubeta)
+        if puntos is not None:
+            puntos.discard((lat, lon))
+            if not puntos:
+                del self._cubetas[cubeta]
+
+    def limpiar(self) -> None:
+        self._cubetas.clear()
+
+    def cercanos(self, lat: float, lon: float, radio_km: float) -> List[Tuple[float, Tuple[float, float]]]:
+        """
+        Devuelve los puntos a menos de `radio_km` de las coordenadas, del más cercano al más lejano.
+
+        Returns:
+            List[Tuple[float, Tuple[float, float]]]: Pares (distancia en km, punto)
+        """
+        fila, columna = self._cubeta(lat, lon)
+        margen_lat = math.ceil(radio_km / KM_POR_GRADO / self.tamano_cubeta)
+        coseno = math.cos(math.radians(min(89.9, abs(lat) + margen_lat * self.tamano_cubeta)))
+        margen_lon = min(self._columnas // 2, math.ceil(radio_km / (KM_POR_GRADO * coseno) / self.tamano_cubeta))
+
+        resultado = []
+        columnas = {(columna + d) % self._columnas for d in range(-margen_lon, margen_lon + 1)}
+        for f in range(fila - margen_lat, fila + margen_lat + 1):
+            for c in columnas:
+                for punto in self._cubetas.get((f, c), ()):
+                    distancia = distancia_km(lat, lon, *punto)
+                    if distancia <= radio_km:
+                        resultado.append((distancia, punto))
+        resultado.sort()
+        return resultado
+
+    def __len__(self) -> int:
+        return sum(len(puntos) for puntos in self._cubetas.values())
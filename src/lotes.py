@@ -0,0 +1,106 @@
+import os
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from src.cache import cache_pronosticos
+from src.modelo import PronosticoCompacto
+from src.queries import obtener_pronostico_cercano_async, obtener_pronostico_compacto_async, renderizar_pronostico
+
+
+def max_coordenadas_lote() -> int:
+    """Número máximo de coordenadas aceptadas en una sola petición por lotes."""
+    return int(os.getenv('BATCH_MAX_COORDINATES', '500'))
+
+
+def _agrupar_por_celda(coordenadas: List[Tuple[float, float]],
+                       por_celda: bool = True) -> Dict[Tuple[float, float], List[int]]:
+    """
+    Agrupa los índices de las coordenadas que caen en la misma celda de la caché o, sin
+    `por_celda`, los de las coordenadas idénticas
+    """
+    grupos: Dict[Tuple[float, float], List[int]] = {}
+    for indice, (lat, lon) in enumerate(coordenadas):
+        clave = cache_pronosticos.celda(lat, lon) if por_celda else (lat, lon)
+        grupos.setdefault(clave, []).append(indice)
+    return grupos
+
+
+def _resultado(indice: int, lat: float, lon: float, pronostico: Optional[PronosticoCompacto],
+               procesar: Callable[[PronosticoCompacto], Any],
+               origen: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """Construye el resultado de un elemento del lote, con su error si no hubo pronóstico"""
+    if not pronostico:
+        return {"indice": indice, "lat": lat, "lon": lon, "error": "No se pudo obtener el pronóstico"}
+    resultado = {"indice": indice, "lat": lat, "lon": lon, "pronostico": procesar(pronostico)}
+    if origen is not None:
+        resultado["origen"] = origen
+    return resultado
+
+
+async def iterar_pronosticos_lote(coordenadas: List[Tuple[float, float]],
+                                  procesar: Callable[[PronosticoCompacto], Any] = renderizar_pronostico,
+                                  max_distancia_km: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Obtiene el pronóstico de varias coordenadas y devuelve cada resultado según termina.
+
+    Las coordenadas de una misma celda se consultan una sola vez y el número de
+    consultas simultáneas a OpenWeatherMap se limita con BATCH_CONCURRENCY. Con
+    `max_distancia_km` cada coordenada distinta busca el pronóstico vigente más cercano,
+    como en /prediction, y su resultado incluye el `origen`; las descargas de una misma
+    celda se siguen agrupando en una sola.
+
+    Args:
+        coordenadas (List[Tuple[float, float]]): Pares (lat, lon) en el orden de entrada
+        procesar (Callable): Función que genera la salida a partir del pronóstico compacto
+        max_distancia_km (float, optional): Distancia máxima para servir un pronóstico cercano en caché
+
+    Yields:
+        Dict: Resultado de cada coordenada con su índice de entrada
+    """
+    semaforo = asyncio.Semaphore(int(os.getenv('BATCH_CONCURRENCY', '10')))
+
+    async def consultar_celda(indices: List[int]
+                              ) -> Tuple[List[int], Optional[PronosticoCompacto], Optional[Dict[str, float]]]:
+        lat, lon = coordenadas[indices[0]]
+        async with semaforo:
+            try:
+                if max_distancia_km is None:
+                    return indices, await obtener_pronostico_compacto_async(lat, lon), None
+                return (indices, *await obtener_pronostico_cercano_async(lat, lon, max_distancia_km))
+            except Exception as e:
+                print(f"Error en el lote para ({lat}, {lon}): {e}")
+                return indices, None, None
+
+    # Con distancia máxima el pronóstico cercano depende de la coordenada exacta, no solo de su celda
+    grupos = _agrupar_por_celda(coordenadas, por_celda=max_distancia_km is None)
+    tareas = [asyncio.ensure_future(consultar_celda(indices)) for indices in grupos.values()]
+    try:
+        for completada in asyncio.as_completed(tareas):
+            indices, pronostico, origen = await completada
+            for indice in indices:
+                lat, lon = coordenadas[indice]
+                yield _resultado(indice, lat, lon, pronostico, procesar, origen)
+    finally:
+        # Si el cliente abandona el stream no se deja trabajo huérfano
+        for tarea in tareas:
+            tarea.cancel()
+
+
+async def obtener_pronosticos_lote(coordenadas: List[Tuple[float, float]],
+                                   procesar: Callable[[PronosticoCompacto], Any] = renderizar_pronostico,
+                                   max_distancia_km: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Obtiene el pronóstico de varias coordenadas y devuelve los resultados en el orden de entrada.
+
+    Args:
+        coordenadas (List[Tuple[float, float]]): Pares (lat, lon)
+        procesar (Callable): Función que genera la salida a partir del pronóstico compacto
+        max_distancia_km (float, optional): Distancia máxima para servir un pronóstico cercano en caché
+
+    Returns:
+        List[Dict]: Un resultado por coordenada, con `pronostico` o `error` (y `origen` con distancia máxima)
+    """
+    resultados: List[Dict[str, Any]] = [None] * len(coordenadas)
+    async for resultado in iterar_pronosticos_lote(coordenadas, procesar, max_distancia_km):
+        resultados[resultado["indice"]] = resultado
+    return resultados
@@ -0,0 +1,206 @@
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.cache import cache_llm, cache_pronosticos
+from src.resiliencia import ABIERTO, SEMIABIERTO, circuitos
+
+LIMITES_SEGUNDOS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LIMITES_TOKENS = (64, 128, 256, 512, 1024, 2048, 4096)
+
+
+def _escapar(valor) -> str:
+    """Escapa el valor de una etiqueta como exige el formato de texto de Prometheus."""
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(nombres: Tuple[str, ...], valores: Tuple[str, ...]) -> str:
+    if not nombres:
+        return ""
+    pares = ",".join(f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores))
+    return "{" + pares + "}"
+
+
+class Contador:
+    """Contador monótono con etiquetas, en formato de texto de Prometheus."""
+
+    tipo = "counter"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._valores: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, *valores: str, cantidad: float = 1) -> None:
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + cantidad
+
+    def exponer(self) -> List[str]:
+        with self._lock:
+            lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+            for valores, valor in sorted(self._valores.items()):
+                lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, valores)} {valor}")
+            return lineas
+
+
+class Medidor(Contador):
+    """Valor que sube y baja (gauge), como el número de llamadas en curso."""
+
+    tipo = "gauge"
+
+    def restar(self, *valores: str, cantidad: float = 1) -> None:
+        self.incrementar(*valores, cantidad=-cantidad)
+
+    def establecer(self, *valores: str, valor: float) -> None:
+        with self._lock:
+            self._valores[valores] = valor
+
+
+class Histograma:
+    """Histograma acumulativo con una etiqueta, en formato de texto de Prometheus."""
+
+    def __init__(self, nombre: str, ayuda: str, etiqueta: str, limites: Tuple[float, ...] = LIMITES_SEGUNDOS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiqueta = etiqueta
+        self.limites = limites
+        self._series: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor_etiqueta: str, valor: float) -> None:
+        with self._lock:
+            # Conteos por cubeta, seguidos de la suma y el número total de observaciones
+            serie = self._series.setdefault(valor_etiqueta, [0] * len(self.limites) + [0.0, 0])
+            for i, limite in enumerate(self.limites):
+                if valor <= limite:
+                    serie[i] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def exponer(self) -> List[str]:
+        with self._lock:
+            lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+            for valor_etiqueta, serie in sorted(self._series.items()):
+                etiqueta = f'{self.etiqueta}="{_escapar(valor_etiqueta)}"'
+                for limite, conteo in zip(self.limites, serie):
+                    lineas.append(f'{self.nombre}_bucket{{{etiqueta},le="{limite}"}} {conteo}')
+                lineas.append(f'{self.nombre}_bucket{{{etiqueta},le="+Inf"}} {serie[-1]}')
+                lineas.append(f'{self.nombre}_sum{{{etiqueta}}} {round(serie[-2], 6)}')
+                lineas.append(f'{self.nombre}_count{{{etiqueta}}} {serie[-1]}')
+            return lineas
+
+
+DURACION_ETAPAS = Histograma(
+    "clima_etapa_duracion_seconds", "Duración de cada etapa del procesamiento.", "etapa")
+DURACION_PETICIONES = Histograma(
+    "clima_peticion_duracion_seconds", "Duración total de las peticiones HTTP por ruta.", "ruta")
+RESPUESTAS_UPSTREAM = Contador(
+    "clima_upstream_respuestas_total", "Respuestas de los servicios externos por código de estado.",
+    ("servicio", "codigo"))
+UPSTREAM_EN_CURSO = Medidor(
+    "clima_upstream_en_curso", "Llamadas a servicios externos en curso.", ("servicio",))
+PETICIONES_EN_CURSO = Medidor(
+    "clima_peticiones_en_curso", "Peticiones HTTP en curso.")
+COLA_LLM_EN_ESPERA = Medidor(
+    "clima_cola_llm_en_espera", "Generaciones del LLM esperando turno en la cola de cada modelo.", ("modelo",))
+COLA_LLM_RECHAZADAS = Contador(
+    "clima_cola_llm_rechazadas_total", "Generaciones del LLM rechazadas por cola llena.", ("modelo",))
+TOKENS_PROMPT = Histograma(
+    "clima_prompt_tokens", "Tokens estimados del prompt enviado al LLM por modelo.", "modelo", LIMITES_TOKENS)
+
+_METRICAS = [DURACION_ETAPAS, DURACION_PETICIONES, RESPUESTAS_UPSTREAM, UPSTREAM_EN_CURSO, PETICIONES_EN_CURSO,
+             COLA_LLM_EN_ESPERA, COLA_LLM_RECHAZADAS, TOKENS_PROMPT]
+
+# Etapas medidas durante la petición HTTP actual, para la cabecera Server-Timing
+_etapas_peticion: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("etapas_peticion", default=None)
+
+
+@contextmanager
+def medir(etapa: str) -> Iterator[None]:
+    """Mide la duración de una etapa y la registra en el histograma y en la petición actual."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        DURACION_ETAPAS.observar(etapa, duracion)
+        etapas = _etapas_peticion.get()
+        if etapas is not None:
+            etapas.append((etapa, duracion))
+
+
+@contextmanager
+def llamada_upstream(servicio: str) -> Iterator[None]:
+    """Cuenta una llamada en curso a un servicio externo mientras dura el bloque."""
+    UPSTREAM_EN_CURSO.incrementar(servicio)
+    try:
+        yield
+    finally:
+        UPSTREAM_EN_CURSO.restar(servicio)
+
+
+def registrar_respuesta(servicio: str, codigo) -> None:
+    """Cuenta una respuesta de un servicio externo; `codigo` es el estado HTTP o "error"."""
+    RESPUESTAS_UPSTREAM.incrementar(servicio, str(codigo))
+
+
+def iniciar_peticion() -> List[Tuple[str, float]]:
+    """Empieza a recoger las etapas de la petición actual y devuelve la lista donde se guardan."""
+    etapas: List[Tuple[str, float]] = []
+    _etapas_peticion.set(etapas)
+    return etapas
+
+
+def cabecera_server_timing(etapas: List[Tuple[str, float]], total: float) -> str:
+    """Construye el valor de la cabecera Server-Timing con las etapas y el total en milisegundos."""
+    partes = [f"{etapa};dur={duracion * 1000:.2f}" for etapa, duracion in etapas]
+    partes.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(partes)
+
+
+def _metricas_cache() -> List[str]:
+    pronosticos = cache_pronosticos.estadisticas()
+    llm = cache_llm.estadisticas()
+    lineas = [
+        "# HELP clima_cache_entradas Entradas almacenadas en cada caché.",
+        "# TYPE clima_cache_entradas gauge",
+        f'clima_cache_entradas{{cache="pronosticos"}} {pronosticos["entradas"]}',
+        f'clima_cache_entradas{{cache="llm"}} {llm["entradas"]}',
+        "# HELP clima_cache_tasa_aciertos Fracción de búsquedas resueltas por la caché.",
+        "# TYPE clima_cache_tasa_aciertos gauge",
+        f'clima_cache_tasa_aciertos{{cache="pronosticos",modelo=""}} {pronosticos["tasa_aciertos"]}',
+    ]
+    for modelo, contadores in sorted(llm["por_modelo"].items()):
+        lineas.append(f'clima_cache_tasa_aciertos{{cache="llm",modelo="{_escapar(modelo)}"}} {contadores["tasa_aciertos"]}')
+    return lineas
+
+
+def _metricas_circuitos() -> List[str]:
+    codigos = {SEMIABIERTO: 1, ABIERTO: 2}
+    lineas = [
+        "# HELP clima_circuito_estado Estado de cada circuit breaker (0 cerrado, 1 semiabierto, 2 abierto).",
+        "# TYPE clima_circuito_estado gauge",
+    ]
+    rechazadas = [
+        "# HELP clima_circuito_rechazadas_total Llamadas descartadas por un circuito abierto.",
+        "# TYPE clima_circuito_rechazadas_total counter",
+    ]
+    for nombre, circuito in sorted(circuitos.items()):
+        estadisticas = circuito.estadisticas()
+        lineas.append(f'clima_circuito_estado{{circuito="{_escapar(nombre)}"}} {codigos.get(estadisticas["estado"], 0)}')
+        rechazadas.append(f'clima_circuito_rechazadas_total{{circuito="{_escapar(nombre)}"}} {estadisticas["rechazadas"]}')
+    return lineas + rechazadas
+
+
+def exponer_metricas() -> str:
+    """Devuelve todas las métricas en el formato de texto de Prometheus."""
+    lineas: List[str] = []
+    for metrica in _METRICAS:
+        lineas.extend(metrica.exponer())
+    lineas.extend(_metricas_cache())
+    lineas.extend(_metricas_circuitos())
+    return "\n".join(lineas) + "\n"
@@ -0,0 +1,125 @@
+import hashlib
+from array import array
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Union
+
+SEGUNDOS_DIA = 24 * 3600
+
+
+class PronosticoCompacto:
+    """
+    Representación numérica por columnas del pronóstico de OpenWeatherMap.
+
+    Se construye una sola vez por respuesta de OpenWeatherMap y es lo que se guarda
+    en la caché. Las columnas numéricas se almacenan en arrays tipados; la lista
+    original se conserva en `crudo` para quien necesite el resto de campos.
+    """
+
+    __slots__ = ("crudo", "zona_horaria", "dt", "temp", "pop", "weather_id", "descripcion", "display", "_huella")
+
+    def __init__(self, crudo: List[Dict[str, Any]], zona_horaria: int = 0):
+        self.crudo = crudo
+        # Desfase en segundos respecto a UTC de la ubicación (campo city.timezone)
+        self.zona_horaria = zona_horaria
+        self.dt = array('q', (item['dt'] for item in crudo))
+        self.temp = array('d', (item['main']['temp'] for item in crudo))
+        self.pop = array('d', (item.get('pop', 0) for item in crudo))
+        self.weather_id = array('i', (item['weather'][0].get('id', 0) for item in crudo))
+        self.descripcion = tuple(item['weather'][0]['description'] for item in crudo)
+        # Versión en texto para mostrar; se genera la primera vez que se pide
+        self.display: Optional[List[Dict[str, str]]] = None
+        self._huella: Optional[str] = None
+
+    @classmethod
+    def desde_json(cls, datos: Union[Dict[str, Any], List[Dict[str, Any]]]) -> "PronosticoCompacto":
+        """
+        Construye el pronóstico a partir de la respuesta JSON de OpenWeatherMap (con `list` y
+        `city.timezone`) o directamente de su lista de slots.
+        """
+        if isinstance(datos, list):
+            return cls(datos)
+        return cls(datos.get('list', []), datos.get('city', {}).get('timezone', 0))
+
+    def __len__(self) -> int:
+        return len(self.dt)
+
+    def huella(self) -> str:
+        """
+        Devuelve un hash del contenido del pronóstico, calculado una sola vez.
+
+        Dos respuestas de OpenWeatherMap con los mismos slots dan la misma huella,
+        por eso sirve como ETag de las respuestas HTTP.
+        """
+        if self._huella is None:
+            contenido = hashlib.sha1(self.dt.tobytes())
+            for columna in (self.temp, self.pop, self.weather_id):
+                contenido.update(columna.tobytes())
+            contenido.update("\x1f".join(self.descripcion).encode())
+            contenido.update(str(self.zona_horaria).encode())
+            self._huella = contenido.hexdigest()[:20]
+        return self._huella
+
+    def columnas(self) -> Dict[str, list]:
+        """
+        Devuelve el pronóstico en columnas numéricas, listo para serializar.
+
+        Returns:
+            Dict[str, list]: Columnas dt (epoch), temp (°C), pop (0-1), weather_id y descripcion
+        """
+        return {
+            "dt": self.dt.tolist(),
+            "temp": self.temp.tolist(),
+            "pop": self.pop.tolist(),
+            "weather_id": self.weather_id.tolist(),
+            "descripcion": list(self.descripcion),
+        }
+
+
+# Pronóstico que aceptan las funciones públicas del LLM: el compacto o el JSON de OpenWeatherMap
+DatosPronostico = Union[PronosticoCompacto, Dict[str, Any], List[Dict[str, Any]]]
+
+
+def como_compacto(datos: Optional[DatosPronostico]) -> Optional[PronosticoCompacto]:
+    """Convierte el JSON de OpenWeatherMap en PronosticoCompacto; el compacto o None se devuelven tal cual."""
+    if datos is None or isinstance(datos, PronosticoCompacto):
+        return datos
+    return PronosticoCompacto.desde_json(datos)
+
+
+def resumen_diario(compacto: PronosticoCompacto) -> Dict[str, Any]:
+    """
+    Agrupa los slots de 3 horas por día local de la ubicación y resume cada día.
+
+    El día se calcula con el desfase horario de la ubicación, no con el reloj del
+    servidor. Como los slots vienen ordenados por `dt`, cada día es un tramo contiguo
+    de las columnas y se resume con operaciones sobre ese tramo.
+
+    Args:
+        compacto (PronosticoCompacto): Pronóstico en representación compacta
+
+    Returns:
+        Dict: Desfase horario y, por día, temperatura mínima/máxima/media,
+        probabilidad máxima de precipitación y descripción predominante
+    """
+    dias_locales = [(dt + compacto.zona_horaria) // SEGUNDOS_DIA for dt in compacto.dt]
+
+    dias = []
+    inicio = 0
+    for fin in range(1, len(dias_locales) + 1):
+        if fin < len(dias_locales) and dias_locales[fin] == dias_locales[inicio]:
+            continue
+        temperaturas = compacto.temp[inicio:fin]
+        descripcion = Counter(compacto.descripcion[inicio:fin]).most_common(1)[0][0]
+        dias.append({
+            "fecha": datetime.fromtimestamp(dias_locales[inicio] * SEGUNDOS_DIA, tz=timezone.utc).strftime('%Y-%m-%d'),
+            "temp_min": min(temperaturas),
+            "temp_max": max(temperaturas),
+            "temp_media": round(sum(temperaturas) / len(temperaturas), 2),
+            "prob_precipitacion_max": max(compacto.pop[inicio:fin]),
+            "descripcion": descripcion.capitalize(),
+            "slots": fin - inicio,
+        })
+        inicio = fin
+
+    return {"zona_horaria": compacto.zona_horaria, "dias": dias}
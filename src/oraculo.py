@@ -0,0 +1,109 @@
+import struct
+from typing import Dict, List, Optional, Sequence
+
+from src.modelo import PronosticoCompacto
+
+# Campos del formato para oráculos, en el orden en que se codifican
+CAMPOS_ORACULO = ("dt", "temp", "pop", "weather_id")
+
+# Slots de un pronóstico de OpenWeatherMap (5 días en intervalos de 3 h): límite de la ventana
+MAX_SLOTS_ORACULO = 40
+
+# Factores de escala de los enteros: temp en centésimas de °C y pop en porcentaje
+ESCALA_TEMP = 100
+ESCALA_POP = 100
+
+# Tipo de Solidity de cada campo en la codificación ABI
+TIPOS_ABI = {"dt": "uint256[]", "temp": "int256[]", "pop": "uint256[]", "weather_id": "uint256[]"}
+
+# Formato de cada campo en la codificación empaquetada (big-endian, ancho fijo)
+FORMATOS_EMPAQUETADO = {"dt": "I", "temp": "h", "pop": "B", "weather_id": "H"}
+VERSION_EMPAQUETADO = 1
+# Cabecera: versión, máscara de campos (bit i = CAMPOS_ORACULO[i]) y número de slots
+CABECERA_EMPAQUETADO = struct.Struct(">BBH")
+
+_estructuras: Dict[Sequence[str], struct.Struct] = {}
+
+
+def validar_campos(campos: Optional[str]) -> Optional[List[str]]:
+    """
+    Convierte la lista "dt,temp" en campos ordenados según CAMPOS_ORACULO.
+
+    Returns:
+        Optional[List[str]]: Los campos pedidos (todos si no se indica ninguno), o None si
+        alguno no existe.
+    """
+    if not campos:
+        return list(CAMPOS_ORACULO)
+    pedidos = {c.strip() for c in campos.split(",") if c.strip()}
+    if not pedidos or not pedidos <= set(CAMPOS_ORACULO):
+        return None
+    return [c for c in CAMPOS_ORACULO if c in pedidos]
+
+
+def columnas_oraculo(compacto: PronosticoCompacto, desde: int = 0, slots: Optional[int] = None,
+                     campos: Sequence[str] = CAMPOS_ORACULO) -> Dict[str, List[int]]:
+    """
+    Devuelve los slots [desde, desde + slots) del pronóstico como columnas de enteros,
+    calculadas de los arrays numéricos sin pasar por el texto formateado.
+
+    Args:
+        compacto (PronosticoCompacto): Pronóstico en representación compacta
+        desde (int): Primer slot
+        slots (int, optional): Número de slots; por defecto hasta el final
+        campos (Sequence[str]): Campos a incluir, de CAMPOS_ORACULO
+
+    Returns:
+        Dict[str, List[int]]: dt (epoch), temp (°C × ESCALA_TEMP), pop (× ESCALA_POP) y weather_id
+    """
+    fin = len(compacto) if slots is None else min(len(compacto), desde + slots)
+    columnas = {}
+    if "dt" in campos:
+        columnas["dt"] = compacto.dt[desde:fin].tolist()
+    if "temp" in campos:
+        columnas["temp"] = [round(t * ESCALA_TEMP) for t in compacto.temp[desde:fin]]
+    if "pop" in campos:
+        columnas["pop"] = [round(p * ESCALA_POP) for p in compacto.pop[desde:fin]]
+    if "weather_id" in campos:
+        columnas["weather_id"] = compacto.weather_id[desde:fin].tolist()
+    return columnas
+
+
+def _palabra(valor: int) -> bytes:
+    # Palabra ABI de 32 bytes; los negativos quedan en complemento a dos
+    return (valor % (1 << 256)).to_bytes(32, "big")
+
+
+def codificar_abi(columnas: Dict[str, List[int]]) -> bytes:
+    """
+    Codifica las columnas como `abi.encode` de un array por campo, en el orden de
+    CAMPOS_ORACULO (tipos en TIPOS_ABI), para decodificarlas con `abi.decode` en un contrato.
+    """
+    bloques = [_palabra(len(valores)) + b"".join(_palabra(v) for v in valores) for valores in columnas.values()]
+    cabeza = []
+    posicion = 32 * len(bloques)
+    for bloque in bloques:
+        cabeza.append(_palabra(posicion))
+        posicion += len(bloque)
+    return b"".join(cabeza) + b"".join(bloques)
+
+
+def codificar_empaquetado(columnas: Dict[str, List[int]]) -> bytes:
+    """
+    Codifica las columnas en registros binarios de ancho fijo, uno por slot, tras una
+    cabecera CABECERA_EMPAQUETADO. Cada registro lleva los campos presentes en el orden
+    de CAMPOS_ORACULO con los formatos de FORMATOS_EMPAQUETADO, así que el slot i está
+    en una posición fija y se lee sin recorrer los anteriores.
+    """
+    campos = tuple(columnas)
+    estructura = _estructuras.get(campos)
+    if estructura is None:
+        estructura = struct.Struct(">" + "".join(FORMATOS_EMPAQUETADO[c] for c in campos))
+        _estructuras[campos] = estructura
+    mascara = sum(1 << CAMPOS_ORACULO.index(c) for c in campos)
+    n = len(next(iter(columnas.values()), []))
+    salida = bytearray(CABECERA_EMPAQUETADO.size + estructura.size * n)
+    CABECERA_EMPAQUETADO.pack_into(salida, 0, VERSION_EMPAQUETADO, mascara, n)
+    for i, registro in enumerate(zip(*columnas.values())):
+        estructura.pack_into(salida, CABECERA_EMPAQUETADO.size + i * estructura.size, *registro)
+    return bytes(salida)
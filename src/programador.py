@@ -0,0 +1,150 @@
+import os
+import time
+import asyncio
+import threading
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from src.cache import INTERVALO_SLOT, ajustar_a_rejilla, proximo_limite_slot
+
+
+class ProgramadorRefresco:
+    """
+    Refresca en segundo plano los pronósticos de las ubicaciones más consultadas.
+
+    Poco antes de cada límite de slot de 3 horas vuelve a descargar el pronóstico de
+    las `max_ubicaciones` celdas con más peticiones recientes y, si se activa, genera
+    de antemano la interpretación del LLM. El número de descargas está limitado por
+    un presupuesto por hora para no agotar la cuota de OpenWeatherMap.
+    """
+
+    def __init__(self, paso_rejilla: float = 0.01, max_ubicaciones: int = 20, anticipacion: float = 120,
+                 presupuesto_por_hora: float = 60, pregenerar_llm: bool = False):
+        self.paso_rejilla = paso_rejilla
+        self.max_ubicaciones = max_ubicaciones
+        self.anticipacion = anticipacion
+        self.presupuesto_por_hora = presupuesto_por_hora
+        self.pregenerar_llm = pregenerar_llm
+        self._conteos: Counter = Counter()
+        self._hash_llm: Dict[Tuple[float, float], Optional[str]] = {}
+        self._lock = threading.Lock()
+        self._tarea: Optional[asyncio.Task] = None
+        self._refrescar: Optional[Callable[[float, float, float], Awaitable[Any]]] = None
+        self._generar_llm: Optional[Callable[..., Awaitable[Any]]] = None
+        # Cubeta de fichas: se rellena a `presupuesto_por_hora` fichas por hora
+        self._fichas = float(presupuesto_por_hora)
+        self._ultima_recarga = time.monotonic()
+        self.refrescos = 0
+        self.pregeneraciones = 0
+        self.omitidos_por_presupuesto = 0
+        self.errores = 0
+
+    def registrar(self, lat: float, lon: float) -> None:
+        """Cuenta una petición para la celda de las coordenadas."""
+        with self._lock:
+            self._conteos[ajustar_a_rejilla(lat, lon, self.paso_rejilla)] += 1
+
+    def registrar_llm(self, lat: float, lon: float, llm_hash: Optional[str]) -> None:
+        """Recuerda el último modelo LLM usado para la celda, para poder pregenerar su interpretación."""
+        with self._lock:
+            self._hash_llm[ajustar_a_rejilla(lat, lon, self.paso_rejilla)] = llm_hash
+
+    def _consumir_ficha(self) -> bool:
+        ahora = time.monotonic()
+        self._fichas = min(
+            float(self.presupuesto_por_hora),
+            self._fichas + (ahora - self._ultima_recarga) * self.presupuesto_por_hora / 3600
+        )
+        self._ultima_recarga = ahora
+        if self._fichas < 1:
+            return False
+        self._fichas -= 1
+        return True
+
+    async def refrescar_ubicaciones_calientes(self) -> None:
+        """Refresca las celdas más consultadas dentro del presupuesto y reduce los conteos a la mitad."""
+        # Lo descargado poco antes del límite del slot se considera válido para el slot siguiente
+        expira = proximo_limite_slot(time.time() + self.anticipacion)
+
+        with self._lock:
+            calientes = [celda for celda, _ in self._conteos.most_common(self.max_ubicaciones)]
+            hashes = {celda: self._hash_llm[celda] for celda in calientes if celda in self._hash_llm}
+            # El decaimiento hace que las ubicaciones calientes sigan el tráfico reciente; las
+            # celdas que salen de los conteos olvidan también su modelo LLM
+            self._conteos = Counter({celda: n // 2 for celda, n in self._conteos.items() if n // 2})
+            self._hash_llm = {celda: h for celda, h in self._hash_llm.items() if celda in self._conteos}
+
+        for lat, lon in calientes:
+            if not self._consumir_ficha():
+                self.omitidos_por_presupuesto += 1
+                continue
+            try:
+                compacto = await self._refrescar(lat, lon, expira)
+                self.refrescos += 1
+                if compacto and self.pregenerar_llm and (lat, lon) in hashes:
+                    await self._generar_llm(compacto, hashes[(lat, lon)], ubicacion=(lat, lon))
+                    self.pregeneraciones += 1
+            except Exception as e:
+                self.errores += 1
+                print(f"Error al refrescar ({lat}, {lon}) en segundo plano: {e}")
+
+    async def _ciclo(self) -> None:
+        while True:
+            ahora = time.time()
+            objetivo = proximo_limite_slot(ahora) - self.anticipacion
+            if objetivo <= ahora:
+                objetivo += INTERVALO_SLOT
+            await asyncio.sleep(objetivo - ahora)
+            await self.refrescar_ubicaciones_calientes()
+
+    def iniciar(self, refrescar: Callable[[float, float, float], Awaitable[Any]],
+                generar_llm: Callable[..., Awaitable[Any]]) -> None:
+        """
+        Arranca el ciclo de refresco en el event loop actual.
+
+        Args:
+            refrescar (Callable): Descarga y guarda el pronóstico de (lat, lon) hasta `expira`
+            generar_llm (Callable): Genera la interpretación del LLM de un pronóstico compacto;
+                recibe también la `ubicacion` (lat, lon) de la celda
+        """
+        self._refrescar = refrescar
+        self._generar_llm = generar_llm
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.ensure_future(self._ciclo())
+
+    async def detener(self) -> None:
+        """Detiene el ciclo de refresco."""
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Devuelve los contadores del refresco en segundo plano."""
+        with self._lock:
+            calientes = [
+                {"lat": lat, "lon": lon, "peticiones": n}
+                for (lat, lon), n in self._conteos.most_common(self.max_ubicaciones)
+            ]
+        return {
+            "activo": self._tarea is not None and not self._tarea.done(),
+            "presupuesto_por_hora": self.presupuesto_por_hora,
+            "fichas_disponibles": round(self._fichas, 2),
+            "refrescos": self.refrescos,
+            "pregeneraciones_llm": self.pregeneraciones,
+            "omitidos_por_presupuesto": self.omitidos_por_presupuesto,
+            "errores": self.errores,
+            "ubicaciones_calientes": calientes,
+        }
+
+
+programador_refresco = ProgramadorRefresco(
+    paso_rejilla=float(os.getenv('CACHE_GRID_DEG', '0.01')),
+    max_ubicaciones=int(os.getenv('PREFETCH_MAX_LOCATIONS', '20')),
+    anticipacion=float(os.getenv('PREFETCH_LEAD_SECONDS', '120')),
+    presupuesto_por_hora=float(os.getenv('PREFETCH_BUDGET_PER_HOUR', '60')),
+    pregenerar_llm=os.getenv('PREFETCH_LLM', 'false').lower() == 'true',
+)
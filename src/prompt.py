@@ -0,0 +1,123 @@
+import os
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from src.modelo import PronosticoCompacto
+
+# Slots del pronóstico que entran como mucho en el prompt (unas 24 horas en slots de 3 h)
+MAX_SLOTS_PROMPT = 8
+
+SIN_DATOS = "No se pudo obtener información del clima para realizar una predicción."
+
+# Las instrucciones van antes que los datos y no cambian entre peticiones, así que todos
+# los prompts comparten este prefijo y el backend puede reutilizar su caché de prefijos
+PREFIJO_PROMPT = (
+    "Basándote en el pronóstico meteorológico de la tabla, proporciona:\n"
+    "1. Un análisis del patrón climático general\n"
+    "2. Recomendaciones de vestimenta y actividades\n"
+    "3. Alertas o precauciones importantes\n"
+    "4. Predicción de tendencias para los próximos días\n"
+    "Responde de manera clara y útil para el usuario final.\n\n"
+    "PRONÓSTICO (fecha y hora local|temperatura °C|descripción|probabilidad de precipitación %):\n"
+)
+
+# Plantilla de cada fila de la tabla, compilada una vez: fecha local, temp, descripción y pop (%)
+_FILA = "{:%d/%m %H:%M}|{:.1f}|{}|{:.0f}\n".format
+
+
+def fila_compacta(compacto: PronosticoCompacto, i: int) -> str:
+    """Genera la fila de la tabla del prompt del slot `i`, a partir de las columnas numéricas."""
+    zona = timezone(timedelta(seconds=compacto.zona_horaria))
+    return _FILA(datetime.fromtimestamp(compacto.dt[i], zona), compacto.temp[i], compacto.descripcion[i],
+                 compacto.pop[i] * 100)
+
+
+class Prompt:
+    """Texto enviado al LLM con los slots que incluye y su tamaño estimado en tokens."""
+
+    __slots__ = ("texto", "slots", "tokens_estimados", "presupuesto")
+
+    def __init__(self, texto: str, slots: int, tokens_estimados: int, presupuesto: int):
+        self.texto = texto
+        self.slots = slots
+        self.tokens_estimados = tokens_estimados
+        self.presupuesto = presupuesto
+
+    def a_dict(self) -> Dict[str, int]:
+        return {
+            "caracteres": len(self.texto),
+            "tokens_estimados": self.tokens_estimados,
+            "presupuesto_tokens": self.presupuesto,
+            "slots": self.slots,
+        }
+
+
+class ConstructorPrompt:
+    """
+    Construye el prompt del LLM a partir de las columnas del pronóstico: PREFIJO_PROMPT
+    seguido de una fila compacta por slot, tantas como quepan en el presupuesto de tokens del
+    modelo (`presupuesto_por_modelo`, o `presupuesto` si el modelo no tiene uno propio),
+    con un mínimo de `min_slots` y un máximo de `max_slots`.
+
+    Los tokens se estiman a razón de `caracteres_por_token`; es una aproximación que no
+    depende del tokenizador del modelo.
+    """
+
+    def __init__(self, presupuesto: int = 1024, presupuesto_por_modelo: Optional[Dict[str, int]] = None,
+                 max_slots: int = MAX_SLOTS_PROMPT, min_slots: int = 1, caracteres_por_token: float = 4.0):
+        self.presupuesto = presupuesto
+        self.presupuesto_por_modelo = presupuesto_por_modelo or {}
+        self.max_slots = max_slots
+        self.min_slots = min_slots
+        self.caracteres_por_token = caracteres_por_token
+
+    def estimar_tokens(self, caracteres: int) -> int:
+        return math.ceil(caracteres / self.caracteres_por_token)
+
+    def presupuesto_modelo(self, modelo: Optional[str]) -> int:
+        return self.presupuesto_por_modelo.get(modelo, self.presupuesto)
+
+    def construir(self, compacto: Optional[PronosticoCompacto], modelo: Optional[str] = None) -> Prompt:
+        """
+        Construye el prompt del pronóstico para el modelo indicado.
+
+        Args:
+            compacto (PronosticoCompacto): Pronóstico en representación compacta, o None si no se obtuvo
+            modelo (str, optional): Hash ID del modelo, para elegir su presupuesto de tokens
+
+        Returns:
+            Prompt: Texto del prompt, slots incluidos y tokens estimados
+        """
+        presupuesto = self.presupuesto_modelo(modelo)
+        if not compacto:
+            return Prompt(SIN_DATOS, 0, self.estimar_tokens(len(SIN_DATOS)), presupuesto)
+
+        limite = presupuesto * self.caracteres_por_token
+        caracteres = len(PREFIJO_PROMPT)
+        filas: List[str] = [PREFIJO_PROMPT]
+        for i in range(min(self.max_slots, len(compacto))):
+            fila = fila_compacta(compacto, i)
+            if len(filas) > self.min_slots and caracteres + len(fila) > limite:
+                break
+            filas.append(fila)
+            caracteres += len(fila)
+        return Prompt("".join(filas), len(filas) - 1, self.estimar_tokens(caracteres), presupuesto)
+
+
+def _presupuesto_por_modelo(valor: str) -> Dict[str, int]:
+    """Interpreta LLM_PROMPT_TOKENS_BY_HASH con el formato "hash:tokens,hash:tokens"."""
+    presupuestos = {}
+    for par in filter(None, (p.strip() for p in valor.split(","))):
+        modelo, _, tokens = par.rpartition(":")
+        presupuestos[modelo] = int(tokens)
+    return presupuestos
+
+
+constructor_prompt = ConstructorPrompt(
+    presupuesto=int(os.getenv('LLM_PROMPT_TOKENS', '1024')),
+    presupuesto_por_modelo=_presupuesto_por_modelo(os.getenv('LLM_PROMPT_TOKENS_BY_HASH', '')),
+    max_slots=int(os.getenv('LLM_PROMPT_MAX_SLOTS', str(MAX_SLOTS_PROMPT))),
+    min_slots=int(os.getenv('LLM_PROMPT_MIN_SLOTS', '1')),
+    caracteres_por_token=float(os.getenv('LLM_PROMPT_CHARS_PER_TOKEN', '4')),
+)
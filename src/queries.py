@@ -1,29 +1,236 @@
 import os
 import json
+import time
+import asyncio
+import httpx
 import requests
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
-from typing import Dict, Any
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 
 # Configuración inicial
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
-BASE_URL = "https://api.openweathermap.org/data/2.5"
-
-def obtener_pronostico_extendido(lat: float, lon: float) -> list:
-    """Obtiene pronóstico para 5 días (3 horas intervalo)"""
+# La caché lee su configuración del entorno, por eso se importa después de cargar .env
+from src.cache import cache_llm, cache_pronosticos, clave_llm, proximo_limite_slot  # noqa: E402
+from src.almacen import persistir_interpretacion, persistir_pronostico  # noqa: E402
+from src.coalescencia import coalescencia_llm, coalescencia_pronosticos  # noqa: E402
+from src.clientes import (LLM, OPENWEATHER, obtener_cliente_async, obtener_sesion, timeout_async,  # noqa: E402
+                          timeout_lectura, timeouts_sincronos)
+from src.modelo import DatosPronostico, PronosticoCompacto, como_compacto  # noqa: E402
+from src.espacial import distancia_km  # noqa: E402
+from src.cambios import detector_cambios  # noqa: E402
+from src.oraculo import columnas_oraculo  # noqa: E402
+from src.prompt import Prompt, constructor_prompt  # noqa: E402
+from src.metricas import TOKENS_PROMPT, llamada_upstream, medir, registrar_respuesta  # noqa: E402
+from src.programador import programador_refresco  # noqa: E402
+from src.resiliencia import CircuitBreaker, ServicioNoDisponibleError, reservar_llamada, tiempo_restante  # noqa: E402
+from src.balanceo import BackendLLM, pool_llm  # noqa: E402
+from src.cuota import INTERACTIVA, SEGUNDO_PLANO, cuota_openweather  # noqa: E402
+from src.cola_llm import PRIORIDAD_NORMAL, PRIORIDAD_SEGUNDO_PLANO, ColaLlenaError, cola_llm  # noqa: E402
+from src.cache_compartida import backend_cache, coalescencia_compartida  # noqa: E402
+
+BASE_URL = os.getenv('OPENWEATHER_BASE_URL', "https://api.openweathermap.org/data/2.5")
+
+def _url_pronostico(lat: float, lon: float) -> str:
+    """Construye la URL del pronóstico consultando el centro de la celda de la caché"""
+    # Se consulta el centro de la celda para que el resultado valga para toda ella
+    lat_celda, lon_celda = cache_pronosticos.celda(lat, lon)
     api_key = os.getenv('OPENWEATHER_APP_KEY')
-    url = f"{BASE_URL}/forecast?lat={lat}&lon={lon}&appid={api_key}&units=metric&lang=es"
+    return f"{BASE_URL}/forecast?lat={lat_celda}&lon={lon_celda}&appid={api_key}&units=metric&lang=es"
 
+def _guardar_pronostico(lat: float, lon: float, datos: Dict[str, Any],
+                        expira: Optional[float] = None) -> Optional[PronosticoCompacto]:
+    """Convierte la respuesta de OpenWeatherMap en un pronóstico compacto y lo guarda en la caché"""
+    pronostico = datos.get('list', [])
+    if not pronostico:
+        return None
+    compacto = PronosticoCompacto.desde_json(datos)
+    expira = expira or proximo_limite_slot()
+    cache_pronosticos.guardar(lat, lon, compacto, expira)
+    persistir_pronostico(cache_pronosticos.celda(lat, lon), compacto, expira)
+    return compacto
+
+def _registrar_respuesta_openweather(status_code: int, retry_after: Optional[str]) -> None:
+    """Cuenta la respuesta de OpenWeatherMap y, si es un 429, suspende las llamadas durante Retry-After"""
+    registrar_respuesta(OPENWEATHER, status_code)
+    if status_code == 429:
+        cuota_openweather.bloquear(retry_after)
+
+def obtener_pronostico_compacto(lat: float, lon: float) -> Optional[PronosticoCompacto]:
+    """
+    Obtiene el pronóstico en su representación compacta, usando la caché por celda si está vigente.
+    Si la cuota de OpenWeatherMap está agotada o la consulta falla, devuelve el pronóstico
+    guardado más cercano aunque haya expirado.
+    """
+    en_cache = cache_pronosticos.obtener(lat, lon)
+    if en_cache is not None:
+        return en_cache
+
+    if not cuota_openweather.autorizar(INTERACTIVA):
+        print("Cuota de OpenWeatherMap agotada, se usa el pronóstico guardado más cercano")
+        return cache_pronosticos.obtener_reserva(lat, lon)
+
+    response = None
     try:
-        response = requests.get(url)
+        with medir("openweather"), llamada_upstream(OPENWEATHER):
+            response = obtener_sesion(OPENWEATHER).get(_url_pronostico(lat, lon), timeout=timeouts_sincronos(OPENWEATHER))
+        _registrar_respuesta_openweather(response.status_code, response.headers.get("Retry-After"))
         response.raise_for_status()
-        return response.json().get('list', [])
+        datos = response.json()
     except requests.exceptions.RequestException as e:
+        if response is None:
+            registrar_respuesta(OPENWEATHER, "error")
+        print(f"Error pronóstico extendido: {e}")
+        return cache_pronosticos.obtener_reserva(lat, lon)
+
+    return _guardar_pronostico(lat, lon, datos)
+
+def obtener_pronostico_extendido(lat: float, lon: float) -> list:
+    """Obtiene pronóstico para 5 días (3 horas intervalo), usando la caché por celda si está vigente"""
+    compacto = obtener_pronostico_compacto(lat, lon)
+    return compacto.crudo if compacto else []
+
+async def _descargar_pronostico_async(lat: float, lon: float, expira: Optional[float] = None,
+                                      prioridad: str = INTERACTIVA) -> Optional[PronosticoCompacto]:
+    """Descarga el pronóstico de OpenWeatherMap si la cuota lo permite y lo guarda en la caché"""
+    if not cuota_openweather.autorizar(prioridad):
+        print(f"Cuota de OpenWeatherMap agotada para llamadas {prioridad}")
+        return None
+
+    response = None
+    try:
+        with medir("openweather"), llamada_upstream(OPENWEATHER):
+            response = await obtener_cliente_async(OPENWEATHER).get(_url_pronostico(lat, lon))
+        _registrar_respuesta_openweather(response.status_code, response.headers.get("Retry-After"))
+        response.raise_for_status()
+        datos = response.json()
+    except (httpx.HTTPError, httpx.InvalidURL, ValueError) as e:
+        # ValueError: respuesta 200 con un cuerpo que no es JSON
+        if response is None:
+            registrar_respuesta(OPENWEATHER, "error")
+        print(f"Error pronóstico extendido: {e}")
+        return None
+
+    return _guardar_pronostico(lat, lon, datos, expira)
+
+async def refrescar_pronostico_async(lat: float, lon: float, expira: Optional[float] = None,
+                                     prioridad: str = INTERACTIVA) -> Optional[PronosticoCompacto]:
+    """
+    Descarga de nuevo el pronóstico de la celda aunque haya uno en la caché.
+    `prioridad` (INTERACTIVA o SEGUNDO_PLANO) decide qué parte de la cuota de OpenWeatherMap puede usar.
+    """
+    try:
+        return await coalescencia_pronosticos.ejecutar(
+            cache_pronosticos.celda(lat, lon),
+            lambda: _descargar_pronostico_compartido(lat, lon, expira, prioridad)
+        )
+    except ServicioNoDisponibleError as e:
+        # La descarga sigue en curso para los demás; esta petición usa el pronóstico de reserva
         print(f"Error pronóstico extendido: {e}")
-        return []
+        return None
+
+def _clave_pronostico_compartido(lat: float, lon: float) -> str:
+    lat_celda, lon_celda = cache_pronosticos.celda(lat, lon)
+    return f"pronostico:{lat_celda}:{lon_celda}"
+
+async def _leer_pronostico_compartido(lat: float, lon: float, expira_minima: float) -> Optional[PronosticoCompacto]:
+    """Busca la celda en la caché compartida y, si vence después de `expira_minima`, la copia en la caché del proceso"""
+    datos = await backend_cache.leer(_clave_pronostico_compartido(lat, lon))
+    if datos is None:
+        return None
+    entrada = json.loads(datos)
+    if entrada["expira"] < expira_minima:
+        return None
+    compacto = PronosticoCompacto(entrada["lista"], entrada["zona_horaria"])
+    cache_pronosticos.guardar(lat, lon, compacto, entrada["expira"])
+    return compacto
+
+async def _descargar_pronostico_compartido(lat: float, lon: float, expira: Optional[float] = None,
+                                           prioridad: str = INTERACTIVA) -> Optional[PronosticoCompacto]:
+    """
+    Descarga el pronóstico una sola vez entre todos los workers: si la caché es compartida,
+    el que obtiene el bloqueo de la celda lo descarga y lo publica, y los demás lo leen de ella.
+    """
+    if not backend_cache.compartido:
+        return await _descargar_pronostico_async(lat, lon, expira, prioridad)
+
+    clave = _clave_pronostico_compartido(lat, lon)
+    expira_minima = expira or proximo_limite_slot()
+
+    async def descargar() -> Optional[PronosticoCompacto]:
+        # Otro worker pudo publicarla entre la consulta a la caché y la obtención del bloqueo
+        compacto = await _leer_pronostico_compartido(lat, lon, expira_minima)
+        if compacto is not None:
+            return compacto
+        compacto = await _descargar_pronostico_async(lat, lon, expira, prioridad)
+        if compacto is not None:
+            vence = cache_pronosticos.expiracion(lat, lon)
+            entrada = {"expira": vence, "zona_horaria": compacto.zona_horaria, "lista": compacto.crudo}
+            await backend_cache.escribir(clave, json.dumps(entrada).encode(),
+                                         vence - time.time() + cache_pronosticos.gracia_obsoleto)
+        return compacto
+
+    return await coalescencia_compartida.ejecutar(
+        clave, lambda: _leer_pronostico_compartido(lat, lon, expira_minima), descargar
+    )
+
+# Referencias a las revalidaciones en curso para que no se recolecten antes de terminar
+_revalidaciones = set()
+
+async def obtener_pronostico_compacto_async(lat: float, lon: float) -> Optional[PronosticoCompacto]:
+    """
+    Versión asíncrona de obtener_pronostico_compacto que usa el pool de conexiones compartido.
+    Las peticiones concurrentes para una misma celda comparten una única descarga y, si solo
+    hay un pronóstico recién expirado, se sirve mientras se revalida en segundo plano. Si la
+    cuota de OpenWeatherMap está agotada o la descarga falla, se sirve el pronóstico guardado
+    más cercano aunque haya expirado.
+    """
+    programador_refresco.registrar(lat, lon)
+
+    en_cache = cache_pronosticos.obtener(lat, lon)
+    if en_cache is not None:
+        return en_cache
+
+    obsoleto = cache_pronosticos.obtener_obsoleto(lat, lon)
+    if obsoleto is not None:
+        tarea = asyncio.ensure_future(refrescar_pronostico_async(lat, lon, prioridad=SEGUNDO_PLANO))
+        _revalidaciones.add(tarea)
+        tarea.add_done_callback(_revalidaciones.discard)
+        return obsoleto
+
+    compacto = await refrescar_pronostico_async(lat, lon)
+    return compacto if compacto is not None else cache_pronosticos.obtener_reserva(lat, lon)
+
+async def obtener_pronostico_cercano_async(lat: float, lon: float, max_distancia_km: float
+                                           ) -> Tuple[Optional[PronosticoCompacto], Optional[Dict[str, float]]]:
+    """
+    Sirve el pronóstico vigente en caché más cercano a las coordenadas si está a menos de
+    `max_distancia_km`; si no hay ninguno, lo obtiene como obtener_pronostico_compacto_async.
+
+    Returns:
+        Tuple: El pronóstico y su origen (`lat`, `lon` de la celda y `distancia_km` hasta ella),
+        o (None, None) si no se pudo obtener.
+    """
+    cercano = cache_pronosticos.obtener_cercano(lat, lon, max_distancia_km)
+    if cercano is not None:
+        compacto, (lat_origen, lon_origen), distancia = cercano
+        # Se cuenta como petición de la celda de origen para que el refresco la mantenga caliente
+        programador_refresco.registrar(lat_origen, lon_origen)
+    else:
+        compacto = await obtener_pronostico_compacto_async(lat, lon)
+        if compacto is None:
+            return None, None
+        lat_origen, lon_origen = cache_pronosticos.celda(lat, lon)
+        distancia = distancia_km(lat, lon, lat_origen, lon_origen)
+    return compacto, {"lat": lat_origen, "lon": lon_origen, "distancia_km": round(distancia, 3)}
+
+async def obtener_pronostico_extendido_async(lat: float, lon: float) -> list:
+    """Versión asíncrona de obtener_pronostico_extendido"""
+    compacto = await obtener_pronostico_compacto_async(lat, lon)
+    return compacto.crudo if compacto else []
 
 def formatear_fecha(timestamp: int) -> str:
     """Formatea timestamp a fecha legible"""
@@ -50,6 +257,30 @@ def procesar_pronostico(pronostico: list) -> list:
         'prob_precipitacion': f"{item.get('pop', 0)*100}%"
     } for item in pronostico]
 
+def renderizar_pronostico(compacto: PronosticoCompacto, formato: str = "display") -> Any:
+    """
+    Genera la salida del pronóstico en el formato pedido.
+
+    Args:
+        compacto (PronosticoCompacto): Pronóstico en representación compacta
+        formato (str): "raw" para columnas numéricas, "oracle" para columnas de enteros
+            escalados (ver src/oraculo.py) o "display" para textos legibles
+
+    Returns:
+        Any: Columnas numéricas o lista de registros formateados
+    """
+    if formato == "raw":
+        with medir("procesar_pronostico"):
+            return compacto.columnas()
+    if formato == "oracle":
+        with medir("procesar_pronostico"):
+            return columnas_oraculo(compacto)
+    # El texto se genera una vez por respuesta de OpenWeatherMap y se reutiliza desde la caché
+    if compacto.display is None:
+        with medir("procesar_pronostico"):
+            compacto.display = procesar_pronostico(compacto.crudo)
+    return compacto.display
+
 def mostrar_resultados(pronostico: list) -> dict:
     """Devuelve los resultados del pronóstico extendido como un diccionario (JSON)."""
     return {
@@ -64,51 +295,258 @@ def mostrar_resultados(pronostico: list) -> dict:
         ]
     }
 
-def consultar_llm_local(datos_clima: Dict[str, Any], llm_hash: str = None) -> Dict[str, Any]:
+def _solicitud_llm(compacto: Optional[PronosticoCompacto], llm_hash: str = None) -> Tuple[str, Dict[str, Any], Prompt]:
     """
-    Consulta el LLM local para generar una predicción interpretada basada en los datos del clima.
+    Prepara el payload de la consulta al LLM local. La URL depende del backend que
+    la atienda, que se elige al hacer la llamada (ver _reservar_backend).
 
     Args:
-        datos_clima (Dict): Datos del pronóstico del clima
+        compacto (PronosticoCompacto): Pronóstico en representación compacta
         llm_hash (str, optional): Hash ID del modelo LLM. Si no se proporciona, usa la variable de entorno.
 
     Returns:
-        Dict: Respuesta del LLM con la predicción interpretada
+        tuple: Hash ID del modelo, payload a enviar y el prompt construido (con su tamaño estimado)
     """
-    # Configuración del LLM desde variables de entorno
-    llm_base_url = os.getenv('LLM_BASE_URL', 'http://localhost:3001')
     llm_hash_id = llm_hash or os.getenv('LLM_HASH_ID', 'dd1a3913-6f2b-060b-9d69-7efb4bce9f01')
-    llm_timeout = int(os.getenv('LLM_TIMEOUT', '30'))
-
-    # URL del LLM local con hash configurable
-    llm_url = f"{llm_base_url}/{llm_hash_id}/message"
 
-    # Crear un texto descriptivo del clima para enviar al LLM
-    texto_clima = crear_texto_clima_para_llm(datos_clima)
+    # Crear el prompt del pronóstico ajustado al presupuesto de tokens del modelo
+    with medir("prompt"):
+        prompt = constructor_prompt.construir(compacto, llm_hash_id)
+    TOKENS_PROMPT.observar(pool_llm.modelo(llm_hash_id), prompt.tokens_estimados)
 
     # Payload para el LLM
     payload = {
-        "text": texto_clima,
+        "text": prompt.texto,
         "userId": "weather_predictor",
         "userName": "Sistema de Predicción Climática"
     }
 
-    headers = {
-        "Content-Type": "application/json"
-    }
+    return llm_hash_id, payload, prompt
+
+def _datos_clima(compacto: Optional[PronosticoCompacto]) -> Dict[str, Any]:
+    """Pronóstico formateado que acompaña a la respuesta del LLM"""
+    return {"pronostico": renderizar_pronostico(compacto)} if compacto else {}
+
+def _reservar_backend(llm_hash: Optional[str]) -> Tuple[BackendLLM, str, float]:
+    """
+    Elige el backend del LLM y reserva la llamada en su circuito.
+
+    Returns:
+        tuple: Backend elegido, URL de la consulta y timeout de lectura recortado al tiempo restante
+
+    Raises:
+        ServicioNoDisponibleError: Si no hay backend disponible o la petición no tiene tiempo
+    """
+    backend = pool_llm.elegir(llm_hash)
+    lectura = reservar_llamada(backend.circuito, timeout_lectura(LLM))
+    return backend, backend.url_mensaje(llm_hash), lectura
+
+def _guardar_interpretacion(clave: str, llm_hash_id: str, prediccion: Any) -> None:
+    """Guarda la respuesta del LLM en la caché y en el almacén persistente"""
+    expira = time.time() + cache_llm.ttl
+    modelo = pool_llm.modelo(llm_hash_id)
+    cache_llm.guardar(clave, modelo, prediccion, expira)
+    persistir_interpretacion(clave, modelo, prediccion, expira)
+
+def consultar_llm_local(compacto: Optional[DatosPronostico], llm_hash: str = None) -> Dict[str, Any]:
+    """
+    Consulta el LLM local para generar una predicción interpretada basada en los datos del clima.
+
+    Args:
+        compacto (PronosticoCompacto | Dict): Pronóstico en representación compacta, o la
+            respuesta JSON de OpenWeatherMap, que se convierte con PronosticoCompacto.desde_json
+        llm_hash (str, optional): Hash ID del modelo LLM. Si no se proporciona, usa la variable de entorno.
+
+    Returns:
+        Dict: Respuesta del LLM con la predicción interpretada
+    """
+    compacto = como_compacto(compacto)
+    llm_hash_id, payload, prompt = _solicitud_llm(compacto, llm_hash)
+    datos_clima = _datos_clima(compacto)
+
+    # Las interpretaciones se reutilizan mientras el texto enviado al LLM sea idéntico
+    clave = clave_llm(payload["text"], llm_hash_id, payload["userId"])
+    prediccion = cache_llm.obtener(clave, pool_llm.modelo(llm_hash_id))
+    if prediccion is not None:
+        return _respuesta_llm(prediccion, prompt, datos_clima)
 
     try:
-        response = requests.post(llm_url, json=payload, headers=headers, timeout=llm_timeout)
+        backend, llm_url, lectura = _reservar_backend(llm_hash)
+    except ServicioNoDisponibleError as e:
+        return _respuesta_degradada(datos_clima, str(e))
+
+    response = None
+    try:
+        with medir("llm"), llamada_upstream(LLM), backend.llamada():
+            response = obtener_sesion(LLM).post(llm_url, json=payload, timeout=timeouts_sincronos(LLM, lectura))
+        registrar_respuesta(LLM, response.status_code)
+        backend.circuito.registrar_estado_http(response.status_code)
         response.raise_for_status()
+        prediccion = response.json()
+        _guardar_interpretacion(clave, llm_hash_id, prediccion)
 
         # Retornar la respuesta del LLM
+        return _respuesta_llm(prediccion, prompt, datos_clima)
+
+    except requests.exceptions.RequestException as e:
+        if response is None:
+            registrar_respuesta(LLM, "error")
+            _registrar_fallo_llm(backend.circuito, isinstance(e, requests.exceptions.Timeout), lectura)
+        print(f"Error al consultar LLM local: {e}")
         return {
-            "success": True,
-            "prediccion_llm": response.json(),
+            "success": False,
+            "error": str(e),
             "datos_clima_originales": datos_clima
         }
 
-    except requests.exceptions.RequestException as e:
+def _respuesta_llm(prediccion: Any, prompt: Prompt, datos_clima: Dict[str, Any]) -> Dict[str, Any]:
+    """Respuesta con la interpretación del LLM, venga de la caché, del LLM o reutilizada"""
+    return {
+        "success": True,
+        "prediccion_llm": prediccion,
+        "prompt": prompt.a_dict(),
+        "datos_clima_originales": datos_clima
+    }
+
+def _respuesta_degradada(datos_clima: Dict[str, Any], error: str,
+                         reintentar_en: Optional[int] = None) -> Dict[str, Any]:
+    """Respuesta sin análisis del LLM que conserva el pronóstico ya obtenido"""
+    respuesta = {
+        "success": False,
+        "degradado": True,
+        "error": error,
+        "datos_clima_originales": datos_clima
+    }
+    if reintentar_en is not None:
+        respuesta["reintentar_en"] = reintentar_en
+    return respuesta
+
+def _registrar_fallo_llm(circuito: CircuitBreaker, es_timeout: bool, lectura: float) -> None:
+    """Registra un error de transporte del LLM; el timeout recortado por el límite de la petición no se le atribuye"""
+    if es_timeout and lectura < timeout_lectura(LLM):
+        circuito.liberar()
+    else:
+        circuito.registrar_fallo()
+
+async def _enviar_llm_async(llm_hash: Optional[str], payload: Dict[str, Any], clave: str, llm_hash_id: str,
+                            prioridad: int = PRIORIDAD_NORMAL) -> Any:
+    """
+    Espera turno en la cola del modelo, envía el payload al backend del LLM elegido,
+    guarda su respuesta JSON en la caché y la devuelve. Lanza ServicioNoDisponibleError
+    sin llamar si la cola está llena, no hay backend disponible o la petición no tiene
+    tiempo, httpx.HTTPError si la llamada falla, httpx.InvalidURL si el hash no forma una
+    URL válida y ValueError si la respuesta no es JSON.
+    """
+    # Sin backend disponible se degrada al momento en vez de esperar un turno inútil
+    disponibles = pool_llm.disponibles(llm_hash)
+    if not disponibles:
+        raise ServicioNoDisponibleError("Ningún backend del LLM disponible")
+    async with cola_llm.turno(pool_llm.modelo(llm_hash_id), prioridad, len(disponibles), etiqueta=clave):
+        backend, llm_url, lectura = _reservar_backend(llm_hash)
+        try:
+            with medir("llm"), llamada_upstream(LLM), backend.llamada():
+                response = await obtener_cliente_async(LLM).post(llm_url, json=payload, timeout=timeout_async(lectura))
+        except httpx.HTTPError as e:
+            registrar_respuesta(LLM, "error")
+            _registrar_fallo_llm(backend.circuito, isinstance(e, httpx.TimeoutException), lectura)
+            raise
+        except (httpx.InvalidURL, asyncio.CancelledError):
+            # La llamada no llegó a hacerse o no terminó: no cuenta ni como éxito ni como fallo
+            backend.circuito.liberar()
+            raise
+    registrar_respuesta(LLM, response.status_code)
+    if response.is_success:
+        try:
+            prediccion = response.json()
+        except ValueError:
+            backend.circuito.registrar_fallo()
+            raise
+    backend.circuito.registrar_estado_http(response.status_code)
+    response.raise_for_status()
+    _guardar_interpretacion(clave, llm_hash_id, prediccion)
+    return prediccion
+
+async def _generar_llm_compartido(llm_hash: Optional[str], payload: Dict[str, Any], clave: str, llm_hash_id: str,
+                                  prioridad: int = PRIORIDAD_NORMAL) -> Any:
+    """
+    Genera la interpretación una sola vez entre todos los workers: con una caché compartida,
+    el que obtiene el bloqueo de la clave llama al LLM y publica la respuesta, y los demás
+    la esperan como mucho el tiempo que le queda a su petición.
+    """
+    if not backend_cache.compartido:
+        return await _enviar_llm_async(llm_hash, payload, clave, llm_hash_id, prioridad)
+
+    clave_compartida = f"llm:{clave}"
+
+    async def leer() -> Any:
+        datos = await backend_cache.leer(clave_compartida)
+        if datos is None:
+            return None
+        prediccion = json.loads(datos)
+        cache_llm.guardar(clave, pool_llm.modelo(llm_hash_id), prediccion)
+        return prediccion
+
+    async def generar() -> Any:
+        prediccion = await leer()
+        if prediccion is None:
+            prediccion = await _enviar_llm_async(llm_hash, payload, clave, llm_hash_id, prioridad)
+            await backend_cache.escribir(clave_compartida, json.dumps(prediccion).encode(), cache_llm.ttl)
+        return prediccion
+
+    return await coalescencia_compartida.ejecutar(clave_compartida, leer, generar, tiempo_restante())
+
+async def consultar_llm_local_async(compacto: Optional[DatosPronostico], llm_hash: str = None,
+                                    prioridad: int = PRIORIDAD_NORMAL) -> Dict[str, Any]:
+    """
+    Versión asíncrona de consultar_llm_local que usa el pool de conexiones compartido.
+    Las respuestas se guardan en una caché por contenido y las consultas concurrentes
+    con el mismo texto y modelo comparten una única generación. Las generaciones pasan
+    por la cola del modelo; si está llena, el circuito del LLM está abierto, no hay backend
+    disponible, la petición agotó su tiempo o el LLM no respondió a tiempo, responde con
+    `degradado` (y `reintentar_en` si la cola está llena).
+
+    Args:
+        compacto (PronosticoCompacto | Dict): Pronóstico en representación compacta, o la
+            respuesta JSON de OpenWeatherMap, que se convierte con PronosticoCompacto.desde_json
+        llm_hash (str, optional): Hash ID del modelo LLM. Si no se proporciona, usa la variable de entorno.
+        prioridad (int): Prioridad en la cola del LLM (PRIORIDAD_ALTA, PRIORIDAD_NORMAL o PRIORIDAD_SEGUNDO_PLANO)
+
+    Returns:
+        Dict: Respuesta del LLM con la predicción interpretada
+    """
+    compacto = como_compacto(compacto)
+    llm_hash_id, payload, prompt = _solicitud_llm(compacto, llm_hash)
+    datos_clima = _datos_clima(compacto)
+
+    clave = clave_llm(payload["text"], llm_hash_id, payload["userId"])
+    prediccion = cache_llm.obtener(clave, pool_llm.modelo(llm_hash_id))
+    if prediccion is not None:
+        return _respuesta_llm(prediccion, prompt, datos_clima)
+
+    # Si la generación de este texto ya espera turno con menos prioridad, se adelanta a la
+    # de esta petición para que unirse a ella no la deje detrás del tráfico normal
+    cola_llm.promover(pool_llm.modelo(llm_hash_id), clave, prioridad)
+
+    try:
+        prediccion = await coalescencia_llm.ejecutar(
+            clave,
+            lambda: _generar_llm_compartido(llm_hash, payload, clave, llm_hash_id, prioridad)
+        )
+
+        return _respuesta_llm(prediccion, prompt, datos_clima)
+
+    except ColaLlenaError as e:
+        return _respuesta_degradada(datos_clima, str(e), e.reintentar_en)
+
+    except ServicioNoDisponibleError as e:
+        return _respuesta_degradada(datos_clima, str(e))
+
+    except httpx.TimeoutException as e:
+        # El LLM no respondió a tiempo: se degrada igual que con el circuito abierto
+        print(f"Tiempo de espera agotado al consultar LLM local: {e}")
+        return _respuesta_degradada(datos_clima, f"Tiempo de espera del LLM agotado: {e}")
+
+    except (httpx.HTTPError, httpx.InvalidURL, ValueError) as e:
         print(f"Error al consultar LLM local: {e}")
         return {
             "success": False,
@@ -116,37 +554,105 @@ def consultar_llm_local(datos_clima: Dict[str, Any], llm_hash: str = None) -> Di
             "datos_clima_originales": datos_clima
         }
 
-def crear_texto_clima_para_llm(datos_clima: Dict[str, Any]) -> str:
+async def consultar_llm_local_stream(compacto: Optional[DatosPronostico], llm_hash: str = None,
+                                     prioridad: int = PRIORIDAD_NORMAL) -> AsyncIterator[Tuple[str, Any]]:
     """
-    Crea un texto descriptivo del clima para enviar al LLM.
+    Consulta el LLM local y entrega su respuesta a medida que se genera.
+
+    Si el LLM responde con `text/event-stream`, cada bloque `data:` se entrega como un
+    evento "token". Si el LLM no admite streaming (o la respuesta está en la caché), se
+    entrega la respuesta completa como un único evento "llm". La generación ocupa un turno
+    de la cola del modelo mientras dura el stream.
 
     Args:
-        datos_clima (Dict): Datos del pronóstico del clima
+        compacto (PronosticoCompacto | Dict): Pronóstico en representación compacta, o la
+            respuesta JSON de OpenWeatherMap, que se convierte con PronosticoCompacto.desde_json
+        llm_hash (str, optional): Hash ID del modelo LLM. Si no se proporciona, usa la variable de entorno.
+        prioridad (int): Prioridad en la cola del LLM
 
-    Returns:
-        str: Texto descriptivo para el LLM
+    Yields:
+        Tuple[str, Any]: Pares (evento, datos) con eventos "token", "llm" o "error"
     """
-    if "pronostico" not in datos_clima:
-        return "No se pudo obtener información del clima para realizar una predicción."
+    compacto = como_compacto(compacto)
+    llm_hash_id, payload, prompt = _solicitud_llm(compacto, llm_hash)
 
-    pronostico = datos_clima["pronostico"]
+    clave = clave_llm(payload["text"], llm_hash_id, payload["userId"])
+    prediccion = cache_llm.obtener(clave, pool_llm.modelo(llm_hash_id))
+    if prediccion is not None:
+        yield "llm", prediccion
+        return
 
-    # Crear un resumen del pronóstico para las próximas horas/días
-    texto = "Basándote en la siguiente información meteorológica, por favor proporciona una predicción detallada y recomendaciones prácticas:\n\n"
-    texto += "PRONÓSTICO EXTENDIDO:\n"
+    try:
+        disponibles = pool_llm.disponibles(llm_hash)
+        if not disponibles:
+            raise ServicioNoDisponibleError("Ningún backend del LLM disponible")
+        async with cola_llm.turno(pool_llm.modelo(llm_hash_id), prioridad, len(disponibles)):
+            async for evento in _transmitir_llm_async(llm_hash, payload, clave, llm_hash_id):
+                yield evento
+    except ServicioNoDisponibleError as e:
+        yield "error", str(e)
+
+async def _transmitir_llm_async(llm_hash: Optional[str], payload: Dict[str, Any], clave: str,
+                                llm_hash_id: str) -> AsyncIterator[Tuple[str, Any]]:
+    """Hace la llamada en streaming al LLM; lanza ServicioNoDisponibleError si no hay backend o tiempo"""
+    backend, llm_url, lectura = _reservar_backend(llm_hash)
+    headers = {"Accept": "text/event-stream, application/json"}
+    # Hasta recibir la respuesta completa la llamada no cuenta ni como éxito ni como fallo
+    pendiente = True
 
-    for i, item in enumerate(pronostico[:8]):  # Primeros 8 registros (próximas 24 horas aprox)
-        texto += f"- {item['fecha']}: {item['temperatura']}, {item['descripcion']}, "
-        texto += f"Probabilidad de precipitación: {item['prob_precipitacion']}\n"
+    try:
+        with medir("llm"), llamada_upstream(LLM), backend.llamada():
+            async with obtener_cliente_async(LLM).stream("POST", llm_url, json=payload, headers=headers,
+                                                         timeout=timeout_async(lectura)) as response:
+                registrar_respuesta(LLM, response.status_code)
+                if response.is_error:
+                    pendiente = False
+                    backend.circuito.registrar_estado_http(response.status_code)
+                response.raise_for_status()
+
+                if response.headers.get("content-type", "").startswith("text/event-stream"):
+                    async for linea in response.aiter_lines():
+                        if linea.startswith("data:"):
+                            yield "token", linea[5:].strip()
+                    pendiente = False
+                    backend.circuito.registrar_exito()
+                    return
+
+                # Fallback para LLMs sin streaming: la respuesta llega completa en JSON
+                await response.aread()
+                pendiente = False
+                backend.circuito.registrar_exito()
+                prediccion = response.json()
+                _guardar_interpretacion(clave, llm_hash_id, prediccion)
+                yield "llm", prediccion
+
+    except (httpx.HTTPError, httpx.InvalidURL, ValueError) as e:
+        if isinstance(e, httpx.RequestError):
+            registrar_respuesta(LLM, "error")
+            pendiente = False
+            _registrar_fallo_llm(backend.circuito, isinstance(e, httpx.TimeoutException), lectura)
+        print(f"Error al consultar LLM local: {e}")
+        yield "error", str(e)
 
-    texto += "\nPor favor, proporciona:\n"
-    texto += "1. Un análisis del patrón climático general\n"
-    texto += "2. Recomendaciones de vestimenta y actividades\n"
-    texto += "3. Alertas o precauciones importantes\n"
-    texto += "4. Predicción de tendencias para los próximos días\n"
-    texto += "\nResponde de manera clara y útil para el usuario final."
+    finally:
+        # El cliente cortó el stream antes de que terminara
+        if pendiente:
+            backend.circuito.liberar()
 
-    return texto
+def crear_texto_clima_para_llm(compacto: Optional[DatosPronostico], llm_hash: str = None) -> str:
+    """
+    Crea un texto descriptivo del clima para enviar al LLM (ver src/prompt.py).
+
+    Args:
+        compacto (PronosticoCompacto | Dict): Pronóstico en representación compacta, o la
+            respuesta JSON de OpenWeatherMap, que se convierte con PronosticoCompacto.desde_json
+        llm_hash (str, optional): Hash ID del modelo LLM, que fija el presupuesto de tokens
+
+    Returns:
+        str: Texto descriptivo para el LLM
+    """
+    compacto = como_compacto(compacto)
+    return constructor_prompt.construir(compacto, llm_hash).texto
 
 def obtener_prediccion_con_llm(lat: float, lon: float, llm_hash: str = None) -> Dict[str, Any]:
     """
@@ -161,22 +667,89 @@ def obtener_prediccion_con_llm(lat: float, lon: float, llm_hash: str = None) ->
         Dict: Predicción completa con datos del clima y análisis del LLM
     """
     # Obtener datos del clima
-    pronostico = obtener_pronostico_extendido(lat, lon)
-    if not pronostico:
+    compacto = obtener_pronostico_compacto(lat, lon)
+    if not compacto:
         return {
             "success": False,
             "error": "No se pudo obtener el pronóstico del clima"
         }
 
-    # Procesar datos del clima
-    datos_pronostico = procesar_pronostico(pronostico)
-    datos_clima = {"pronostico": datos_pronostico}
-
     # Consultar LLM para obtener predicción interpretada
-    resultado_llm = consultar_llm_local(datos_clima, llm_hash)
+    resultado_llm = consultar_llm_local(compacto, llm_hash)
 
     return resultado_llm
 
+async def obtener_prediccion_con_llm_async(lat: float, lon: float, llm_hash: str = None,
+                                           prioridad: int = PRIORIDAD_NORMAL,
+                                           max_distancia_km: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Versión asíncrona de obtener_prediccion_con_llm.
+
+    Args:
+        lat (float): Latitud de la ubicación
+        lon (float): Longitud de la ubicación
+        llm_hash (str, optional): Hash ID del modelo LLM. Si no se proporciona, usa la variable de entorno.
+        prioridad (int): Prioridad en la cola del LLM
+        max_distancia_km (float, optional): Si se indica, se usa el pronóstico en caché más
+            cercano dentro de esa distancia y la respuesta incluye su `origen`
+
+    Returns:
+        Dict: Predicción completa con datos del clima y análisis del LLM
+    """
+    origen = None
+    if max_distancia_km is None:
+        programador_refresco.registrar_llm(lat, lon, llm_hash)
+        compacto = await obtener_pronostico_compacto_async(lat, lon)
+    else:
+        compacto, origen = await obtener_pronostico_cercano_async(lat, lon, max_distancia_km)
+        if origen is not None:
+            programador_refresco.registrar_llm(origen["lat"], origen["lon"], llm_hash)
+    if not compacto:
+        return {
+            "success": False,
+            "error": "No se pudo obtener el pronóstico del clima"
+        }
+
+    ubicacion = (origen["lat"], origen["lon"]) if origen is not None else (lat, lon)
+    resultado = await pregenerar_interpretacion_async(compacto, llm_hash, prioridad, ubicacion)
+    if origen is not None:
+        resultado["origen"] = origen
+    return resultado
+
+async def pregenerar_interpretacion_async(compacto: PronosticoCompacto, llm_hash: str = None,
+                                          prioridad: int = PRIORIDAD_SEGUNDO_PLANO,
+                                          ubicacion: Optional[Tuple[float, float]] = None) -> Dict[str, Any]:
+    """
+    Consulta el LLM con un pronóstico ya obtenido; su respuesta queda en la caché del LLM.
+    Por defecto usa la prioridad de segundo plano, que es la del refresco anticipado.
+    Con `ubicacion`, si el pronóstico no cambió de forma material desde la última
+    interpretación de esa celda y modelo, la reutiliza sin llamar al LLM (`reutilizada`).
+
+    Args:
+        compacto (PronosticoCompacto): Pronóstico en representación compacta
+        llm_hash (str, optional): Hash ID del modelo LLM. Si no se proporciona, usa la variable de entorno.
+        prioridad (int): Prioridad en la cola del LLM
+        ubicacion (Tuple[float, float], optional): Coordenadas del pronóstico
+
+    Returns:
+        Dict: Respuesta del LLM con la predicción interpretada
+    """
+    if ubicacion is None or os.getenv('LLM_REUSE_ENABLED', 'true').lower() != 'true':
+        return await consultar_llm_local_async(compacto, llm_hash, prioridad)
+
+    celda = cache_pronosticos.celda(*ubicacion)
+    # El modelo y el prompt se resuelven igual que en una generación nueva, para que la
+    # respuesta reutilizada tenga la misma forma y el mismo hash efectivo
+    llm_hash_id, _, prompt = _solicitud_llm(compacto, llm_hash)
+    prediccion = detector_cambios.reutilizable(celda, llm_hash_id, compacto)
+    if prediccion is not None:
+        return {**_respuesta_llm(prediccion, prompt, _datos_clima(compacto)), "reutilizada": True}
+
+    resultado = await consultar_llm_local_async(compacto, llm_hash, prioridad)
+    if resultado.get("success"):
+        detector_cambios.registrar(celda, llm_hash_id, compacto, resultado["prediccion_llm"])
+    return resultado
+
 if __name__ == "__main__":
     # Coordenadas de Bogotá
     lat, lon = 4.60971, -74.08175
@@ -0,0 +1,190 @@
+import os
+import time
+import threading
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+CERRADO = "cerrado"
+ABIERTO = "abierto"
+SEMIABIERTO = "semiabierto"
+
+
+class ServicioNoDisponibleError(Exception):
+    """Se lanza cuando una llamada se descarta sin intentarla (circuito abierto o sin tiempo)."""
+
+
+class CircuitBreaker:
+    """
+    Corta las llamadas a un servicio externo cuando su tasa de fallos es demasiado alta.
+
+    En estado cerrado las llamadas pasan y se registra su resultado en una ventana
+    deslizante de `ventana` segundos. Si hay al menos `minimo_llamadas` y la fracción de
+    fallos alcanza `umbral_fallos`, el circuito se abre y rechaza las llamadas durante
+    `tiempo_apertura` segundos. Después pasa a semiabierto y deja pasar `sondas` llamadas
+    de prueba: si tienen éxito se cierra y, si alguna falla, se vuelve a abrir.
+    """
+
+    def __init__(self, nombre: str, umbral_fallos: float = 0.5, minimo_llamadas: int = 5,
+                 ventana: float = 60, tiempo_apertura: float = 30, sondas: int = 1):
+        self.nombre = nombre
+        self.umbral_fallos = umbral_fallos
+        self.minimo_llamadas = minimo_llamadas
+        self.ventana = ventana
+        self.tiempo_apertura = tiempo_apertura
+        self.sondas = sondas
+        self.estado = CERRADO
+        self._resultados: deque = deque()
+        self._abierto_hasta = 0.0
+        self._sondas_en_curso = 0
+        self._sondas_exitosas = 0
+        self._lock = threading.Lock()
+        self.rechazadas = 0
+        self.aperturas = 0
+
+    def _purgar(self, ahora: float) -> None:
+        while self._resultados and self._resultados[0][0] <= ahora - self.ventana:
+            self._resultados.popleft()
+
+    def permitir(self) -> bool:
+        """
+        Indica si se puede hacer una llamada; en semiabierto reserva una de las sondas.
+
+        Returns:
+            bool: False si el circuito está abierto o no quedan sondas disponibles.
+        """
+        with self._lock:
+            ahora = time.monotonic()
+            if self.estado == ABIERTO and ahora >= self._abierto_hasta:
+                self.estado = SEMIABIERTO
+                self._sondas_en_curso = 0
+                self._sondas_exitosas = 0
+            if self.estado == CERRADO:
+                return True
+            if self.estado == SEMIABIERTO and self._sondas_en_curso < self.sondas:
+                self._sondas_en_curso += 1
+                return True
+            self.rechazadas += 1
+            return False
+
+    def _abrir(self, ahora: float) -> None:
+        self.estado = ABIERTO
+        self._abierto_hasta = ahora + self.tiempo_apertura
+        self._resultados.clear()
+        self.aperturas += 1
+
+    def registrar_exito(self) -> None:
+        """Registra una llamada correcta."""
+        with self._lock:
+            ahora = time.monotonic()
+            if self.estado == SEMIABIERTO:
+                self._sondas_exitosas += 1
+                if self._sondas_exitosas >= self.sondas:
+                    self.estado = CERRADO
+                    self._resultados.clear()
+                return
+            self._resultados.append((ahora, True))
+            self._purgar(ahora)
+
+    def registrar_fallo(self) -> None:
+        """Registra una llamada fallida y abre el circuito si se supera el umbral."""
+        with self._lock:
+            ahora = time.monotonic()
+            if self.estado == SEMIABIERTO:
+                self._abrir(ahora)
+                return
+            if self.estado == ABIERTO:
+                return
+            self._resultados.append((ahora, False))
+            self._purgar(ahora)
+            fallos = sum(1 for _, exito in self._resultados if not exito)
+            if len(self._resultados) >= self.minimo_llamadas and fallos / len(self._resultados) >= self.umbral_fallos:
+                self._abrir(ahora)
+
+    def registrar_estado_http(self, codigo: int) -> None:
+        """Registra una respuesta HTTP; solo los errores 5xx cuentan como fallo del servicio."""
+        if codigo >= 500:
+            self.registrar_fallo()
+        else:
+            self.registrar_exito()
+
+    def liberar(self) -> None:
+        """Devuelve la sonda reservada por una llamada que terminó sin resultado atribuible al servicio."""
+        with self._lock:
+            if self.estado == SEMIABIERTO and self._sondas_en_curso > 0:
+                self._sondas_en_curso -= 1
+
+    def reintentar_en(self) -> float:
+        """Segundos que faltan para que el circuito abierto admita una sonda."""
+        with self._lock:
+            return max(0.0, self._abierto_hasta - time.monotonic()) if self.estado == ABIERTO else 0.0
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Devuelve el estado del circuito y sus contadores."""
+        with self._lock:
+            self._purgar(time.monotonic())
+            fallos = sum(1 for _, exito in self._resultados if not exito)
+            return {
+                "estado": self.estado,
+                "llamadas_en_ventana": len(self._resultados),
+                "fallos_en_ventana": fallos,
+                "aperturas": self.aperturas,
+                "rechazadas": self.rechazadas,
+            }
+
+
+# Circuitos creados, por nombre, para exponer su estado en las métricas
+circuitos: Dict[str, CircuitBreaker] = {}
+
+
+def crear_circuito_llm(nombre: str) -> CircuitBreaker:
+    """Crea un circuit breaker para un LLM con la configuración de las variables de entorno."""
+    circuitos[nombre] = CircuitBreaker(
+        nombre,
+        umbral_fallos=float(os.getenv('LLM_CB_FAILURE_RATE', '0.5')),
+        minimo_llamadas=int(os.getenv('LLM_CB_MIN_CALLS', '5')),
+        ventana=float(os.getenv('LLM_CB_WINDOW', '60')),
+        tiempo_apertura=float(os.getenv('LLM_CB_OPEN_SECONDS', '30')),
+        sondas=int(os.getenv('LLM_CB_HALF_OPEN_PROBES', '1')),
+    )
+    return circuitos[nombre]
+
+
+# Instante (reloj monótono) en que vence la petición HTTP actual
+_limite_peticion: ContextVar[Optional[float]] = ContextVar("limite_peticion", default=None)
+
+
+def establecer_deadline(segundos: Optional[float]) -> None:
+    """Fija el tiempo máximo de la petición actual; None la deja sin límite."""
+    _limite_peticion.set(None if segundos is None else time.monotonic() + segundos)
+
+
+def tiempo_restante() -> Optional[float]:
+    """Segundos que le quedan a la petición actual, o None si no tiene límite."""
+    limite = _limite_peticion.get()
+    return None if limite is None else limite - time.monotonic()
+
+
+def reservar_llamada(circuito: CircuitBreaker, timeout: float) -> float:
+    """
+    Comprueba el tiempo restante de la petición y el circuito antes de llamar al servicio.
+
+    Args:
+        circuito (CircuitBreaker): Circuito del servicio a llamar
+        timeout (float): Timeout de lectura configurado para el servicio
+
+    Returns:
+        float: Timeout recortado al tiempo que le queda a la petición
+
+    Raises:
+        ServicioNoDisponibleError: Si la petición ya no tiene tiempo o el circuito está abierto
+    """
+    restante = tiempo_restante()
+    if restante is not None and restante <= 0:
+        raise ServicioNoDisponibleError("Tiempo límite de la petición agotado")
+    if not circuito.permitir():
+        raise ServicioNoDisponibleError(
+            f"Servicio {circuito.nombre} no disponible (circuito abierto, reintentar en "
+            f"{circuito.reintentar_en():.0f} s)"
+        )
+    return timeout if restante is None else min(timeout, restante)
@@ -0,0 +1,254 @@
+import os
+import math
+import time
+import uuid
+import socket
+import asyncio
+import ipaddress
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from urllib.parse import urlparse
+
+import httpx
+
+from src.clientes import CALLBACKS, obtener_cliente_async
+from src.resiliencia import ServicioNoDisponibleError, establecer_deadline
+
+# Estados de un trabajo
+PENDIENTE = "pendiente"
+EN_CURSO = "en_curso"
+COMPLETADO = "completado"
+FALLIDO = "fallido"
+
+
+class TrabajosLlenosError(ServicioNoDisponibleError):
+    """Se lanza cuando la cola de trabajos está llena; `reintentar_en` estima la espera en segundos."""
+
+    def __init__(self, reintentar_en: int):
+        super().__init__(f"Cola de trabajos llena, reintentar en {reintentar_en} s")
+        self.reintentar_en = reintentar_en
+
+
+class Trabajo:
+    """Una predicción con LLM encargada por POST /prediction-llm/jobs y su resultado."""
+
+    __slots__ = ("id", "parametros", "callback_url", "estado", "creado", "terminado", "resultado",
+                 "notificado")
+
+    def __init__(self, parametros: Dict[str, Any], callback_url: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.parametros = parametros
+        self.callback_url = callback_url
+        self.estado = PENDIENTE
+        self.creado = time.time()
+        self.terminado: Optional[float] = None
+        self.resultado: Optional[Dict[str, Any]] = None
+        # None sin callback; True o False según se pudo entregar la notificación
+        self.notificado: Optional[bool] = None
+
+    def a_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "estado": self.estado,
+            "creado": self.creado,
+            "terminado": self.terminado,
+            "resultado": self.resultado,
+            "notificado": self.notificado,
+        }
+
+
+class GestorTrabajos:
+    """
+    Ejecuta las predicciones con LLM en segundo plano con un pool de `trabajadores`.
+
+    Los trabajos esperan en una cola de como mucho `max_pendientes`; al terminar se
+    conservan `retencion` segundos para que el cliente los consulte, y nunca más de
+    `max_trabajos` a la vez (se descartan primero los terminados más antiguos). Si el
+    trabajo tiene URL de callback, se le envía el resultado con POST, con hasta
+    `intentos_callback` intentos.
+    """
+
+    def __init__(self, trabajadores: int = 4, max_pendientes: int = 256, retencion: float = 3600,
+                 max_trabajos: int = 1024, tiempo_limite: Optional[float] = 120, intentos_callback: int = 3):
+        self.trabajadores = trabajadores
+        self.max_pendientes = max_pendientes
+        self.retencion = retencion
+        self.max_trabajos = max_trabajos
+        self.tiempo_limite = tiempo_limite
+        self.intentos_callback = intentos_callback
+        self._trabajos: "OrderedDict[str, Trabajo]" = OrderedDict()
+        self._cola: Optional[asyncio.Queue] = None
+        self._tareas: List[asyncio.Task] = []
+        self._ejecutar: Optional[Callable[[Trabajo], Awaitable[Dict[str, Any]]]] = None
+        # Referencias a las notificaciones en curso para que no se recolecten antes de terminar
+        self._notificaciones: Set[asyncio.Task] = set()
+        self.duracion_media = 0.0
+        self.completados = 0
+        self.fallidos = 0
+        self.rechazados = 0
+        self.callbacks_fallidos = 0
+
+    def _purgar(self) -> None:
+        limite = time.time() - self.retencion
+        terminados = [t for t in self._trabajos.values() if t.terminado is not None]
+        sobrantes = len(self._trabajos) - self.max_trabajos
+        for trabajo in terminados:
+            if trabajo.terminado < limite or sobrantes > 0:
+                del self._trabajos[trabajo.id]
+                sobrantes -= 1
+
+    def pendientes(self) -> int:
+        return self._cola.qsize() if self._cola is not None else 0
+
+    def crear(self, parametros: Dict[str, Any], callback_url: Optional[str] = None) -> Trabajo:
+        """
+        Encola un trabajo y lo devuelve en estado pendiente.
+
+        Raises:
+            TrabajosLlenosError: Si la cola de trabajos está llena
+            ServicioNoDisponibleError: Si los trabajadores no están iniciados
+        """
+        self._purgar()
+        if self._cola is None:
+            raise ServicioNoDisponibleError("Los trabajos asíncronos no están disponibles")
+        if self._cola.qsize() >= self.max_pendientes:
+            self.rechazados += 1
+            espera = self._cola.qsize() / max(1, len(self._tareas)) * self.duracion_media
+            raise TrabajosLlenosError(max(1, math.ceil(espera)))
+        trabajo = Trabajo(parametros, callback_url)
+        self._trabajos[trabajo.id] = trabajo
+        self._cola.put_nowait(trabajo)
+        return trabajo
+
+    def obtener(self, id_trabajo: str) -> Optional[Trabajo]:
+        """Devuelve el trabajo o None si no existe o ya se descartó."""
+        self._purgar()
+        return self._trabajos.get(id_trabajo)
+
+    async def _notificar(self, trabajo: Trabajo) -> None:
+        cliente = obtener_cliente_async(CALLBACKS)
+        # Se comprueba otra vez al enviar por si el nombre resuelve ahora a otra dirección
+        if not await callback_permitido(trabajo.callback_url):
+            print(f"Callback del trabajo {trabajo.id} no permitido")
+            trabajo.notificado = False
+            self.callbacks_fallidos += 1
+            return
+        for intento in range(self.intentos_callback):
+            try:
+                response = await cliente.post(trabajo.callback_url, json=trabajo.a_dict())
+                if response.status_code < 400:
+                    trabajo.notificado = True
+                    return
+                print(f"Callback del trabajo {trabajo.id} respondió {response.status_code}")
+            except httpx.HTTPError as e:
+                print(f"Error al notificar el trabajo {trabajo.id}: {e}")
+            if intento + 1 < self.intentos_callback:
+                await asyncio.sleep(2 ** intento)
+        trabajo.notificado = False
+        self.callbacks_fallidos += 1
+
+    async def _trabajador(self) -> None:
+        while True:
+            trabajo = await self._cola.get()
+            trabajo.estado = EN_CURSO
+            inicio = time.time()
+            establecer_deadline(self.tiempo_limite)
+            try:
+                trabajo.resultado = await self._ejecutar(trabajo)
+                trabajo.estado = COMPLETADO if trabajo.resultado.get("success") else FALLIDO
+            except Exception as e:
+                print(f"Error en el trabajo {trabajo.id}: {e}")
+                trabajo.resultado = {"success": False, "error": str(e)}
+                trabajo.estado = FALLIDO
+            trabajo.terminado = time.time()
+            duracion = trabajo.terminado - inicio
+            terminados = self.completados + self.fallidos
+            self.duracion_media = duracion if not terminados else 0.8 * self.duracion_media + 0.2 * duracion
+            if trabajo.estado == COMPLETADO:
+                self.completados += 1
+            else:
+                self.fallidos += 1
+            if trabajo.callback_url:
+                # Los reintentos del callback no ocupan al trabajador
+                notificacion = asyncio.ensure_future(self._notificar(trabajo))
+                self._notificaciones.add(notificacion)
+                notificacion.add_done_callback(self._notificaciones.discard)
+            self._cola.task_done()
+
+    def iniciar(self, ejecutar: Callable[[Trabajo], Awaitable[Dict[str, Any]]]) -> None:
+        """
+        Arranca los trabajadores en el event loop actual.
+
+        Args:
+            ejecutar (Callable): Ejecuta la predicción de un trabajo y devuelve su respuesta;
+                si tiene `success` verdadero el trabajo se da por completado
+        """
+        self._ejecutar = ejecutar
+        if not self._tareas:
+            self._cola = asyncio.Queue()
+            self._tareas = [asyncio.ensure_future(self._trabajador()) for _ in range(self.trabajadores)]
+
+    async def detener(self) -> None:
+        """Cancela los trabajadores; los trabajos pendientes se pierden."""
+        tareas = self._tareas + list(self._notificaciones)
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+        self._tareas = []
+        self._cola = None
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Devuelve los trabajos retenidos, los pendientes y los contadores de resultados."""
+        return {
+            "trabajadores": len(self._tareas),
+            "retenidos": len(self._trabajos),
+            "pendientes": self.pendientes(),
+            "completados": self.completados,
+            "fallidos": self.fallidos,
+            "rechazados": self.rechazados,
+            "callbacks_fallidos": self.callbacks_fallidos,
+            "duracion_media_s": round(self.duracion_media, 3),
+        }
+
+
+def _direccion_publica(direccion: str) -> bool:
+    ip = ipaddress.ip_address(direccion.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def callback_permitido(url: str) -> bool:
+    """
+    Comprueba que la URL de callback sea http(s) y, si JOBS_CALLBACK_HOSTS lista hosts
+    separados por comas, que su host sea uno de ellos. Sin lista, el host debe resolver
+    solo a direcciones públicas: se rechazan loopback, link-local, redes privadas y
+    demás rangos reservados.
+    """
+    partes = urlparse(url)
+    if partes.scheme not in ("http", "https") or not partes.hostname:
+        return False
+    permitidos = {h.strip().lower() for h in os.getenv('JOBS_CALLBACK_HOSTS', '').split(",") if h.strip()}
+    if permitidos:
+        return partes.hostname.lower() in permitidos
+    try:
+        direcciones = await asyncio.get_running_loop().getaddrinfo(
+            partes.hostname, partes.port or (443 if partes.scheme == "https" else 80), type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError, ValueError):
+        return False
+    return bool(direcciones) and all(_direccion_publica(d[4][0]) for d in direcciones)
+
+
+def _tiempo_limite() -> Optional[float]:
+    valor = os.getenv('JOBS_DEADLINE', '120')
+    return float(valor) if valor else None
+
+
+gestor_trabajos = GestorTrabajos(
+    trabajadores=int(os.getenv('JOBS_WORKERS', '4')),
+    max_pendientes=int(os.getenv('JOBS_MAX_PENDING', '256')),
+    retencion=float(os.getenv('JOBS_RETENTION_SECONDS', '3600')),
+    max_trabajos=int(os.getenv('JOBS_MAX_RETAINED', '1024')),
+    tiempo_limite=_tiempo_limite(),
+    intentos_callback=int(os.getenv('JOBS_CALLBACK_ATTEMPTS', '3')),
+)
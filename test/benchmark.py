@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Benchmark de carga no interactivo del Sistema de Predicción Climática.
+
+Arranca los servidores simulados de OpenWeatherMap y del LLM, levanta la API en un
+subproceso apuntando a ellos y lanza peticiones a cada endpoint con concurrencia fija.
+El resultado (RPS y latencias p50/p95/p99 por endpoint y nivel de concurrencia) se
+escribe en JSON para poder compararlo entre commits.
+
+Uso:
+    python test/benchmark.py --concurrencias 1,10,50 --peticiones 200 --salida bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+import httpx
+import uvicorn
+
+from servidores_simulados import crear_app_llm, crear_app_openweather
+
+RAIZ = Path(__file__).parent.parent
+
+
+class ServidorEnHilo:
+    """Ejecuta una app ASGI con uvicorn en un hilo en segundo plano."""
+
+    def __init__(self, app, puerto: int):
+        self.servidor = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=puerto, log_level="warning"))
+        self.hilo = threading.Thread(target=self.servidor.run, daemon=True)
+
+    def iniciar(self):
+        self.hilo.start()
+        while not self.servidor.started:
+            time.sleep(0.01)
+
+    def detener(self):
+        self.servidor.should_exit = True
+        self.hilo.join(timeout=5)
+
+
+def puerto_libre() -> int:
+    """Devuelve un puerto TCP libre en localhost."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil por rango más cercano de una lista ordenada."""
+    if not valores:
+        return 0.0
+    indice = max(0, min(len(valores) - 1, round(p / 100 * len(valores) + 0.5) - 1))
+    return valores[indice]
+
+
+def es_error(respuesta: httpx.Response) -> bool:
+    """Una respuesta cuenta como error si el estado es >= 400 o el cuerpo informa de un fallo."""
+    if respuesta.status_code >= 400:
+        return True
+    if respuesta.headers.get("content-type", "").startswith("application/json"):
+        cuerpo = respuesta.json()
+        return isinstance(cuerpo, dict) and ("error" in cuerpo or cuerpo.get("success") is False)
+    return False
+
+
+def crear_escenarios(ubicaciones: List[Dict[str, float]], tamano_lote: int) -> Dict[str, Callable]:
+    """Construye las funciones que lanzan la petición i-ésima de cada endpoint."""
+    def ubicacion(i: int) -> Dict[str, float]:
+        return ubicaciones[i % len(ubicaciones)]
+
+    def lote(i: int) -> Dict[str, Any]:
+        return {"coordenadas": [ubicacion(i + j) for j in range(tamano_lote)]}
+
+    return {
+        "prediction": lambda c, i: c.get("/prediction", params=ubicacion(i)),
+        "prediction-raw": lambda c, i: c.get("/prediction", params={**ubicacion(i), "format": "raw"}),
+        "prediction-daily": lambda c, i: c.get("/prediction/daily", params=ubicacion(i)),
+        "prediction-llm": lambda c, i: c.get("/prediction-llm", params=ubicacion(i)),
+        "prediction-batch": lambda c, i: c.post("/prediction/batch", json=lote(i)),
+    }
+
+
+async def ejecutar_nivel(base_url: str, escenario: Callable, concurrencia: int, total: int) -> Dict[str, Any]:
+    """Lanza `total` peticiones con `concurrencia` trabajadores y mide cada una."""
+    latencias: List[float] = []
+    errores = 0
+    pendientes = iter(range(total))
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limites, timeout=120) as cliente:
+        async def trabajador():
+            nonlocal errores
+            for i in pendientes:
+                inicio = time.perf_counter()
+                try:
+                    respuesta = await escenario(cliente, i)
+                    fallo = es_error(respuesta)
+                except httpx.HTTPError:
+                    fallo = True
+                latencias.append(time.perf_counter() - inicio)
+                errores += fallo
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+        duracion = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        "concurrencia": concurrencia,
+        "peticiones": total,
+        "errores": errores,
+        "duracion_s": round(duracion, 3),
+        "rps": round(total / duracion, 2),
+        "p50_ms": round(percentil(latencias, 50) * 1000, 2),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 2),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 2),
+    }
+
+
+def commit_actual() -> str:
+    """Hash del commit actual, si el repositorio está disponible."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=RAIZ, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def arrancar_api(puerto: int, puerto_openweather: int, puerto_llm: int) -> subprocess.Popen:
+    """Arranca la API en un subproceso configurado contra los servidores simulados."""
+    entorno = {
+        **os.environ,
+        "OPENWEATHER_APP_KEY": "benchmark",
+        "OPENWEATHER_BASE_URL": f"http://127.0.0.1:{puerto_openweather}/data/2.5",
+        "LLM_BASE_URL": f"http://127.0.0.1:{puerto_llm}",
+        "STORE_PATH": "",
+        "PREFETCH_ENABLED": "false",
+        "OPENWEATHER_CALLS_PER_MINUTE": "0",
+    }
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(puerto),
+         "--log-level", "warning"],
+        cwd=RAIZ, env=entorno
+    )
+    limite = time.time() + 30
+    while time.time() < limite:
+        try:
+            if httpx.get(f"http://127.0.0.1:{puerto}/", timeout=1).status_code == 200:
+                return proceso
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proceso.terminate()
+    raise RuntimeError("La API no arrancó a tiempo")
+
+
+def main():
+    """Ejecuta el benchmark completo y escribe el resultado en JSON."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrencias", default="1,10,50", help="Niveles de concurrencia separados por comas")
+    parser.add_argument("--peticiones", type=int, default=200, help="Peticiones por endpoint y nivel")
+    parser.add_argument("--endpoints", default="prediction,prediction-raw,prediction-daily,prediction-llm,prediction-batch")
+    parser.add_argument("--ubicaciones", type=int, default=50, help="Ubicaciones distintas consultadas")
+    parser.add_argument("--tamano-lote", type=int, default=20, help="Coordenadas por petición de lote")
+    parser.add_argument("--latencia-openweather", type=float, default=0.05)
+    parser.add_argument("--latencia-llm", type=float, default=0.5)
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="Tasa de error de ambos servidores simulados")
+    parser.add_argument("--bytes-respuesta-llm", type=int, default=800)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", help="Archivo JSON de salida (por defecto, stdout)")
+    args = parser.parse_args()
+
+    azar = random.Random(args.semilla)
+    ubicaciones = [{"lat": round(azar.uniform(-60, 60), 4), "lon": round(azar.uniform(-180, 180), 4)}
+                   for _ in range(args.ubicaciones)]
+    escenarios = crear_escenarios(ubicaciones, args.tamano_lote)
+
+    puerto_openweather, puerto_llm, puerto_api = puerto_libre(), puerto_libre(), puerto_libre()
+    openweather = ServidorEnHilo(
+        crear_app_openweather(args.latencia_openweather, args.tasa_error, semilla_aleatoria=args.semilla),
+        puerto_openweather
+    )
+    llm = ServidorEnHilo(
+        crear_app_llm(args.latencia_llm, args.tasa_error, args.bytes_respuesta_llm, semilla_aleatoria=args.semilla),
+        puerto_llm
+    )
+    openweather.iniciar()
+    llm.iniciar()
+    api = arrancar_api(puerto_api, puerto_openweather, puerto_llm)
+
+    resultados = []
+    try:
+        for nombre in args.endpoints.split(","):
+            for concurrencia in (int(c) for c in args.concurrencias.split(",")):
+                nivel = asyncio.run(ejecutar_nivel(
+                    f"http://127.0.0.1:{puerto_api}", escenarios[nombre], concurrencia, args.peticiones
+                ))
+                resultados.append({"endpoint": nombre, **nivel})
+                print(f"{nombre:18} c={concurrencia:<4} rps={nivel['rps']:<9} p50={nivel['p50_ms']}ms "
+                      f"p95={nivel['p95_ms']}ms p99={nivel['p99_ms']}ms errores={nivel['errores']}",
+                      file=sys.stderr)
+    finally:
+        api.terminate()
+        api.wait(timeout=10)
+        openweather.detener()
+        llm.detener()
+
+    informe = {
+        "commit": commit_actual(),
+        "fecha": datetime.now(timezone.utc).isoformat(),
+        "config": {k: v for k, v in vars(args).items() if k != "salida"},
+        "resultados": resultados,
+    }
+    salida = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida:
+        Path(args.salida).write_text(salida + "\n")
+    else:
+        print(salida)
+
+
+if __name__ == "__main__":
+    main()
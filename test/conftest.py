@@ -0,0 +1,71 @@
+"""Fixtures compartidas por las pruebas: datos de ejemplo, clientes HTTP simulados y estado global limpio."""
+
+import asyncio
+from typing import Any, Callable, Dict
+
+import httpx
+import pytest
+
+from src import clientes, queries
+from src.balanceo import BackendLLM, PoolLLM
+from src.cache import cache_llm, cache_pronosticos
+from src.cambios import detector_cambios
+from src.cola_llm import ColaLLM
+from src.modelo import PronosticoCompacto
+from src.resiliencia import CircuitBreaker
+
+INICIO = 1749772800
+
+
+@pytest.fixture(autouse=True)
+def estado_limpio(monkeypatch):
+    """
+    Empieza cada prueba con las cachés vacías y una cola del LLM nueva, y cierra al
+    terminar los clientes HTTP que haya instalado.
+    """
+    cache_pronosticos.limpiar()
+    cache_llm.limpiar()
+    detector_cambios.limpiar()
+    monkeypatch.setattr(queries, "cola_llm", ColaLLM(concurrencia=queries.cola_llm.concurrencia,
+                                                     max_profundidad=queries.cola_llm.max_profundidad))
+    yield
+    asyncio.run(clientes.cerrar_clientes())
+
+
+@pytest.fixture
+def slot() -> Dict[str, Any]:
+    """Un slot de 3 horas con la forma de la respuesta de OpenWeatherMap."""
+    return {"dt": INICIO, "main": {"temp": 11.36}, "weather": [{"id": 804, "description": "muy nuboso"}],
+            "pop": 0.08}
+
+
+@pytest.fixture
+def pronostico(slot) -> PronosticoCompacto:
+    """Pronóstico compacto de un solo slot."""
+    return PronosticoCompacto([slot])
+
+
+@pytest.fixture
+def instalar_cliente() -> Callable[[str, Callable[[httpx.Request], httpx.Response]], None]:
+    """Devuelve una función que instala para un servicio un cliente que responde con `manejador`."""
+    def instalar(servicio: str, manejador: Callable[[httpx.Request], httpx.Response]) -> None:
+        clientes.instalar_cliente_async(servicio, httpx.AsyncClient(transport=httpx.MockTransport(manejador)))
+    return instalar
+
+
+@pytest.fixture
+def crear_backend() -> Callable[..., BackendLLM]:
+    """Devuelve una función que crea un backend del LLM con su propio circuito (`kwargs` del circuito)."""
+    def crear(url: str = "http://llm", llm_hash: str = "hash", **kwargs) -> BackendLLM:
+        return BackendLLM(url, llm_hash, CircuitBreaker(url, **kwargs))
+    return crear
+
+
+@pytest.fixture
+def instalar_pool(monkeypatch) -> Callable[..., PoolLLM]:
+    """Devuelve una función que sustituye el pool de backends del LLM por uno con los backends indicados."""
+    def instalar(*backends: BackendLLM, **kwargs) -> PoolLLM:
+        pool = PoolLLM(list(backends), **kwargs)
+        monkeypatch.setattr(queries, "pool_llm", pool)
+        return pool
+    return instalar
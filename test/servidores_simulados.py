@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Servidores simulados de OpenWeatherMap, del LLM local y de Redis para pruebas sin conexión.
+
+Reproducen la forma de las respuestas reales (la lista de slots se genera a partir de
+src/pronostico.json) con latencia, tasa de errores y tamaño de respuesta configurables.
+El servidor Redis solo implementa los comandos que usa la caché compartida.
+
+Uso:
+    python test/servidores_simulados.py --servicio openweather --puerto 8101 --latencia 0.2
+    python test/servidores_simulados.py --servicio llm --puerto 8102 --latencia 2 --tasa-error 0.05
+    python test/servidores_simulados.py --servicio redis --puerto 6379
+"""
+
+import json
+import time
+import random
+import asyncio
+import argparse
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+RUTA_SEMILLA = Path(__file__).parent.parent / "src" / "pronostico.json"
+INTERVALO_SLOT = 3 * 3600
+
+# Códigos de condición de OpenWeatherMap para las descripciones de la semilla
+CODIGOS_CLIMA = {"muy nuboso": 804, "nubes": 803, "lluvia ligera": 500}
+
+
+def cargar_semilla() -> list:
+    """Convierte los registros formateados de pronostico.json en valores numéricos."""
+    with open(RUTA_SEMILLA) as archivo:
+        registros = json.load(archivo)["pronostico"]
+    return [{
+        "temp": float(r["temperatura"].rstrip("°C")),
+        "pop": round(float(r["prob_precipitacion"].rstrip("%")) / 100, 2),
+        "descripcion": r["descripcion"].lower(),
+    } for r in registros]
+
+
+def generar_pronostico(lat: float, lon: float, slots: int, semilla: list) -> dict:
+    """
+    Genera una respuesta con la forma de /forecast de OpenWeatherMap.
+
+    Los slots empiezan en el siguiente límite de 3 horas y recorren la semilla de forma
+    cíclica; la temperatura varía con las coordenadas para distinguir ubicaciones.
+    """
+    inicio = (int(time.time()) // INTERVALO_SLOT + 1) * INTERVALO_SLOT
+    desfase = round((lat * 7 + lon * 3) % 5 - 2.5, 2)
+    lista = []
+    for i in range(slots):
+        base = semilla[i % len(semilla)]
+        lista.append({
+            "dt": inicio + i * INTERVALO_SLOT,
+            "main": {"temp": round(base["temp"] + desfase, 2), "feels_like": base["temp"], "humidity": 80},
+            "weather": [{"id": CODIGOS_CLIMA.get(base["descripcion"], 800), "description": base["descripcion"]}],
+            "pop": base["pop"],
+        })
+    return {
+        "cod": "200",
+        "cnt": slots,
+        "list": lista,
+        "city": {"coord": {"lat": lat, "lon": lon}, "timezone": round(lon / 15) * 3600},
+    }
+
+
+def crear_app_openweather(latencia: float = 0.05, tasa_error: float = 0.0, slots: int = 40,
+                          semilla_aleatoria: int = 0) -> FastAPI:
+    """Crea la app que simula GET /data/2.5/forecast de OpenWeatherMap."""
+    app = FastAPI()
+    semilla = cargar_semilla()
+    azar = random.Random(semilla_aleatoria)
+    app.state.peticiones = 0
+
+    @app.get("/data/2.5/forecast")
+    async def forecast(lat: float, lon: float):
+        app.state.peticiones += 1
+        await asyncio.sleep(latencia)
+        if azar.random() < tasa_error:
+            return JSONResponse(status_code=503, content={"cod": 503, "message": "simulated error"})
+        return generar_pronostico(lat, lon, slots, semilla)
+
+    return app
+
+
+def crear_app_llm(latencia: float = 0.5, tasa_error: float = 0.0, bytes_respuesta: int = 800,
+                  streaming: bool = False, semilla_aleatoria: int = 0) -> FastAPI:
+    """
+    Crea la app que simula POST /{hash}/message del LLM local.
+
+    Con `streaming`, si el cliente acepta `text/event-stream` la respuesta se envía
+    por palabras repartiendo la latencia entre ellas.
+    """
+    app = FastAPI()
+    azar = random.Random(semilla_aleatoria)
+    app.state.peticiones = 0
+    texto = ("Análisis simulado del pronóstico: nubosidad variable con lluvias ligeras. " * 64)[:bytes_respuesta]
+
+    @app.post("/{llm_hash}/message")
+    async def message(llm_hash: str, request: Request):
+        app.state.peticiones += 1
+        await request.json()
+        if azar.random() < tasa_error:
+            await asyncio.sleep(latencia / 2)
+            return JSONResponse(status_code=500, content={"error": "simulated error"})
+
+        if streaming and "text/event-stream" in request.headers.get("accept", ""):
+            palabras = texto.split(" ")
+
+            async def generar():
+                for palabra in palabras:
+                    await asyncio.sleep(latencia / len(palabras))
+                    yield f"data: {palabra}\n\n"
+
+            return StreamingResponse(generar(), media_type="text/event-stream")
+
+        await asyncio.sleep(latencia)
+        return [{"user": llm_hash, "text": texto}]
+
+    return app
+
+
+class ServidorRESP:
+    """
+    Servidor en memoria que habla RESP2 y sustituye a Redis en las pruebas.
+
+    Admite PING, AUTH, SELECT, GET, SET (con NX y PX), EXISTS y DEL. EVAL solo se usa
+    para liberar bloqueos, así que cualquier script se interpreta como "borrar KEYS[1]
+    si su valor es ARGV[1]".
+    """
+
+    def __init__(self):
+        self.datos: Dict[bytes, Tuple[Optional[float], bytes]] = {}
+        self.comandos = 0
+        self._servidor: Optional[asyncio.AbstractServer] = None
+
+    def _vigente(self, clave: bytes) -> Optional[bytes]:
+        entrada = self.datos.get(clave)
+        if entrada is None:
+            return None
+        if entrada[0] is not None and entrada[0] <= time.monotonic():
+            del self.datos[clave]
+            return None
+        return entrada[1]
+
+    @staticmethod
+    def _bulk(valor: Optional[bytes]) -> bytes:
+        return b"$-1\r\n" if valor is None else b"$%d\r\n%s\r\n" % (len(valor), valor)
+
+    def ejecutar(self, comando: list) -> bytes:
+        """Ejecuta un comando y devuelve la respuesta codificada."""
+        self.comandos += 1
+        nombre = comando[0].upper()
+        if nombre in (b"PING", b"AUTH", b"SELECT"):
+            return b"+OK\r\n" if nombre != b"PING" else b"+PONG\r\n"
+        if nombre == b"GET":
+            return self._bulk(self._vigente(comando[1]))
+        if nombre == b"SET":
+            opciones = [c.upper() for c in comando[3:]]
+            if b"NX" in opciones and self._vigente(comando[1]) is not None:
+                return b"$-1\r\n"
+            expira = None
+            if b"PX" in opciones:
+                expira = time.monotonic() + int(comando[3 + opciones.index(b"PX") + 1]) / 1000
+            self.datos[comando[1]] = (expira, comando[2])
+            return b"+OK\r\n"
+        if nombre == b"EXISTS":
+            return b":%d\r\n" % sum(self._vigente(c) is not None for c in comando[1:])
+        if nombre == b"DEL":
+            borradas = sum(self.datos.pop(c, None) is not None for c in comando[1:])
+            return b":%d\r\n" % borradas
+        if nombre == b"EVAL":
+            clave, token = comando[3], comando[4]
+            if self._vigente(clave) == token:
+                del self.datos[clave]
+                return b":1\r\n"
+            return b":0\r\n"
+        return b"-ERR unknown command\r\n"
+
+    @staticmethod
+    async def _leer_comando(lector: asyncio.StreamReader) -> list:
+        cabecera = await lector.readuntil(b"\r\n")
+        comando = []
+        for _ in range(int(cabecera[1:-2])):
+            longitud = int((await lector.readuntil(b"\r\n"))[1:-2])
+            comando.append((await lector.readexactly(longitud + 2))[:-2])
+        return comando
+
+    async def _atender(self, lector: asyncio.StreamReader, escritor: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                comando = await self._leer_comando(lector)
+                escritor.write(self.ejecutar(comando))
+                await escritor.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            escritor.close()
+
+    async def iniciar(self, puerto: int = 0) -> int:
+        """Empieza a escuchar en 127.0.0.1 y devuelve el puerto asignado."""
+        self._servidor = await asyncio.start_server(self._atender, "127.0.0.1", puerto)
+        return self._servidor.sockets[0].getsockname()[1]
+
+    async def detener(self) -> None:
+        self._servidor.close()
+        await self._servidor.wait_closed()
+
+
+async def _servir_resp(puerto: int) -> None:
+    servidor = ServidorRESP()
+    await servidor.iniciar(puerto)
+    await servidor._servidor.serve_forever()
+
+
+def main():
+    """Arranca uno de los servidores simulados desde la línea de comandos."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servicio", choices=["openweather", "llm", "redis"], required=True)
+    parser.add_argument("--puerto", type=int, default=8101)
+    parser.add_argument("--latencia", type=float, default=None, help="Segundos por respuesta")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="Fracción de respuestas con error (0-1)")
+    parser.add_argument("--slots", type=int, default=40, help="Slots por pronóstico (OpenWeatherMap)")
+    parser.add_argument("--bytes-respuesta", type=int, default=800, help="Tamaño del texto del LLM")
+    parser.add_argument("--streaming", action="store_true", help="El LLM responde por SSE si se acepta")
+    args = parser.parse_args()
+
+    if args.servicio == "redis":
+        asyncio.run(_servir_resp(args.puerto))
+        return
+    if args.servicio == "openweather":
+        app = crear_app_openweather(0.05 if args.latencia is None else args.latencia, args.tasa_error, args.slots)
+    else:
+        app = crear_app_llm(0.5 if args.latencia is None else args.latencia, args.tasa_error,
+                            args.bytes_respuesta, args.streaming)
+    uvicorn.run(app, host="127.0.0.1", port=args.puerto, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
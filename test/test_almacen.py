@@ -0,0 +1,70 @@
+"""Pruebas del almacén persistente de pronósticos e interpretaciones."""
+
+import threading
+import time
+
+from src.almacen import AlmacenPersistente
+from src.cache import cache_llm, cache_pronosticos
+from src.modelo import PronosticoCompacto
+
+
+def test_calienta_las_caches_tras_reabrir(tmp_path, slot):
+    ruta = str(tmp_path / "almacen.sqlite3")
+
+    almacen = AlmacenPersistente(ruta)
+    almacen.guardar_pronostico((4.61, -74.08), PronosticoCompacto([slot], -18000), time.time() + 600)
+    almacen.guardar_pronostico((1.0, 1.0), PronosticoCompacto([slot]), time.time() - 10 ** 6)
+    almacen.guardar_interpretacion("clave", "modelo", {"texto": "nublado"}, time.time() + 600)
+    almacen.guardar_interpretacion("vieja", "modelo", {"texto": "soleado"}, time.time() - 1)
+    almacen.cerrar()
+
+    almacen = AlmacenPersistente(ruta)
+    assert almacen.compactar(cache_pronosticos.gracia_obsoleto) == 2
+    almacen.calentar_caches()
+    almacen.cerrar()
+
+    compacto = cache_pronosticos.obtener(4.6097, -74.0817)
+    assert compacto.crudo == [slot]
+    assert compacto.zona_horaria == -18000
+    assert cache_pronosticos.obtener(1.0, 1.0) is None
+    assert cache_llm.obtener("clave", "modelo") == {"texto": "nublado"}
+
+
+def test_las_escrituras_se_hacen_en_el_hilo_escritor(tmp_path):
+    almacen = AlmacenPersistente(str(tmp_path / "almacen.sqlite3"), max_pendientes=1)
+    hilos = []
+    bloqueo = threading.Event()
+
+    def escritura(valor):
+        hilos.append((threading.current_thread().name, valor))
+        bloqueo.wait(1)
+
+    almacen.encolar(escritura, 1)
+    # El escritor está ocupado con la primera: la segunda ocupa la cola y la tercera se descarta
+    while not hilos:
+        time.sleep(0.001)
+    almacen.encolar(escritura, 2)
+    almacen.encolar(escritura, 3)
+    bloqueo.set()
+    almacen.esperar_escrituras()
+    almacen.cerrar()
+
+    assert hilos == [("almacen-escritor", 1), ("almacen-escritor", 2)]
+    assert almacen.estadisticas()["escrituras_descartadas"] == 1
+
+
+def test_un_error_en_una_escritura_no_detiene_el_hilo_escritor(tmp_path):
+    almacen = AlmacenPersistente(str(tmp_path / "almacen.sqlite3"))
+    escritas = []
+
+    def escritura(valor):
+        if valor is None:
+            raise TypeError("no serializable")
+        escritas.append(valor)
+
+    almacen.encolar(escritura, None)
+    almacen.encolar(escritura, 1)
+    almacen.esperar_escrituras()
+    almacen.cerrar()
+
+    assert escritas == [1]
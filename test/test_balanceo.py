@@ -0,0 +1,95 @@
+"""Pruebas del reparto de generaciones entre backends del LLM."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from src import clientes, queries
+from src.balanceo import LATENCIA, MODELO_OTRO, PoolLLM
+from src.cache import cache_llm
+from src.cola_llm import ColaLLM
+from src.resiliencia import ServicioNoDisponibleError
+
+
+def test_pool_elige_el_backend_con_menos_pendientes_y_respeta_el_hash(crear_backend):
+    a, b, c = crear_backend("http://a", "h1"), crear_backend("http://b", "h1"), crear_backend("http://c", "h2")
+    pool = PoolLLM([a, b, c])
+
+    with a.llamada(), c.llamada():
+        assert pool.elegir() is b
+        assert pool.elegir("h2") is c
+        # Un hash desconocido se reparte entre todos y viaja en la URL
+        assert pool.elegir("otro").url_mensaje("otro") == "http://b/otro/message"
+    assert c.url_mensaje() == "http://c/h2/message"
+
+
+def test_pool_por_latencia_prefiere_el_backend_rapido(crear_backend):
+    rapido, lento = crear_backend("http://rapido", "h"), crear_backend("http://lento", "h")
+    rapido.latencia_media, lento.latencia_media = 0.2, 2.0
+    rapido.en_curso = 3
+    assert PoolLLM([rapido, lento], LATENCIA).elegir() is rapido
+    assert PoolLLM([rapido, lento]).elegir() is lento
+
+
+def test_pool_expulsa_backends_con_circuito_abierto_o_sin_salud(crear_backend, instalar_cliente):
+    caido = crear_backend("http://caido", "h", minimo_llamadas=1, tiempo_apertura=60)
+    enfermo = crear_backend("http://enfermo", "h", minimo_llamadas=1, tiempo_apertura=60)
+    sano = crear_backend("http://sano", "h")
+    pool = PoolLLM([caido, enfermo, sano])
+    caido.circuito.registrar_fallo()
+
+    def manejador(request):
+        return httpx.Response(503 if request.url.host == "enfermo" else 200)
+
+    instalar_cliente(clientes.LLM, manejador)
+    asyncio.run(pool.comprobar_salud())
+    assert caido.sano is True and enfermo.sano is False
+    assert pool.elegir() is sano
+
+    # Sin otro backend sano, el que falla la comprobación sigue atendiendo mientras su circuito lo admita
+    pool.backends.remove(sano)
+    assert pool.elegir() is enfermo
+    enfermo.circuito.registrar_fallo()
+    with pytest.raises(ServicioNoDisponibleError):
+        pool.elegir()
+
+
+def test_un_error_inesperado_no_detiene_el_ciclo_de_salud(monkeypatch, crear_backend):
+    monkeypatch.setenv("LLM_HEALTH_INTERVAL", "0")
+    pool = PoolLLM([crear_backend("http://a", "h")])
+    comprobaciones = []
+
+    async def comprobar_salud():
+        comprobaciones.append(1)
+        if len(comprobaciones) == 1:
+            raise RuntimeError("fallo inesperado")
+
+    monkeypatch.setattr(pool, "comprobar_salud", comprobar_salud)
+
+    async def escenario():
+        tarea = asyncio.ensure_future(pool.ciclo_salud())
+        while len(comprobaciones) < 3:
+            await asyncio.sleep(0)
+        tarea.cancel()
+
+    asyncio.run(asyncio.wait_for(escenario(), 1))
+    assert len(comprobaciones) >= 3
+
+
+def test_hashes_no_configurados_comparten_cola_y_estadisticas(monkeypatch, crear_backend, instalar_pool,
+                                                              instalar_cliente, pronostico):
+    pool = instalar_pool(crear_backend("http://a", "h1"))
+    cola = ColaLLM(concurrencia=1)
+    monkeypatch.setattr(queries, "cola_llm", cola)
+    instalar_cliente(clientes.LLM, lambda request: httpx.Response(200, json=[{"text": "ok"}]))
+
+    async def escenario():
+        for llm_hash in ("h1", "cliente-1", "cliente-2"):
+            await queries.consultar_llm_local_async(pronostico, llm_hash)
+
+    asyncio.run(escenario())
+    assert pool.modelo("h1") == "h1" and pool.modelo("cualquiera") == MODELO_OTRO
+    assert set(cola.estadisticas()) == {"h1", MODELO_OTRO}
+    assert cola.estadisticas()[MODELO_OTRO]["atendidas"] == 2
+    assert set(cache_llm.estadisticas()["por_modelo"]) == {"h1", MODELO_OTRO}
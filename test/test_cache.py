@@ -0,0 +1,48 @@
+"""Pruebas unitarias de la caché de pronósticos por celda."""
+
+from src.cache import CacheLLM, CachePronostico, INTERVALO_SLOT, ajustar_a_rejilla, clave_llm, proximo_limite_slot
+
+
+def test_coordenadas_cercanas_comparten_celda():
+    assert ajustar_a_rejilla(4.60971, -74.08175, 0.01) == ajustar_a_rejilla(4.6132, -74.0831, 0.01)
+    assert ajustar_a_rejilla(4.60971, -74.08175, 0.01) != ajustar_a_rejilla(4.63, -74.08175, 0.01)
+
+
+def test_limite_slot_alineado_a_tres_horas():
+    assert proximo_limite_slot(0) == INTERVALO_SLOT
+    assert proximo_limite_slot(INTERVALO_SLOT - 1) == INTERVALO_SLOT
+    assert proximo_limite_slot(INTERVALO_SLOT) == 2 * INTERVALO_SLOT
+
+
+def test_aciertos_fallos_y_expulsion_lru():
+    cache = CachePronostico(paso_rejilla=0.01, max_entradas=2)
+    assert cache.obtener(1.0, 1.0) is None
+    cache.guardar(1.0, 1.0, ["a"])
+    cache.guardar(2.0, 2.0, ["b"])
+    assert cache.obtener(1.001, 1.002) == ["a"]
+    cache.guardar(3.0, 3.0, ["c"])  # expulsa (2, 2), el menos usado recientemente
+    assert cache.obtener(2.0, 2.0) is None
+
+    stats = cache.estadisticas()
+    assert stats["aciertos"] == 1
+    assert stats["fallos"] == 2
+    assert stats["expulsiones"] == 1
+    assert stats["entradas"] == 2
+
+
+def test_cache_llm_por_contenido_con_limite_de_bytes():
+    cache = CacheLLM(ttl=60, max_entradas=10, max_bytes=40)
+    clave_a = clave_llm("prompt", "modelo-1", "usuario")
+    assert clave_a == clave_llm("prompt", "modelo-1", "usuario")
+    assert clave_a != clave_llm("prompt", "modelo-2", "usuario")
+
+    assert cache.obtener(clave_a, "modelo-1") is None
+    cache.guardar(clave_a, "modelo-1", {"texto": "soleado"})
+    assert cache.obtener(clave_a, "modelo-1") == {"texto": "soleado"}
+
+    cache.guardar(clave_llm("otro", "modelo-1", "usuario"), "modelo-1", {"texto": "lluvia fuerte"})
+    assert cache.obtener(clave_a, "modelo-1") is None  # expulsada por el límite de bytes
+
+    stats = cache.estadisticas()
+    assert stats["expulsiones"] == 1
+    assert stats["por_modelo"]["modelo-1"] == {"aciertos": 1, "fallos": 2, "tasa_aciertos": 0.3333}
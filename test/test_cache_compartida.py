@@ -0,0 +1,134 @@
+"""Pruebas de la caché compartida entre workers sobre el servidor RESP simulado."""
+
+import asyncio
+
+import httpx
+
+from servidores_simulados import ServidorRESP
+from src import clientes, queries
+from src.cache import cache_pronosticos
+from src.cache_compartida import BackendMemoria, BackendRedis, ClienteRESP, SingleFlightCompartido
+
+
+def test_backend_redis_guarda_expira_y_solo_libera_su_bloqueo():
+    async def escenario():
+        servidor = ServidorRESP()
+        backend = BackendRedis(ClienteRESP(puerto=await servidor.iniciar()))
+
+        await backend.escribir("clave", b"valor", ttl=0.05)
+        leido = await backend.leer("clave")
+        token = await backend.bloquear("clave", ttl=10)
+        segundo = await backend.bloquear("clave", ttl=10)
+        await backend.desbloquear("clave", "token-ajeno")
+        sigue_bloqueado = await backend.bloqueado("clave")
+        await backend.desbloquear("clave", token)
+        bloqueado = await backend.bloqueado("clave")
+        await asyncio.sleep(0.06)
+        expirado = await backend.leer("clave")
+
+        await backend.cerrar()
+        await servidor.detener()
+        return leido, token, segundo, sigue_bloqueado, bloqueado, expirado
+
+    leido, token, segundo, sigue_bloqueado, bloqueado, expirado = asyncio.run(escenario())
+    assert leido == b"valor"
+    assert token is not None and segundo is None
+    assert sigue_bloqueado is True
+    assert bloqueado is False
+    assert expirado is None
+
+
+def test_cancelar_un_comando_a_medias_descarta_la_conexion(monkeypatch):
+    leer_respuesta = ClienteRESP.leer_respuesta
+
+    async def leer_con_retraso(lector):
+        await asyncio.sleep(0.02)
+        return await leer_respuesta(lector)
+
+    async def escenario():
+        servidor = ServidorRESP()
+        cliente = ClienteRESP(puerto=await servidor.iniciar())
+        await cliente.ejecutar("SET", "a", "valor-a")
+        await cliente.ejecutar("SET", "b", "valor-b")
+
+        monkeypatch.setattr(ClienteRESP, "leer_respuesta", staticmethod(leer_con_retraso))
+        tarea = asyncio.ensure_future(cliente.ejecutar("GET", "a"))
+        await asyncio.sleep(0.005)
+        tarea.cancel()
+        monkeypatch.setattr(ClienteRESP, "leer_respuesta", staticmethod(leer_respuesta))
+        # La respuesta del GET cancelado no debe leerse como la del siguiente comando
+        valor = await cliente.ejecutar("GET", "b")
+
+        await cliente.cerrar()
+        await servidor.detener()
+        return tarea.cancelled(), valor
+
+    cancelada, valor = asyncio.run(escenario())
+    assert cancelada is True
+    assert valor == b"valor-b"
+
+
+def test_backend_redis_sin_servidor_no_bloquea_las_peticiones():
+    async def escenario():
+        backend = BackendRedis(ClienteRESP(puerto=1, timeout=0.2))
+        return await backend.leer("clave"), await backend.bloquear("clave", 1), backend.errores
+
+    valor, token, errores = asyncio.run(escenario())
+    assert valor is None
+    assert token is not None
+    assert errores == 2
+
+
+def test_single_flight_compartido_espera_el_resultado_del_otro_proceso():
+    backend = BackendMemoria()
+    compartido = SingleFlightCompartido(backend, espera_max=1, intervalo=0.01)
+    ejecuciones = []
+
+    async def producir():
+        ejecuciones.append(1)
+        await asyncio.sleep(0.05)
+        await backend.escribir("k", b"resultado", ttl=10)
+        return b"resultado"
+
+    async def escenario():
+        return await asyncio.gather(*(compartido.ejecutar("k", lambda: backend.leer("k"), producir)
+                                      for _ in range(3)))
+
+    assert asyncio.run(escenario()) == [b"resultado"] * 3
+    assert len(ejecuciones) == 1
+    assert compartido.estadisticas()["esperas_resueltas"] == 2
+
+
+def test_workers_con_cache_compartida_descargan_una_vez_por_celda(monkeypatch, instalar_cliente, slot):
+    llamadas = []
+
+    async def manejador(request):
+        llamadas.append(request.url)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"list": [slot], "city": {"timezone": 3600}})
+
+    async def escenario():
+        servidor = ServidorRESP()
+        backend = BackendRedis(ClienteRESP(puerto=await servidor.iniciar()))
+        monkeypatch.setattr(queries, "backend_cache", backend)
+        monkeypatch.setattr(queries, "coalescencia_compartida",
+                            SingleFlightCompartido(backend, espera_max=2, intervalo=0.01))
+        instalar_cliente(clientes.OPENWEATHER, manejador)
+
+        # Sin pasar por la coalescencia del proceso, solo el bloqueo compartido evita las descargas repetidas
+        cache_pronosticos.limpiar()
+        resultados = await asyncio.gather(*(queries._descargar_pronostico_compartido(4.60971, -74.08175)
+                                            for _ in range(3)))
+        # Un worker que arranca con la caché en memoria vacía lee el pronóstico publicado
+        cache_pronosticos.limpiar()
+        tardio = await queries._descargar_pronostico_compartido(4.60971, -74.08175)
+
+        await backend.cerrar()
+        await servidor.detener()
+        return resultados, tardio
+
+    resultados, tardio = asyncio.run(escenario())
+    assert len(llamadas) == 1
+    assert all(r.crudo == [slot] for r in resultados)
+    assert tardio.zona_horaria == 3600
+    assert cache_pronosticos.obtener(4.60971, -74.08175) is not None
@@ -0,0 +1,97 @@
+"""Pruebas del detector de cambios que reutiliza interpretaciones del LLM."""
+
+import asyncio
+
+import httpx
+
+from src import clientes, queries
+from src.cambios import DetectorCambios
+from src.modelo import PronosticoCompacto
+
+INICIO = 1749772800
+
+
+def _pronostico(temps, pops=None, descripciones=None, desplazamiento=0):
+    pops = pops or [0.1] * len(temps)
+    descripciones = descripciones or ["nubes"] * len(temps)
+    return PronosticoCompacto([
+        {"dt": INICIO + (i + desplazamiento) * 10800, "main": {"temp": t},
+         "weather": [{"id": 803, "description": d}], "pop": p}
+        for i, (t, p, d) in enumerate(zip(temps, pops, descripciones))
+    ])
+
+
+def test_detector_reutiliza_solo_sin_cambios_materiales():
+    detector = DetectorCambios(umbral_temperatura=1.0, umbral_pop=0.1, max_desplazamiento=1)
+    base = _pronostico([20, 21, 22, 23, 22, 21, 20, 19, 18])
+    assert detector.reutilizable("bogota", "m", base) is None
+    detector.registrar("bogota", "m", base, "interpretación")
+
+    assert detector.reutilizable("bogota", "m", _pronostico([20.4, 21, 22.8, 23, 22, 21, 20, 19, 30])) == "interpretación"
+    # La ventana avanza un slot: se compara el solape y el slot nuevo no cuenta
+    assert detector.reutilizable("bogota", "m", _pronostico([21, 22, 23, 22, 21, 20, 19, 40], desplazamiento=1)) \
+        == "interpretación"
+
+    assert detector.reutilizable("bogota", "m", _pronostico([20, 21, 22, 25, 22, 21, 20, 19])) is None
+    assert detector.reutilizable("bogota", "m", _pronostico([20, 21, 22, 23, 22, 21, 20, 19],
+                                                            pops=[0.1, 0.1, 0.5] + [0.1] * 5)) is None
+    assert detector.reutilizable("bogota", "m", _pronostico([20, 21, 22, 23, 22, 21, 20, 19],
+                                                            descripciones=["nubes"] * 7 + ["lluvia"])) is None
+    assert detector.reutilizable("bogota", "m", _pronostico([22, 23, 22, 21, 20, 19], desplazamiento=2)) is None
+    assert detector.reutilizable("bogota", "otro-modelo", base) is None
+
+    estadisticas = detector.estadisticas()
+    assert estadisticas["reutilizadas"] == 2
+    assert estadisticas["regeneradas"] == {"sin_base": 2, "temperatura": 1, "precipitacion": 1,
+                                           "descripcion": 1, "ventana": 1}
+
+
+def test_prediccion_llm_reutiliza_la_interpretacion_si_el_pronostico_apenas_cambia(instalar_cliente):
+    llamadas = []
+
+    def manejador(request):
+        llamadas.append(request.url)
+        return httpx.Response(200, json=[{"text": f"análisis {len(llamadas)}"}])
+
+    instalar_cliente(clientes.LLM, manejador)
+
+    async def escenario():
+        resultados = []
+        for temps in ([20, 21, 22], [20.3, 21.2, 21.9], [24, 21, 22]):
+            resultados.append(await queries.pregenerar_interpretacion_async(
+                _pronostico(temps), "hash-cambios", ubicacion=(4.60971, -74.08175)))
+        return resultados
+
+    primera, reutilizada, nueva = asyncio.run(escenario())
+    assert len(llamadas) == 2
+    assert reutilizada["reutilizada"] is True
+    assert reutilizada["prediccion_llm"] == primera["prediccion_llm"]
+    # Los datos devueltos son los del pronóstico actual aunque la interpretación sea la anterior
+    assert reutilizada["datos_clima_originales"]["pronostico"][0]["temperatura"] == "20.3°C"
+    assert nueva["prediccion_llm"] == [{"text": "análisis 2"}]
+
+
+def test_la_interpretacion_reutilizada_tiene_la_forma_de_una_nueva(monkeypatch, instalar_cliente):
+    monkeypatch.setenv("LLM_HASH_ID", "hash-defecto")
+    llamadas = []
+
+    def manejador(request):
+        llamadas.append(request.url)
+        return httpx.Response(200, json=[{"text": f"análisis {len(llamadas)}"}])
+
+    instalar_cliente(clientes.LLM, manejador)
+
+    async def escenario():
+        ubicacion = (4.60971, -74.08175)
+        nueva = await queries.pregenerar_interpretacion_async(_pronostico([20, 21, 22]), ubicacion=ubicacion)
+        reutilizada = await queries.pregenerar_interpretacion_async(_pronostico([20.3, 21, 22]), ubicacion=ubicacion)
+        # Cambiar el modelo por defecto no reutiliza la interpretación del anterior
+        monkeypatch.setenv("LLM_HASH_ID", "hash-nuevo")
+        otro_modelo = await queries.pregenerar_interpretacion_async(_pronostico([20.3, 21, 22]), ubicacion=ubicacion)
+        return nueva, reutilizada, otro_modelo
+
+    nueva, reutilizada, otro_modelo = asyncio.run(escenario())
+    assert set(reutilizada) == set(nueva) | {"reutilizada"}
+    assert reutilizada["prompt"]["slots"] == nueva["prompt"]["slots"]
+    assert "reutilizada" not in otro_modelo
+    assert len(llamadas) == 2
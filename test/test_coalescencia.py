@@ -0,0 +1,91 @@
+"""Pruebas de la agrupación de llamadas concurrentes idénticas."""
+
+import asyncio
+
+import pytest
+
+from src.coalescencia import SingleFlight
+from src.metricas import iniciar_peticion, medir
+from src.resiliencia import ServicioNoDisponibleError, establecer_deadline
+
+
+def test_llamadas_concurrentes_comparten_una_ejecucion():
+    grupo = SingleFlight()
+    ejecuciones = []
+
+    async def operacion():
+        ejecuciones.append(1)
+        await asyncio.sleep(0.01)
+        return "resultado"
+
+    async def escenario():
+        return await asyncio.gather(*(grupo.ejecutar("clave", operacion) for _ in range(10)))
+
+    assert asyncio.run(escenario()) == ["resultado"] * 10
+    assert len(ejecuciones) == 1
+    assert grupo.estadisticas() == {"en_curso": 0, "ejecuciones": 1, "coalescidas": 9}
+
+
+def test_la_excepcion_se_comparte_y_la_clave_se_libera():
+    grupo = SingleFlight()
+
+    async def falla():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream caído")
+
+    async def escenario():
+        resultados = await asyncio.gather(grupo.ejecutar("k", falla), grupo.ejecutar("k", falla),
+                                          return_exceptions=True)
+        posterior = await grupo.ejecutar("k", lambda: asyncio.sleep(0, result="ok"))
+        return resultados, posterior
+
+    resultados, posterior = asyncio.run(escenario())
+    assert all(isinstance(r, ValueError) for r in resultados)
+    assert posterior == "ok"
+    with pytest.raises(ValueError):
+        asyncio.run(grupo.ejecutar("otra", falla))
+
+
+def test_quien_se_une_respeta_su_propio_tiempo_limite():
+    grupo = SingleFlight()
+
+    async def lenta():
+        await asyncio.sleep(0.3)
+        return "generada"
+
+    async def con_limite():
+        establecer_deadline(0.05)
+        return await grupo.ejecutar("k", lenta)
+
+    async def escenario():
+        # La operación la lanza una tarea sin límite, como el refresco en segundo plano
+        sin_limite = asyncio.ensure_future(grupo.ejecutar("k", lenta))
+        await asyncio.sleep(0)
+        inicio = asyncio.get_running_loop().time()
+        with pytest.raises(ServicioNoDisponibleError):
+            await asyncio.ensure_future(con_limite())
+        espera = asyncio.get_running_loop().time() - inicio
+        return espera, await sin_limite
+
+    espera, resultado = asyncio.run(escenario())
+    assert espera < 0.2
+    assert resultado == "generada"
+
+
+def test_la_espera_de_los_coalescidos_se_mide_en_su_peticion():
+    grupo = SingleFlight("espera_prueba")
+
+    async def operacion():
+        with medir("operacion"):
+            await asyncio.sleep(0.01)
+        return "resultado"
+
+    async def peticion():
+        etapas = iniciar_peticion()
+        await grupo.ejecutar("clave", operacion)
+        return [etapa for etapa, _ in etapas]
+
+    async def escenario():
+        return await asyncio.gather(asyncio.ensure_future(peticion()), asyncio.ensure_future(peticion()))
+
+    assert asyncio.run(escenario()) == [["operacion"], ["espera_prueba"]]
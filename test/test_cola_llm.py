@@ -0,0 +1,145 @@
+"""Pruebas de la cola de admisión del LLM."""
+
+import asyncio
+
+import pytest
+
+from src.cola_llm import PRIORIDAD_ALTA, PRIORIDAD_NORMAL, PRIORIDAD_SEGUNDO_PLANO, ColaLLM, ColaLlenaError
+from src.resiliencia import ServicioNoDisponibleError, establecer_deadline
+
+
+def test_cola_limita_concurrencia_y_atiende_por_prioridad():
+    cola = ColaLLM(concurrencia=1, max_profundidad=10)
+    orden = []
+    simultaneas = 0
+    maximo = 0
+
+    async def generar(nombre, prioridad):
+        nonlocal simultaneas, maximo
+        async with cola.turno("modelo", prioridad):
+            simultaneas += 1
+            maximo = max(maximo, simultaneas)
+            orden.append(nombre)
+            await asyncio.sleep(0.01)
+            simultaneas -= 1
+
+    async def escenario():
+        primera = asyncio.ensure_future(generar("primera", PRIORIDAD_NORMAL))
+        await asyncio.sleep(0)
+        await asyncio.gather(
+            primera,
+            generar("prefetch", PRIORIDAD_SEGUNDO_PLANO),
+            generar("interactiva", PRIORIDAD_NORMAL),
+            generar("pago", PRIORIDAD_ALTA),
+        )
+
+    asyncio.run(escenario())
+    assert maximo == 1
+    assert orden == ["primera", "pago", "interactiva", "prefetch"]
+    estadisticas = cola.estadisticas()["modelo"]
+    assert estadisticas["atendidas"] == 4
+    assert estadisticas["en_curso"] == 0 and estadisticas["en_espera"] == 0
+
+
+def test_cola_llena_rechaza_con_tiempo_de_reintento():
+    cola = ColaLLM(concurrencia=1, max_profundidad=1)
+
+    async def ocupar(liberar):
+        async with cola.turno("modelo"):
+            await liberar.wait()
+
+    async def escenario():
+        liberar = asyncio.Event()
+        tareas = [asyncio.ensure_future(ocupar(liberar)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(ColaLlenaError) as error:
+            async with cola.turno("modelo"):
+                pass
+        liberar.set()
+        await asyncio.gather(*tareas)
+        return error.value
+
+    error = asyncio.run(escenario())
+    assert error.reintentar_en >= 1
+    assert cola.estadisticas()["modelo"]["rechazadas"] == 1
+
+
+def test_espera_en_cola_respeta_el_tiempo_limite():
+    cola = ColaLLM(concurrencia=1, max_profundidad=5)
+
+    async def escenario():
+        liberar = asyncio.Event()
+
+        async def ocupar():
+            async with cola.turno("modelo"):
+                await liberar.wait()
+
+        tarea = asyncio.ensure_future(ocupar())
+        await asyncio.sleep(0)
+        establecer_deadline(0.01)
+        with pytest.raises(ServicioNoDisponibleError):
+            async with cola.turno("modelo"):
+                pass
+        establecer_deadline(None)
+        en_espera = cola.estadisticas()["modelo"]["en_espera"]
+        liberar.set()
+        await tarea
+        return en_espera
+
+    assert asyncio.run(escenario()) == 0
+    assert cola.estadisticas()["modelo"]["en_curso"] == 0
+
+
+def test_promover_adelanta_la_llamada_en_espera():
+    cola = ColaLLM(concurrencia=1, max_profundidad=10)
+    orden = []
+
+    async def generar(nombre, prioridad, etiqueta=None):
+        async with cola.turno("modelo", prioridad, etiqueta=etiqueta):
+            orden.append(nombre)
+            await asyncio.sleep(0.01)
+
+    async def escenario():
+        primera = asyncio.ensure_future(generar("primera", PRIORIDAD_NORMAL))
+        await asyncio.sleep(0)
+        resto = [asyncio.ensure_future(generar("prefetch", PRIORIDAD_SEGUNDO_PLANO, etiqueta="texto")),
+                 asyncio.ensure_future(generar("interactiva", PRIORIDAD_NORMAL))]
+        await asyncio.sleep(0)
+        # Una petición de alta prioridad se une a la generación del prefetch
+        promovida = cola.promover("modelo", "texto", PRIORIDAD_ALTA)
+        await asyncio.gather(primera, *resto)
+        return promovida
+
+    assert asyncio.run(escenario()) is True
+    assert orden == ["primera", "prefetch", "interactiva"]
+    assert cola.promover("modelo", "texto", PRIORIDAD_ALTA) is False
+    assert cola.estadisticas()["modelo"]["promovidas"] == 1
+
+
+def test_el_limite_sigue_a_los_backends_disponibles():
+    cola = ColaLLM(concurrencia=1, max_profundidad=10)
+    liberar = asyncio.Event()
+    atendidas = []
+
+    async def generar(nombre, replicas):
+        async with cola.turno("modelo", replicas=replicas):
+            atendidas.append(nombre)
+            await liberar.wait()
+
+    async def escenario():
+        tareas = [asyncio.ensure_future(generar("primera", 1))]
+        await asyncio.sleep(0)
+        tareas.append(asyncio.ensure_future(generar("segunda", 1)))
+        await asyncio.sleep(0)
+        espera_con_un_backend = cola.estadisticas()["modelo"]["en_espera"]
+        # Un segundo backend disponible sube el límite y despierta a la llamada en espera
+        tareas.append(asyncio.ensure_future(generar("tercera", 2)))
+        for _ in range(3):
+            await asyncio.sleep(0)
+        liberar.set()
+        await asyncio.gather(*tareas)
+        return espera_con_un_backend
+
+    assert asyncio.run(escenario()) == 1
+    assert atendidas[:2] == ["primera", "segunda"]
+    assert cola.estadisticas()["modelo"]["limite"] == 2
@@ -0,0 +1,36 @@
+"""Pruebas de las peticiones condicionales (ETag / If-None-Match) de /prediction."""
+
+import time
+
+from fastapi.testclient import TestClient
+
+from main import app
+from src.cache import cache_pronosticos
+from src.modelo import PronosticoCompacto
+
+
+def test_prediction_responde_304_si_el_etag_coincide(slot):
+    cache_pronosticos.guardar(4.61, -74.08, PronosticoCompacto([slot]), expira=time.time() + 600)
+    cliente = TestClient(app)
+    params = {"lat": 4.61, "lon": -74.08}
+
+    primera = cliente.get("/prediction", params=params)
+    etag = primera.headers["etag"]
+    assert primera.status_code == 200
+    assert 590 <= int(primera.headers["cache-control"].split("max-age=")[1]) <= 600
+
+    repetida = cliente.get("/prediction", params=params, headers={"If-None-Match": f"W/{etag}"})
+    assert repetida.status_code == 304
+    assert repetida.content == b""
+    assert repetida.headers["etag"] == etag
+
+    # Cada formato es una representación distinta con su propio ETag
+    raw = cliente.get("/prediction", params={**params, "format": "raw"}, headers={"If-None-Match": etag})
+    assert raw.status_code == 200
+    assert raw.headers["etag"] != etag
+
+
+def test_huella_cambia_con_el_contenido(slot):
+    original = PronosticoCompacto([slot])
+    assert original.huella() == PronosticoCompacto([dict(slot)]).huella()
+    assert original.huella() != PronosticoCompacto([{**slot, "main": {"temp": 12.0}}]).huella()
@@ -0,0 +1,72 @@
+"""Pruebas del limitador de cuota de OpenWeatherMap y del uso de pronósticos de reserva."""
+
+import asyncio
+
+import httpx
+
+from src import clientes, queries
+from src.cache import CachePronostico
+from src.cuota import INTERACTIVA, SEGUNDO_PLANO, LimitadorCuota
+
+
+def test_cuota_reserva_parte_del_presupuesto_para_las_interactivas():
+    cuota = LimitadorCuota(por_minuto=0, por_dia=10, reserva_segundo_plano=0.5)
+    segundo_plano = sum(cuota.autorizar(SEGUNDO_PLANO) for _ in range(10))
+    interactivas = sum(cuota.autorizar(INTERACTIVA) for _ in range(10))
+    assert segundo_plano == 5
+    assert interactivas == 5
+    estadisticas = cuota.estadisticas()
+    assert estadisticas["usadas_hoy"] == 10
+    assert estadisticas["denegadas"] == {INTERACTIVA: 5, SEGUNDO_PLANO: 5}
+
+
+def test_cuota_por_minuto_y_bloqueo_por_429():
+    cuota = LimitadorCuota(por_minuto=2, por_dia=0, reserva_segundo_plano=0)
+    assert cuota.autorizar() and cuota.autorizar()
+    assert not cuota.autorizar()
+
+    cuota = LimitadorCuota(por_minuto=100)
+    cuota.bloquear("30")
+    assert not cuota.autorizar()
+    assert 29 <= cuota.estadisticas()["bloqueado_durante_s"] <= 30
+
+
+def test_cache_reserva_devuelve_la_celda_vecina_mas_reciente():
+    cache = CachePronostico(paso_rejilla=0.1, gracia_obsoleto=0)
+    cache.guardar(4.6, -74.1, "propia_expirada", expira=1)
+    assert cache.obtener(4.6, -74.1) is None
+    assert cache.obtener_reserva(4.61, -74.09) == "propia_expirada"
+
+    cache.guardar(4.7, -74.1, "vecina_antigua", expira=100)
+    cache.guardar(4.5, -74.1, "vecina_reciente", expira=200)
+    assert cache.obtener_reserva(4.62, -74.2) == "propia_expirada"
+    assert cache.obtener_reserva(4.6, -74.0) == "propia_expirada"
+    assert cache.obtener_reserva(4.6, -73.9) is None
+
+
+def test_pronostico_sin_cuota_o_con_429_usa_el_guardado_mas_cercano(monkeypatch, instalar_cliente, slot):
+    cuota = LimitadorCuota(por_minuto=1, reserva_segundo_plano=0)
+    monkeypatch.setattr(queries, "cuota_openweather", cuota)
+    respuestas = iter([
+        httpx.Response(200, json={"list": [slot]}),
+        httpx.Response(429, headers={"Retry-After": "120"}),
+    ])
+
+    async def escenario():
+        instalar_cliente(clientes.OPENWEATHER, lambda request: next(respuestas))
+        primero = await queries.obtener_pronostico_compacto_async(4.60971, -74.08175)
+        # El pronóstico expira y la única llamada del minuto ya está gastada
+        queries.cache_pronosticos.guardar(4.60971, -74.08175, primero, expira=1)
+        sin_cuota = await queries.obtener_pronostico_compacto_async(4.60971, -74.08175)
+        # Con cuota disponible, el proveedor responde 429
+        cuota.por_minuto = 0
+        con_429 = await queries.obtener_pronostico_compacto_async(4.60971, -74.08175)
+        return primero, sin_cuota, con_429
+
+    primero, sin_cuota, con_429 = asyncio.run(escenario())
+    assert sin_cuota is primero and con_429 is primero
+    assert queries.cache_pronosticos.estadisticas()["reservas_servidas"] == 2
+    estadisticas = cuota.estadisticas()
+    assert estadisticas["denegadas"][INTERACTIVA] == 1
+    assert estadisticas["bloqueos_429"] == 1
+    assert not cuota.autorizar()
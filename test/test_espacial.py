@@ -0,0 +1,60 @@
+"""Pruebas del índice espacial y de los pronósticos servidos desde ubicaciones cercanas."""
+
+import time
+
+from fastapi.testclient import TestClient
+
+from main import app
+from src.cache import CachePronostico, cache_pronosticos
+from src.espacial import IndiceEspacial, distancia_km
+from src.modelo import PronosticoCompacto
+
+
+def test_indice_devuelve_los_puntos_dentro_del_radio_ordenados():
+    indice = IndiceEspacial(tamano_cubeta=0.1)
+    for punto in [(4.61, -74.08), (4.65, -74.1), (4.9, -74.3), (0.0, 179.99)]:
+        indice.agregar(*punto)
+
+    cercanos = indice.cercanos(4.6, -74.07, radio_km=10)
+    assert [p for _, p in cercanos] == [(4.61, -74.08), (4.65, -74.1)]
+    assert cercanos[0][0] == distancia_km(4.6, -74.07, 4.61, -74.08)
+
+    # La búsqueda cruza el antimeridiano
+    assert [p for _, p in indice.cercanos(0.0, -179.99, radio_km=5)] == [(0.0, 179.99)]
+
+    indice.quitar(4.61, -74.08)
+    assert len(indice) == 3
+
+
+def test_cache_sirve_el_vigente_mas_cercano_y_olvida_los_expulsados():
+    cache = CachePronostico(paso_rejilla=0.01, max_entradas=2)
+    ahora = time.time()
+    cache.guardar(4.62, -74.08, "expirado", expira=ahora - 1)
+    cache.guardar(4.65, -74.08, "vigente", expira=ahora + 600)
+
+    valor, origen, distancia = cache.obtener_cercano(4.61, -74.08, max_distancia_km=10)
+    assert (valor, origen) == ("vigente", (4.65, -74.08))
+    assert 4 < distancia < 5
+    assert cache.obtener_cercano(4.61, -74.08, max_distancia_km=2) is None
+
+    cache.guardar(10.0, 10.0, "otro", expira=ahora + 600)
+    cache.guardar(10.1, 10.0, "otro", expira=ahora + 600)
+    assert cache.obtener_cercano(4.61, -74.08, max_distancia_km=10) is None
+    assert cache.estadisticas()["cercanos_servidos"] == 1
+
+
+def test_prediction_informa_el_origen_del_pronostico_cercano(slot):
+    cache_pronosticos.guardar(4.61, -74.08, PronosticoCompacto([slot]), expira=time.time() + 600)
+    cliente = TestClient(app)
+
+    respuesta = cliente.get("/prediction", params={"lat": 4.63, "lon": -74.09, "max_distance_km": 5})
+    assert respuesta.status_code == 200
+    origen = respuesta.json()["origen"]
+    assert (origen["lat"], origen["lon"]) == (4.61, -74.08)
+    assert 2 < origen["distancia_km"] < 3
+    assert respuesta.json()["pronostico"][0]["temperatura"] == "11.36°C"
+
+    diario = cliente.get("/prediction/daily", params={"lat": 4.63, "lon": -74.09, "max_distance_km": 5})
+    assert diario.json()["origen"] == origen
+
+    assert cliente.get("/prediction", params={"lat": 4.63, "lon": -74.09, "max_distance_km": 1000}).status_code == 422
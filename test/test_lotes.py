@@ -0,0 +1,47 @@
+"""Pruebas del pronóstico por lotes."""
+
+import asyncio
+import time
+
+import httpx
+from fastapi.testclient import TestClient
+
+from main import app
+from src import clientes
+from src.cache import cache_pronosticos
+from src.lotes import obtener_pronosticos_lote
+from src.modelo import PronosticoCompacto
+
+
+def test_lote_deduplica_celdas_y_conserva_el_orden(instalar_cliente, slot):
+    llamadas = []
+
+    def manejador(request):
+        llamadas.append(request.url.params["lat"])
+        if request.url.params["lat"] == "10.0":
+            return httpx.Response(500)
+        return httpx.Response(200, json={"list": [slot]})
+
+    async def escenario():
+        instalar_cliente(clientes.OPENWEATHER, manejador)
+        resultados = await obtener_pronosticos_lote([(4.6097, -74.0817), (10.0, 10.0), (4.6102, -74.0821)])
+        return resultados
+
+    resultados = asyncio.run(escenario())
+    assert [r["indice"] for r in resultados] == [0, 1, 2]
+    assert resultados[0]["pronostico"] == resultados[2]["pronostico"]
+    assert "error" in resultados[1]
+    assert sorted(llamadas) == ["10.0", "4.61"]
+
+
+def test_lote_con_distancia_maxima_sirve_el_pronostico_cercano(instalar_cliente, slot):
+    cache_pronosticos.guardar(4.61, -74.08, PronosticoCompacto([slot]), expira=time.time() + 600)
+    instalar_cliente(clientes.OPENWEATHER, lambda request: httpx.Response(200, json={"list": []}))
+    cliente = TestClient(app)
+
+    respuesta = cliente.post("/prediction/batch", params={"max_distance_km": 5},
+                             json={"coordenadas": [{"lat": 4.63, "lon": -74.09}, {"lat": 4.62, "lon": -74.08}]})
+    resultados = respuesta.json()["resultados"]
+    assert [(r["origen"]["lat"], r["origen"]["lon"]) for r in resultados] == [(4.61, -74.08)] * 2
+    assert resultados[0]["origen"]["distancia_km"] != resultados[1]["origen"]["distancia_km"]
+    assert resultados[0]["pronostico"][0]["temperatura"] == "11.36°C"
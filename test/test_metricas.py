@@ -0,0 +1,40 @@
+"""Pruebas de las métricas en formato Prometheus y de la cabecera Server-Timing."""
+
+from src.metricas import Contador, Histograma, cabecera_server_timing, iniciar_peticion, medir
+
+
+def test_histograma_acumulativo():
+    histograma = Histograma("prueba_seconds", "Ayuda.", "etapa", limites=(0.1, 1))
+    histograma.observar("llm", 0.05)
+    histograma.observar("llm", 0.5)
+    histograma.observar("llm", 5)
+    lineas = histograma.exponer()
+    assert 'prueba_seconds_bucket{etapa="llm",le="0.1"} 1' in lineas
+    assert 'prueba_seconds_bucket{etapa="llm",le="1"} 2' in lineas
+    assert 'prueba_seconds_bucket{etapa="llm",le="+Inf"} 3' in lineas
+    assert 'prueba_seconds_count{etapa="llm"} 3' in lineas
+
+
+def test_contador_con_etiquetas():
+    contador = Contador("prueba_total", "Ayuda.", ("servicio", "codigo"))
+    contador.incrementar("openweather", "200")
+    contador.incrementar("openweather", "200")
+    assert 'prueba_total{servicio="openweather",codigo="200"} 2' in contador.exponer()
+
+
+def test_etapas_de_la_peticion_en_server_timing():
+    etapas = iniciar_peticion()
+    with medir("openweather"):
+        pass
+    cabecera = cabecera_server_timing(etapas, 0.0125)
+    assert cabecera.startswith("openweather;dur=")
+    assert cabecera.endswith("total;dur=12.50")
+
+
+def test_valores_de_etiqueta_escapados():
+    histograma = Histograma("prueba_seconds", "Ayuda.", "modelo", limites=(1,))
+    histograma.observar('evil"} 1 x\\\n', 0.5)
+    contador = Contador("prueba_total", "Ayuda.", ("modelo",))
+    contador.incrementar('evil"} 1 x')
+    assert 'prueba_seconds_count{modelo="evil\\"} 1 x\\\\\\n"} 1' in histograma.exponer()
+    assert 'prueba_total{modelo="evil\\"} 1 x"} 1' in contador.exponer()
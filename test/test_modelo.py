@@ -0,0 +1,51 @@
+"""Pruebas de la representación compacta del pronóstico."""
+
+from src.modelo import PronosticoCompacto, resumen_diario
+from src.queries import procesar_pronostico, renderizar_pronostico
+
+CRUDO = [
+    {"dt": 1749772800, "main": {"temp": 11.36}, "weather": [{"id": 804, "description": "muy nuboso"}], "pop": 0.08},
+    {"dt": 1749783600, "main": {"temp": 10.75}, "weather": [{"id": 500, "description": "lluvia ligera"}]},
+]
+
+
+def test_columnas_numericas():
+    compacto = PronosticoCompacto(CRUDO)
+    assert len(compacto) == 2
+    assert renderizar_pronostico(compacto, "raw") == {
+        "dt": [1749772800, 1749783600],
+        "temp": [11.36, 10.75],
+        "pop": [0.08, 0.0],
+        "weather_id": [804, 500],
+        "descripcion": ["muy nuboso", "lluvia ligera"],
+    }
+
+
+def test_display_igual_al_procesado_y_memorizado():
+    compacto = PronosticoCompacto(CRUDO)
+    display = renderizar_pronostico(compacto)
+    assert display == procesar_pronostico(CRUDO)
+    assert renderizar_pronostico(compacto) is display
+
+
+def test_resumen_diario_usa_la_zona_horaria_de_la_ubicacion():
+    # En UTC-5, los slots de 00:00 y 03:00 UTC del 13/06 pertenecen aún al 12/06 local
+    crudo = CRUDO + [
+        {"dt": 1749794400, "main": {"temp": 14.0}, "weather": [{"id": 500, "description": "lluvia ligera"}], "pop": 0.5},
+        {"dt": 1749805200, "main": {"temp": 16.0}, "weather": [{"id": 800, "description": "cielo claro"}], "pop": 0.3},
+        {"dt": 1749816000, "main": {"temp": 17.5}, "weather": [{"id": 500, "description": "lluvia ligera"}], "pop": 0.1},
+    ]
+    resumen = resumen_diario(PronosticoCompacto(crudo, zona_horaria=-5 * 3600))
+    assert resumen["zona_horaria"] == -18000
+    assert [dia["fecha"] for dia in resumen["dias"]] == ["2025-06-12", "2025-06-13"]
+
+    dia = resumen["dias"][1]
+    assert dia == {
+        "fecha": "2025-06-13",
+        "temp_min": 14.0,
+        "temp_max": 17.5,
+        "temp_media": 15.83,
+        "prob_precipitacion_max": 0.5,
+        "descripcion": "Lluvia ligera",
+        "slots": 3,
+    }
@@ -0,0 +1,67 @@
+"""Pruebas del formato compacto para oráculos."""
+
+import struct
+import time
+
+from fastapi.testclient import TestClient
+
+from main import app
+from src.cache import cache_pronosticos
+from src.modelo import PronosticoCompacto
+from src.oraculo import (CABECERA_EMPAQUETADO, codificar_abi, codificar_empaquetado, columnas_oraculo,
+                         validar_campos)
+
+CRUDO = [
+    {"dt": 1749772800, "main": {"temp": 11.36}, "weather": [{"id": 804, "description": "muy nuboso"}], "pop": 0.08},
+    {"dt": 1749783600, "main": {"temp": -2.5}, "weather": [{"id": 500, "description": "lluvia ligera"}], "pop": 0.6},
+    {"dt": 1749794400, "main": {"temp": 9.0}, "weather": [{"id": 800, "description": "cielo claro"}]},
+]
+
+
+def test_columnas_escaladas_con_ventana_y_campos():
+    compacto = PronosticoCompacto(CRUDO)
+    assert columnas_oraculo(compacto) == {
+        "dt": [1749772800, 1749783600, 1749794400],
+        "temp": [1136, -250, 900],
+        "pop": [8, 60, 0],
+        "weather_id": [804, 500, 800],
+    }
+    assert columnas_oraculo(compacto, desde=1, slots=1, campos=["temp", "weather_id"]) == {
+        "temp": [-250], "weather_id": [500]
+    }
+    assert validar_campos("weather_id, dt") == ["dt", "weather_id"]
+    assert validar_campos("temp,humedad") is None
+
+
+def test_codificaciones_binarias():
+    columnas = {"dt": [1749772800, 1749783600], "temp": [1136, -250]}
+
+    abi = codificar_abi(columnas)
+    palabras = [abi[i:i + 32] for i in range(0, len(abi), 32)]
+    assert int.from_bytes(palabras[0], "big") == 64 and int.from_bytes(palabras[1], "big") == 160
+    assert int.from_bytes(palabras[2], "big") == 2 and int.from_bytes(palabras[3], "big") == 1749772800
+    assert int.from_bytes(palabras[6], "big", signed=True) == 1136
+    assert int.from_bytes(palabras[7], "big", signed=True) == -250
+
+    empaquetado = codificar_empaquetado(columnas)
+    version, mascara, n = CABECERA_EMPAQUETADO.unpack_from(empaquetado)
+    assert (version, mascara, n) == (1, 0b11, 2)
+    assert struct.unpack_from(">Ih", empaquetado, CABECERA_EMPAQUETADO.size + 6) == (1749783600, -250)
+    assert len(empaquetado) == CABECERA_EMPAQUETADO.size + 2 * 6
+
+
+def test_prediction_en_formato_oracle():
+    cache_pronosticos.guardar(4.61, -74.08, PronosticoCompacto(CRUDO), expira=time.time() + 600)
+    cliente = TestClient(app)
+    params = {"lat": 4.61, "lon": -74.08, "format": "oracle"}
+
+    json_ = cliente.get("/prediction", params={**params, "slots": 2, "fields": "temp,pop"})
+    assert json_.json() == {"pronostico": {"temp": [1136, -250], "pop": [8, 60]}}
+
+    binario = cliente.get("/prediction", params={**params, "encoding": "packed", "offset": 2})
+    assert binario.headers["content-type"] == "application/octet-stream"
+    assert binario.content == codificar_empaquetado(columnas_oraculo(PronosticoCompacto(CRUDO), desde=2))
+    assert binario.headers["etag"] != json_.headers["etag"]
+
+    assert cliente.get("/prediction", params={**params, "fields": "humedad"}).status_code == 400
+    assert cliente.get("/prediction", params={**params, "offset": 99999999999999999999}).status_code == 422
@@ -0,0 +1,58 @@
+"""Pruebas del refresco en segundo plano de las ubicaciones más consultadas."""
+
+import asyncio
+
+from src.programador import ProgramadorRefresco
+
+
+def test_refresca_las_ubicaciones_calientes_dentro_del_presupuesto():
+    programador = ProgramadorRefresco(max_ubicaciones=2, presupuesto_por_hora=2, pregenerar_llm=True)
+    for _ in range(5):
+        programador.registrar(4.6097, -74.0817)
+    for _ in range(3):
+        programador.registrar(40.4168, -3.7038)
+    programador.registrar(19.4326, -99.1332)
+    programador.registrar_llm(4.6097, -74.0817, "hash-1")
+
+    refrescadas, generadas = [], []
+
+    async def refrescar(lat, lon, expira):
+        refrescadas.append((lat, lon))
+        return "compacto"
+
+    async def generar_llm(compacto, llm_hash, ubicacion):
+        generadas.append(llm_hash)
+
+    programador._refrescar, programador._generar_llm = refrescar, generar_llm
+    asyncio.run(programador.refrescar_ubicaciones_calientes())
+    assert refrescadas == [(4.61, -74.08), (40.42, -3.7)]
+    assert generadas == ["hash-1"]
+
+    # Sin fichas restantes, el siguiente ciclo no descarga nada
+    asyncio.run(programador.refrescar_ubicaciones_calientes())
+    stats = programador.estadisticas()
+    assert stats["refrescos"] == 2
+    assert stats["omitidos_por_presupuesto"] == 2
+    assert stats["ubicaciones_calientes"] == [{"lat": 4.61, "lon": -74.08, "peticiones": 1}]
+
+
+def test_las_celdas_que_decaen_olvidan_su_modelo_llm():
+    programador = ProgramadorRefresco(pregenerar_llm=True)
+    programador.registrar(4.6097, -74.0817)
+    programador.registrar_llm(4.6097, -74.0817, "hash-1")
+    for _ in range(4):
+        programador.registrar(40.4168, -3.7038)
+    programador.registrar_llm(40.4168, -3.7038, "hash-2")
+    generadas = []
+
+    async def refrescar(lat, lon, expira):
+        return "compacto"
+
+    async def generar_llm(compacto, llm_hash, ubicacion):
+        generadas.append(llm_hash)
+
+    programador._refrescar, programador._generar_llm = refrescar, generar_llm
+    asyncio.run(programador.refrescar_ubicaciones_calientes())
+    # La celda con una sola petición se pregenera en este ciclo, pero sale de los conteos
+    assert sorted(generadas) == ["hash-1", "hash-2"]
+    assert programador._hash_llm == {(40.42, -3.7): "hash-2"}
@@ -0,0 +1,77 @@
+"""Pruebas del constructor del prompt del LLM."""
+
+import math
+import asyncio
+
+import httpx
+
+from src import clientes, queries
+from src.modelo import PronosticoCompacto
+from src.prompt import PREFIJO_PROMPT, SIN_DATOS, ConstructorPrompt, fila_compacta
+
+INICIO = 1749772800
+
+
+def _pronostico(n, zona_horaria=0):
+    return PronosticoCompacto([
+        {"dt": INICIO + i * 10800, "main": {"temp": 11.36 + i},
+         "weather": [{"id": 804, "description": "muy nuboso"}], "pop": 0.57}
+        for i in range(n)
+    ], zona_horaria)
+
+
+def test_fila_compacta_usa_las_columnas_y_la_hora_local():
+    assert fila_compacta(_pronostico(1), 0) == "13/06 00:00|11.4|muy nuboso|57\n"
+    # Bogotá está en UTC-5
+    assert fila_compacta(_pronostico(2, -18000), 1) == "12/06 22:00|12.4|muy nuboso|57\n"
+
+
+def test_presupuesto_por_modelo_decide_los_slots():
+    tokens_fila = len(fila_compacta(_pronostico(1), 0)) / 4
+    tokens_prefijo = len(PREFIJO_PROMPT) / 4
+    constructor = ConstructorPrompt(presupuesto=1024, max_slots=8,
+                                    presupuesto_por_modelo={"pequeno": math.ceil(tokens_prefijo + 3 * tokens_fila)})
+
+    completo = constructor.construir(_pronostico(12))
+    assert completo.slots == 8
+    assert completo.texto.startswith(PREFIJO_PROMPT)
+    assert completo.a_dict()["caracteres"] == len(completo.texto)
+
+    recortado = constructor.construir(_pronostico(12), "pequeno")
+    assert recortado.slots == 3
+    assert recortado.tokens_estimados <= recortado.presupuesto
+    # El prefijo es el mismo en todos los prompts, aunque cambien el modelo o los slots
+    assert recortado.texto[:len(PREFIJO_PROMPT)] == completo.texto[:len(PREFIJO_PROMPT)]
+
+    # Con un presupuesto insuficiente se envía al menos min_slots
+    assert ConstructorPrompt(presupuesto=1, min_slots=1).construir(_pronostico(4)).slots == 1
+    assert constructor.construir(None).texto == SIN_DATOS
+
+
+def test_consulta_al_llm_informa_del_tamano_del_prompt(instalar_cliente):
+    enviados = []
+
+    def manejador(request):
+        enviados.append(request.read())
+        return httpx.Response(200, json=[{"text": "análisis"}])
+
+    async def escenario():
+        instalar_cliente(clientes.LLM, manejador)
+        resultado = await queries.consultar_llm_local_async(_pronostico(10), "hash-prompt")
+        return resultado
+
+    resultado = asyncio.run(escenario())
+    assert resultado["success"] is True
+    assert resultado["prompt"]["slots"] == 8
+    assert resultado["prompt"]["tokens_estimados"] > 0
+    assert resultado["datos_clima_originales"]["pronostico"][0]["temperatura"] == "11.36°C"
+    assert len(enviados) == 1 and "|muy nuboso|57".encode() in enviados[0]
+
+
+def test_las_funciones_publicas_aceptan_el_json_de_openweathermap():
+    compacto = _pronostico(3, zona_horaria=-18000)
+    respuesta = {"list": compacto.crudo, "city": {"timezone": -18000}}
+
+    assert queries.crear_texto_clima_para_llm(respuesta) == queries.crear_texto_clima_para_llm(compacto)
+    assert queries.crear_texto_clima_para_llm(compacto.crudo).startswith(PREFIJO_PROMPT)
+    assert queries.crear_texto_clima_para_llm(None) == SIN_DATOS
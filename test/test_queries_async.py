@@ -0,0 +1,91 @@
+"""Pruebas de la ruta asíncrona de consultas con transportes HTTP simulados."""
+
+import asyncio
+import time
+
+import httpx
+
+from src import clientes
+from src.cache import cache_pronosticos
+from src.modelo import PronosticoCompacto
+from src.queries import consultar_llm_local_stream, obtener_pronostico_extendido_async, obtener_prediccion_con_llm_async
+
+
+def test_pronostico_async_usa_cache_por_celda(instalar_cliente, slot):
+    llamadas = []
+
+    def manejador(request):
+        llamadas.append(request.url)
+        return httpx.Response(200, json={"list": [slot]})
+
+    async def escenario():
+        instalar_cliente(clientes.OPENWEATHER, manejador)
+        primero = await obtener_pronostico_extendido_async(4.60971, -74.08175)
+        segundo = await obtener_pronostico_extendido_async(4.6101, -74.0799)
+        return primero, segundo
+
+    primero, segundo = asyncio.run(escenario())
+    assert primero == segundo == [slot]
+    assert len(llamadas) == 1
+    assert llamadas[0].params["lat"] == "4.61"
+
+
+def test_prediccion_llm_async_reporta_error_del_llm(instalar_cliente, slot):
+    async def escenario():
+        instalar_cliente(clientes.OPENWEATHER, lambda request: httpx.Response(200, json={"list": [slot]}))
+        instalar_cliente(clientes.LLM, lambda request: httpx.Response(500))
+        resultado = await obtener_prediccion_con_llm_async(4.60971, -74.08175, "hash-prueba")
+        return resultado
+
+    resultado = asyncio.run(escenario())
+    assert resultado["success"] is False
+    assert resultado["datos_clima_originales"]["pronostico"][0]["temperatura"] == "11.36°C"
+
+
+def test_stream_llm_reenvia_tokens_o_respuesta_completa(instalar_cliente, slot):
+    compacto = PronosticoCompacto([{**slot, "main": {"temp": 20.0}}])
+
+    async def recoger(respuesta, llm_hash):
+        instalar_cliente(clientes.LLM, lambda request: respuesta)
+        eventos = [e async for e in consultar_llm_local_stream(compacto, llm_hash)]
+        return eventos
+
+    sse = httpx.Response(200, content=b"data: Hola\n\ndata: mundo\n\n", headers={"content-type": "text/event-stream"})
+    assert asyncio.run(recoger(sse, "hash-stream")) == [("token", "Hola"), ("token", "mundo")]
+
+    completa = httpx.Response(200, json=[{"text": "Despejado"}])
+    assert asyncio.run(recoger(completa, "hash-json")) == [("llm", [{"text": "Despejado"}])]
+
+
+def test_pronostico_obsoleto_se_sirve_mientras_se_revalida(monkeypatch, instalar_cliente, slot):
+    temperaturas = iter([10.0, 25.0])
+
+    def manejador(request):
+        return httpx.Response(200, json={"list": [{**slot, "main": {"temp": next(temperaturas)}}]})
+
+    async def escenario():
+        instalar_cliente(clientes.OPENWEATHER, manejador)
+        await obtener_pronostico_extendido_async(1.0, 1.0)
+        # Se fuerza la expiración de la entrada, que sigue dentro del periodo de gracia
+        celda = cache_pronosticos.celda(1.0, 1.0)
+        _, valor = cache_pronosticos._entradas[celda]
+        cache_pronosticos._entradas[celda] = (time.time() - 1, valor)
+
+        obsoleto = await obtener_pronostico_extendido_async(1.0, 1.0)
+        await asyncio.sleep(0.01)
+        fresco = await obtener_pronostico_extendido_async(1.0, 1.0)
+        return obsoleto, fresco
+
+    obsoleto, fresco = asyncio.run(escenario())
+    assert obsoleto[0]["main"]["temp"] == 10.0
+    assert fresco[0]["main"]["temp"] == 25.0
+    assert cache_pronosticos.estadisticas()["obsoletos_servidos"] == 1
+
+
+def test_pronostico_async_con_cuerpo_no_json_no_falla(instalar_cliente):
+    async def escenario():
+        instalar_cliente(clientes.OPENWEATHER, lambda request: httpx.Response(200, text="<html>"))
+        pronostico = await obtener_pronostico_extendido_async(4.60971, -74.08175)
+        return pronostico
+
+    assert asyncio.run(escenario()) == []
@@ -0,0 +1,151 @@
+"""Pruebas del circuit breaker y del tiempo límite de las peticiones."""
+
+import asyncio
+import time
+
+import httpx
+
+from src import clientes, queries
+from src.cola_llm import ColaLLM
+from src.modelo import PronosticoCompacto
+from src.resiliencia import (ABIERTO, CERRADO, SEMIABIERTO, CircuitBreaker, establecer_deadline,
+                             tiempo_restante)
+
+
+def test_circuito_se_abre_con_la_tasa_de_fallos_y_se_cierra_tras_la_sonda():
+    circuito = CircuitBreaker("prueba", umbral_fallos=0.5, minimo_llamadas=4, tiempo_apertura=0)
+    circuito.registrar_exito()
+    circuito.registrar_exito()
+    circuito.registrar_fallo()
+    assert circuito.estado == CERRADO
+    circuito.registrar_fallo()
+    assert circuito.estado == ABIERTO
+
+    # Con tiempo de apertura 0 el siguiente intento es la sonda; solo se admite una
+    assert circuito.permitir() is True
+    assert circuito.estado == SEMIABIERTO
+    assert circuito.permitir() is False
+    circuito.registrar_estado_http(200)
+    assert circuito.estado == CERRADO
+
+
+def test_circuito_abierto_rechaza_y_la_sonda_fallida_lo_reabre():
+    circuito = CircuitBreaker("prueba", minimo_llamadas=1, tiempo_apertura=60)
+    circuito.registrar_estado_http(503)
+    assert circuito.permitir() is False
+    assert circuito.estadisticas()["rechazadas"] == 1
+
+    circuito.tiempo_apertura = 0
+    circuito._abierto_hasta = 0
+    assert circuito.permitir() is True
+    circuito.registrar_fallo()
+    assert circuito.estado == ABIERTO
+    assert circuito.estadisticas()["aperturas"] == 2
+
+
+def test_deadline_limita_el_tiempo_restante():
+    async def escenario():
+        establecer_deadline(None)
+        sin_limite = tiempo_restante()
+        establecer_deadline(2)
+        return sin_limite, tiempo_restante()
+
+    sin_limite, restante = asyncio.run(escenario())
+    assert sin_limite is None
+    assert 0 < restante <= 2
+
+
+def test_llm_degrada_al_momento_con_el_circuito_abierto(crear_backend, instalar_pool, instalar_cliente, slot):
+    backend = crear_backend(llm_hash="hash-circuito", minimo_llamadas=2, tiempo_apertura=60)
+    instalar_pool(backend)
+    llamadas = []
+
+    def manejador(request):
+        llamadas.append(request.url)
+        return httpx.Response(500)
+
+    async def escenario():
+        instalar_cliente(clientes.LLM, manejador)
+        resultados = []
+        for i in range(4):
+            datos = PronosticoCompacto([{**slot, "main": {"temp": 20.0 + i}}])
+            resultados.append(await queries.consultar_llm_local_async(datos, "hash-circuito"))
+        return resultados
+
+    resultados = asyncio.run(escenario())
+    assert len(llamadas) == 2
+    assert all(r["success"] is False for r in resultados)
+    assert "degradado" not in resultados[1]
+    assert resultados[2]["degradado"] is True
+    assert resultados[3]["datos_clima_originales"]["pronostico"][0]["temperatura"] == "23.0°C"
+
+
+def test_sin_backend_disponible_no_se_espera_turno_en_la_cola(monkeypatch, crear_backend, instalar_pool, pronostico):
+    backend = crear_backend(llm_hash="hash-abierto", minimo_llamadas=1, tiempo_apertura=60)
+    backend.circuito.registrar_fallo()
+    instalar_pool(backend)
+    monkeypatch.setattr(queries, "cola_llm", ColaLLM(concurrencia=1))
+
+    async def escenario():
+        # La cola está ocupada: si la petición esperase turno, agotaría su tiempo en ella
+        async with queries.cola_llm.turno("hash-abierto"):
+            establecer_deadline(5)
+            inicio = time.perf_counter()
+            resultado = await queries.consultar_llm_local_async(pronostico, "hash-abierto")
+            return resultado, time.perf_counter() - inicio
+
+    resultado, duracion = asyncio.run(escenario())
+    assert resultado["degradado"] is True
+    assert duracion < 0.5
+    assert queries.cola_llm.estadisticas()["hash-abierto"]["atendidas"] == 1
+
+
+def test_timeout_de_lectura_del_llm_degrada_la_respuesta(crear_backend, instalar_pool, instalar_cliente, pronostico):
+    instalar_pool(crear_backend(llm_hash="hash-lento"))
+
+    def manejador(request):
+        raise httpx.ReadTimeout("sin respuesta", request=request)
+
+    async def escenario():
+        instalar_cliente(clientes.LLM, manejador)
+        resultado = await queries.consultar_llm_local_async(pronostico, "hash-lento")
+        return resultado
+
+    resultado = asyncio.run(escenario())
+    assert resultado["success"] is False
+    assert resultado["degradado"] is True
+    assert resultado["datos_clima_originales"]["pronostico"][0]["temperatura"] == "11.36°C"
+
+
+def test_llm_no_se_llama_si_la_peticion_agoto_su_tiempo(crear_backend, instalar_pool, pronostico):
+    instalar_pool(crear_backend())
+
+    async def escenario():
+        establecer_deadline(0)
+        return await queries.consultar_llm_local_async(pronostico, "hash-deadline")
+
+    resultado = asyncio.run(escenario())
+    assert resultado["degradado"] is True
+    assert "Tiempo límite" in resultado["error"]
+
+
+def test_url_invalida_o_respuesta_no_json_no_dejan_la_sonda_retenida(crear_backend, instalar_pool, instalar_cliente,
+                                                                     pronostico):
+    backend = crear_backend(minimo_llamadas=1, tiempo_apertura=0)
+    instalar_pool(backend)
+    circuito = backend.circuito
+    circuito.registrar_fallo()
+
+    async def escenario():
+        instalar_cliente(clientes.LLM, lambda request: httpx.Response(200, text="<html>"))
+        # El hash con salto de línea no forma una URL: la sonda se devuelve sin registrar nada
+        invalida = await queries.consultar_llm_local_async(pronostico, "hash\nroto")
+        estado = circuito.estado
+        no_json = await queries.consultar_llm_local_async(pronostico, "hash")
+        return invalida, estado, no_json
+
+    invalida, estado, no_json = asyncio.run(escenario())
+    assert invalida["success"] is False and estado == SEMIABIERTO
+    # La sonda quedó libre y la usó la segunda llamada, cuyo cuerpo no JSON cuenta como fallo
+    assert no_json["success"] is False
+    assert circuito.estado == ABIERTO
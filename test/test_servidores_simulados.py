@@ -0,0 +1,29 @@
+"""Pruebas de los servidores simulados usados por el benchmark."""
+
+import warnings
+
+from fastapi.testclient import TestClient
+
+from servidores_simulados import crear_app_llm, crear_app_openweather
+from src.modelo import PronosticoCompacto, resumen_diario
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+
+def test_openweather_simulado_tiene_la_forma_real():
+    with TestClient(crear_app_openweather(latencia=0, slots=40)) as cliente:
+        datos = cliente.get("/data/2.5/forecast", params={"lat": 4.61, "lon": -74.08}).json()
+
+    compacto = PronosticoCompacto(datos["list"], datos["city"]["timezone"])
+    assert len(compacto) == 40
+    assert compacto.dt[1] - compacto.dt[0] == 3 * 3600
+    assert compacto.descripcion[0] == "muy nuboso"
+    assert resumen_diario(compacto)["zona_horaria"] == -5 * 3600
+
+
+def test_llm_simulado_inyecta_errores():
+    with TestClient(crear_app_llm(latencia=0, tasa_error=1.0)) as cliente:
+        assert cliente.post("/hash/message", json={"text": "hola"}).status_code == 500
+    with TestClient(crear_app_llm(latencia=0, bytes_respuesta=50)) as cliente:
+        respuesta = cliente.post("/hash/message", json={"text": "hola"}).json()
+    assert len(respuesta[0]["text"]) == 50
@@ -0,0 +1,116 @@
+"""Pruebas de los trabajos asíncronos de predicción con LLM."""
+
+import time
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from src import clientes
+from src.trabajos import COMPLETADO, FALLIDO, GestorTrabajos, TrabajosLlenosError, callback_permitido
+
+
+def test_gestor_ejecuta_notifica_y_descarta_los_trabajos_antiguos(monkeypatch, instalar_cliente):
+    monkeypatch.setenv("JOBS_CALLBACK_HOSTS", "cliente")
+    gestor = GestorTrabajos(trabajadores=2, max_pendientes=10, retencion=60, max_trabajos=2)
+    notificaciones = []
+
+    def manejador(request):
+        notificaciones.append(request.read())
+        return httpx.Response(204)
+
+    async def ejecutar(trabajo):
+        await asyncio.sleep(0.01)
+        if trabajo.parametros["lat"] < 0:
+            raise ValueError("sin pronóstico")
+        return {"success": True, "lat": trabajo.parametros["lat"]}
+
+    async def escenario():
+        instalar_cliente(clientes.CALLBACKS, manejador)
+        gestor.iniciar(ejecutar)
+        correcto = gestor.crear({"lat": 4.6}, callback_url="http://cliente/avisos")
+        fallido = gestor.crear({"lat": -1.0})
+        await gestor._cola.join()
+        await asyncio.gather(*gestor._notificaciones)
+        estados = (gestor.obtener(correcto.id).a_dict(), gestor.obtener(fallido.id).estado)
+
+        # Con max_trabajos=2, un trabajo nuevo descarta el terminado más antiguo
+        gestor.crear({"lat": 1.0})
+        descartado = gestor.obtener(correcto.id)
+        await gestor.detener()
+        return estados, descartado
+
+    (correcto, estado_fallido), descartado = asyncio.run(escenario())
+    assert correcto["estado"] == COMPLETADO
+    assert correcto["resultado"] == {"success": True, "lat": 4.6}
+    assert correcto["notificado"] is True
+    assert estado_fallido == FALLIDO
+    assert len(notificaciones) == 1 and b'"completado"' in notificaciones[0]
+    assert descartado is None
+    assert gestor.estadisticas()["completados"] == 1 and gestor.estadisticas()["fallidos"] == 1
+
+
+def test_gestor_rechaza_con_la_cola_llena():
+    gestor = GestorTrabajos(trabajadores=1, max_pendientes=1)
+
+    async def escenario():
+        gestor.iniciar(lambda trabajo: asyncio.sleep(1))
+        gestor.crear({})
+        # El trabajador toma el primero; el segundo ocupa la única plaza de la cola
+        await asyncio.sleep(0)
+        gestor.crear({})
+        with pytest.raises(TrabajosLlenosError) as error:
+            gestor.crear({})
+        await gestor.detener()
+        return error.value
+
+    assert asyncio.run(escenario()).reintentar_en >= 1
+    assert gestor.estadisticas()["rechazados"] == 1
+
+
+def test_callback_solo_http_publico_o_hosts_permitidos(monkeypatch):
+    def permitido(url):
+        return asyncio.run(callback_permitido(url))
+
+    monkeypatch.delenv("JOBS_CALLBACK_HOSTS", raising=False)
+    assert permitido("https://93.184.216.34/avisos")
+    assert not permitido("file:///etc/passwd")
+    # Sin lista de hosts se rechazan las direcciones internas
+    for interna in ("http://127.0.0.1/", "http://localhost:8000/", "http://169.254.169.254/latest",
+                    "http://10.0.0.5/", "http://192.168.1.1/", "http://[::1]/", "http://[::ffff:127.0.0.1]/"):
+        assert not permitido(interna), interna
+    monkeypatch.setenv("JOBS_CALLBACK_HOSTS", "cliente.example")
+    assert permitido("http://cliente.example:8080/avisos")
+    assert not permitido("http://169.254.169.254/latest")
+
+
+def test_endpoints_de_trabajos(monkeypatch):
+    monkeypatch.setenv("STORE_PATH", "")
+    monkeypatch.setenv("PREFETCH_ENABLED", "false")
+
+    async def sin_comprobacion():
+        pass
+
+    async def prediccion(lat, lon, llm_hash, prioridad, max_distancia_km):
+        return {"success": True, "prediccion_llm": [{"text": f"análisis {lat}"}]}
+
+    monkeypatch.setattr(main.pool_llm, "comprobar_salud", sin_comprobacion)
+    monkeypatch.setattr(main, "obtener_prediccion_con_llm_async", prediccion)
+
+    with TestClient(main.app) as cliente:
+        creado = cliente.post("/prediction-llm/jobs", json={"lat": 4.6, "lon": -74.08})
+        assert creado.status_code == 202
+        assert creado.headers["location"] == creado.json()["url"]
+
+        for _ in range(50):
+            trabajo = cliente.get(creado.json()["url"]).json()
+            if trabajo["estado"] == COMPLETADO:
+                break
+            time.sleep(0.01)
+        assert trabajo["resultado"]["prediccion_interpretada"] == [{"text": "análisis 4.6"}]
+
+        assert cliente.get("/prediction-llm/jobs/desconocido").status_code == 404
+        rechazado = cliente.post("/prediction-llm/jobs", json={"lat": 4.6, "lon": -74.08, "callback_url": "ftp://x"})
+        assert rechazado.status_code == 400